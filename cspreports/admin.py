@@ -1,10 +1,23 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
 
-from cspreports.models import get_report_model
+from cspreports.conf import app_settings
+from cspreports.models import CSPViolation, get_report_model
+from cspreports.paginators import EstimatedCountPaginator
+from cspreports.search import search_reports
 
 CSPReport = get_report_model()
 
 
+class CSPReportChangeList(ChangeList):
+    """Change list which doesn't load the large text fields, which are not listed."""
+
+    deferred_fields = ("json", "original_policy", "user_agent")
+
+    def get_queryset(self, request, *args, **kwargs):
+        return super().get_queryset(request, *args, **kwargs).defer(*self.deferred_fields)
+
+
 class CSPReportAdmin(admin.ModelAdmin):
     list_display = ("id", "created", "document_uri", "blocked_uri", "is_valid")
     fields = ("created", "modified", "json_as_html")
@@ -12,18 +25,34 @@ class CSPReportAdmin(admin.ModelAdmin):
     search_fields = ("json",)
     list_filter = ("is_valid",)
     date_hierarchy = "created"
+    paginator = EstimatedCountPaginator
+    # Don't count all the reports when the list is filtered.
+    show_full_result_count = False
 
-    def json_as_html(self, instance):
-        return "<br />" + instance.json_as_html()
+    def get_changelist(self, request, **kwargs):
+        return CSPReportChangeList
 
-    def document_uri(self, instance):
-        return instance.data.get("csp-report", {}).get("document-uri")
+    def get_search_results(self, request, queryset, search_term):
+        if not app_settings.SEARCH_INDEX:
+            return super().get_search_results(request, queryset, search_term)
+        return search_reports(queryset, search_term), False
 
-    def blocked_uri(self, instance):
-        return instance.data.get("csp-report", {}).get("blocked-uri")
+    def json_as_html(self, instance):
+        return "<br />" + instance.json_as_html()
 
     json_as_html.short_description = "Report"
     json_as_html.allow_tags = True
 
 
 admin.site.register(CSPReport, CSPReportAdmin)
+
+
+class CSPViolationAdmin(admin.ModelAdmin):
+    list_display = ("document_root", "blocked_root", "violated_directive", "count", "first_seen", "last_seen")
+    readonly_fields = ("fingerprint", "document_root", "blocked_root", "violated_directive", "count", "first_seen",
+                       "last_seen")
+    search_fields = ("document_root", "blocked_root")
+    date_hierarchy = "last_seen"
+
+
+admin.site.register(CSPViolation, CSPViolationAdmin)
@@ -0,0 +1,67 @@
+"""Aggregation of CSP reports of the same violation at the time they are received."""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from cspreports.models import CSPViolation
+
+
+def aggregate_reports(reports, max_examples):
+    """Count the reports in the violation aggregates and return the reports which should be saved.
+
+    Only valid reports are aggregated, they are counted by their weights. Of those, at most
+    `max_examples` reports of each violation are returned to be saved as examples, all invalid
+    reports are returned.
+
+    @param reports: List of unsaved report model instances.
+    @param max_examples: Maximal number of saved reports of each violation.
+    """
+    to_save = []
+    groups = {}
+    for report in reports:
+        if report.is_valid:
+            groups.setdefault(report.fingerprint, []).append(report)
+        else:
+            to_save.append(report)
+
+    for fingerprint, group in groups.items():
+        previous_count = increment_violation(fingerprint, group)
+        to_save.extend(group[:max(max_examples - previous_count, 0)])
+    return to_save
+
+
+def increment_violation(fingerprint, reports):
+    """Atomically add the reports of a single violation to its aggregate.
+
+    @return: The count of the violation before the reports were added.
+    """
+    last_seen = max(report.created for report in reports)
+    count = sum(report.weight for report in reports)
+    with transaction.atomic():
+        previous_count = _update_violation(fingerprint, count, last_seen)
+        if previous_count is not None:
+            return previous_count
+        report = reports[0]
+        try:
+            with transaction.atomic():
+                CSPViolation.objects.create(
+                    fingerprint=fingerprint,
+                    document_root=report.document_root,
+                    blocked_root=report.blocked_root,
+                    violated_directive=report.violated_directive or "",
+                    count=count,
+                    first_seen=min(report.created for report in reports),
+                    last_seen=last_seen,
+                )
+            return 0
+        except IntegrityError:
+            # The violation was created concurrently.
+            return _update_violation(fingerprint, count, last_seen)
+
+
+def _update_violation(fingerprint, count, last_seen):
+    """Increment the violation count, return the previous count or `None` if the violation doesn't exist."""
+    queryset = CSPViolation.objects.filter(fingerprint=fingerprint)
+    if not queryset.update(count=F("count") + count, last_seen=Greatest(F("last_seen"), last_seen)):
+        return None
+    return queryset.values_list("count", flat=True).get() - count
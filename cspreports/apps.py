@@ -5,3 +5,10 @@ class CSPReportsConfig(AppConfig):
     name = 'cspreports'
     verbose_name = 'CSP Reports'
     default_auto_field = 'django.db.models.AutoField'
+
+    def ready(self):
+        # Connects the signal receiver which rebuilds the pipeline when the settings change.
+        from cspreports import pipeline
+
+        # Resolve the pipeline now, so the imports of the handlers don't delay the first report.
+        pipeline.get_pipeline()
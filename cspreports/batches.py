@@ -0,0 +1,50 @@
+"""Processing of large querysets of CSP reports in batches."""
+import time
+
+from django.db import transaction
+
+from cspreports.models import CSPReportToken
+
+
+def iterate_in_batches(queryset, batch_size):
+    """Yield lists of the objects of the queryset in batches ordered by primary key.
+
+    Each batch is fetched by a separate query from the last primary key of the previous batch, so
+    the batches stay fast and an interrupted iteration can be simply started again. The objects may
+    be modified between the batches, even so they no longer match the queryset.
+    """
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        batch_queryset = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        batch = list(batch_queryset[:batch_size])
+        if not batch:
+            break
+        yield batch
+        last_pk = batch[-1].pk
+
+
+def delete_in_batches(queryset, batch_size, sleep=0):
+    """Delete the reports in batches ordered by primary key, yield the number of reports deleted in each batch.
+
+    Each batch is deleted by a separate query, so the locks are held only shortly. Django deletes
+    the batches by a single query without loading them, unless signals or relations require it.
+    Nothing is kept between the batches, so an interrupted deletion can be simply started again.
+    The search tokens of the reports are deleted along with them.
+
+    @param sleep: Number of seconds to sleep between the batches.
+    """
+    queryset = queryset.order_by('pk')
+    while True:
+        # Find the last primary key of the batch, so the batch can be deleted by a range.
+        last_pk = queryset.values_list('pk', flat=True)[batch_size - 1:batch_size].first()
+        batch = queryset if last_pk is None else queryset.filter(pk__lte=last_pk)
+        with transaction.atomic():
+            CSPReportToken.objects.filter(report_id__in=batch.values('pk')).delete()
+            count, _ = batch.delete()
+        if count:
+            yield count
+        if last_pk is None:
+            break
+        if sleep:
+            time.sleep(sleep)
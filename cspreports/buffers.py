@@ -0,0 +1,101 @@
+"""In-memory buffers flushed in batches by a background thread."""
+import atexit
+import logging
+import os
+import threading
+import time
+
+from cspreports.conf import app_settings
+
+FULL_POLICY_DROP = "drop"
+FULL_POLICY_BLOCK = "block"
+FULL_POLICIES = (FULL_POLICY_DROP, FULL_POLICY_BLOCK)
+
+logger = logging.getLogger(app_settings.LOGGER_NAME)
+
+
+class BatchBuffer:
+    """Bounded in-memory buffer which passes its items in batches to a flush function.
+
+    The buffer is flushed by a background thread whenever it holds `batch_size` items or when
+    `flush_interval` seconds have passed since the last flush. It is also flushed when the process
+    exits.
+
+    @ivar flush_function: Callable which is passed a list of the buffered items.
+    @ivar batch_size: Number of items which triggers a flush.
+    @ivar flush_interval: Maximal number of seconds the items are kept in the buffer.
+    @ivar max_size: Maximal number of items in the buffer.
+    @ivar full_policy: What to do with new items when the buffer is full, either 'drop' or 'block'.
+    @ivar dropped_count: Number of items dropped because the buffer was full.
+    """
+
+    def __init__(self, flush_function, batch_size, flush_interval, max_size, full_policy=FULL_POLICY_DROP):
+        if full_policy not in FULL_POLICIES:
+            raise ValueError("Unknown full policy '{}'.".format(full_policy))
+        self.flush_function = flush_function
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_size = max(max_size, batch_size)
+        self.full_policy = full_policy
+        self.dropped_count = 0
+        self._items = []
+        self._condition = threading.Condition()
+        self._thread = None
+        self._pid = None
+        atexit.register(self.flush)
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item):
+        """Add an item to the buffer.
+
+        @return: Whether the item was added, i.e. `False` if it was dropped.
+        """
+        with self._condition:
+            self._ensure_thread()
+            if len(self._items) >= self.max_size:
+                if self.full_policy == FULL_POLICY_DROP:
+                    self.dropped_count += 1
+                    return False
+                self._condition.wait_for(lambda: len(self._items) < self.max_size)
+            self._items.append(item)
+            if len(self._items) >= self.batch_size:
+                self._condition.notify_all()
+        return True
+
+    def flush(self):
+        """Flush all the buffered items in the current thread."""
+        batch = self._take()
+        while batch:
+            self._flush_batch(batch)
+            batch = self._take()
+
+    def _take(self):
+        with self._condition:
+            batch = self._items[:self.batch_size]
+            del self._items[:self.batch_size]
+            self._condition.notify_all()
+        return batch
+
+    def _flush_batch(self, batch):
+        try:
+            self.flush_function(batch)
+        except Exception:
+            logger.exception("Flush of %d buffered items failed.", len(batch))
+
+    def _ensure_thread(self):
+        # The thread doesn't survive a fork, so start a new one in each process.
+        if self._thread is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="cspreports-buffer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: len(self._items) >= self.batch_size, timeout=max(deadline - time.monotonic(), 0))
+            deadline = time.monotonic() + self.flush_interval
+            self.flush()
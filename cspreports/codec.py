@@ -0,0 +1,70 @@
+"""JSON codec of CSP reports.
+
+Reports are decoded by orjson if it's installed, see the CSP_REPORTS_JSON_BACKEND setting,
+otherwise by the standard library. All the output - the compact JSON which is stored or logged and
+the formatted (indented) one - is always produced by the standard library, so it's the same with
+any backend.
+"""
+import json
+
+from django.core.exceptions import ImproperlyConfigured
+
+from cspreports.conf import JSON_BACKEND_AUTO, JSON_BACKEND_ORJSON, JSON_BACKEND_STDLIB, app_settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+_backend = None
+
+
+def get_backend():
+    """Return the name of the JSON backend in use, it's resolved from the settings only once."""
+    global _backend
+    if _backend is None:
+        _backend = _resolve_backend()
+    return _backend
+
+
+def reset_backend():
+    """Resolve the backend again on its next use, e.g. when the settings change."""
+    global _backend
+    _backend = None
+
+
+def _resolve_backend():
+    backend = app_settings.JSON_BACKEND
+    if backend == JSON_BACKEND_AUTO:
+        return JSON_BACKEND_STDLIB if orjson is None else JSON_BACKEND_ORJSON
+    if backend == JSON_BACKEND_ORJSON and orjson is None:
+        raise ImproperlyConfigured("CSP_REPORTS_JSON_BACKEND is 'orjson', but orjson is not installed.")
+    if backend not in (JSON_BACKEND_ORJSON, JSON_BACKEND_STDLIB):
+        raise ImproperlyConfigured("Unknown CSP_REPORTS_JSON_BACKEND {!r}.".format(backend))
+    return backend
+
+
+def loads(data):
+    """Decode a JSON document.
+
+    @raise ValueError: If the document is not a valid JSON.
+    """
+    if get_backend() == JSON_BACKEND_ORJSON:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # The standard library accepts a few documents which orjson doesn't, e.g. with NaN or
+            # with integers over 64 bits. Decode them the same with any backend.
+            pass
+    return json.loads(data)
+
+
+def dumps(data):
+    """Encode the data to a compact JSON document."""
+    return json.dumps(data)
+
+
+def dumps_formatted(data):
+    """Encode the data to an indented JSON document with sorted keys."""
+    return json.dumps(data, indent=4, sort_keys=True, separators=(",", ": "))
@@ -1,15 +1,70 @@
 from django.conf import settings
 
+CONTENT_TYPES = ("application/csp-report", "application/json", "application/reports+json")
+EMAIL_DIGEST = "digest"
+SAVE_BUFFERED = "buffered"
+SAVE_SPOOL = "spool"
+HANDLERS_POOL = "pool"
+LOG_FORMAT_PRETTY = "pretty"
+LOG_FORMAT_STRUCTURED = "structured"
+JSON_BACKEND_AUTO = "auto"
+JSON_BACKEND_ORJSON = "orjson"
+JSON_BACKEND_STDLIB = "json"
+
 
 class Settings:
     """
     Shadow Django's settings with a little logic
     """
 
+    @property
+    def CONTENT_TYPES(self):
+        return getattr(settings, "CSP_REPORTS_CONTENT_TYPES", CONTENT_TYPES)
+
+    @property
+    def MAX_BODY_SIZE(self):
+        return getattr(settings, "CSP_REPORTS_MAX_BODY_SIZE", 256 * 1024)
+
+    @property
+    def MAX_JSON_DEPTH(self):
+        return getattr(settings, "CSP_REPORTS_MAX_JSON_DEPTH", 10)
+
+    @property
+    def RATE_LIMIT_CLIENT(self):
+        return getattr(settings, "CSP_REPORTS_RATE_LIMIT_CLIENT", None)
+
+    @property
+    def RATE_LIMIT_ORIGIN(self):
+        return getattr(settings, "CSP_REPORTS_RATE_LIMIT_ORIGIN", None)
+
+    @property
+    def RATE_LIMIT_GLOBAL(self):
+        return getattr(settings, "CSP_REPORTS_RATE_LIMIT_GLOBAL", None)
+
+    @property
+    def RATE_LIMIT_CACHE(self):
+        return getattr(settings, "CSP_REPORTS_RATE_LIMIT_CACHE", "default")
+
+    @property
+    def RATE_LIMIT_CLIENT_IP_META(self):
+        return getattr(settings, "CSP_REPORTS_RATE_LIMIT_CLIENT_IP_META", "REMOTE_ADDR")
+
     @property
     def EMAIL_ADMINS(self):
         return getattr(settings, "CSP_REPORTS_EMAIL_ADMINS", True)
 
+    @property
+    def EMAIL_DIGEST_INTERVAL(self):
+        return getattr(settings, "CSP_REPORTS_EMAIL_DIGEST_INTERVAL", 300)
+
+    @property
+    def EMAIL_DIGEST_MAX_REPORTS(self):
+        return getattr(settings, "CSP_REPORTS_EMAIL_DIGEST_MAX_REPORTS", 1000)
+
+    @property
+    def EMAIL_DIGEST_SUPPRESS_WINDOW(self):
+        return getattr(settings, "CSP_REPORTS_EMAIL_DIGEST_SUPPRESS_WINDOW", 3600)
+
     @property
     def LOG(self):
         return getattr(settings, "CSP_REPORTS_LOG", True)
@@ -18,6 +73,10 @@ class Settings:
     def LOG_LEVEL(self):
         return getattr(settings, "CSP_REPORTS_LOG_LEVEL", "warning")
 
+    @property
+    def LOG_FORMAT(self):
+        return getattr(settings, "CSP_REPORTS_LOG_FORMAT", LOG_FORMAT_PRETTY)
+
     @property
     def LOGGER_NAME(self):
         return getattr(settings, "CSP_REPORTS_LOGGER_NAME", "CSP Reports")
@@ -26,14 +85,106 @@ class Settings:
     def SAVE(self):
         return getattr(settings, "CSP_REPORTS_SAVE", True)
 
+    @property
+    def BUFFER_BATCH_SIZE(self):
+        return getattr(settings, "CSP_REPORTS_BUFFER_BATCH_SIZE", 100)
+
+    @property
+    def BUFFER_FLUSH_INTERVAL(self):
+        return getattr(settings, "CSP_REPORTS_BUFFER_FLUSH_INTERVAL", 5)
+
+    @property
+    def BUFFER_MAX_SIZE(self):
+        return getattr(settings, "CSP_REPORTS_BUFFER_MAX_SIZE", 10000)
+
+    @property
+    def BUFFER_FULL_POLICY(self):
+        return getattr(settings, "CSP_REPORTS_BUFFER_FULL_POLICY", "drop")
+
+    @property
+    def SPOOL_DIR(self):
+        return getattr(settings, "CSP_REPORTS_SPOOL_DIR", None)
+
+    @property
+    def SPOOL_MAX_BYTES(self):
+        return getattr(settings, "CSP_REPORTS_SPOOL_MAX_BYTES", 64 * 1024 * 1024)
+
+    @property
+    def SPOOL_FSYNC_EVERY(self):
+        return getattr(settings, "CSP_REPORTS_SPOOL_FSYNC_EVERY", 100)
+
+    @property
+    def AGGREGATE(self):
+        return getattr(settings, "CSP_REPORTS_AGGREGATE", False)
+
+    @property
+    def AGGREGATE_EXAMPLES(self):
+        return getattr(settings, "CSP_REPORTS_AGGREGATE_EXAMPLES", 10)
+
+    @property
+    def SAMPLE_RATE(self):
+        return getattr(settings, "CSP_REPORTS_SAMPLE_RATE", 1)
+
+    @property
+    def SAMPLE_RATES(self):
+        return getattr(settings, "CSP_REPORTS_SAMPLE_RATES", {})
+
+    @property
+    def SAMPLE_CACHE(self):
+        return getattr(settings, "CSP_REPORTS_SAMPLE_CACHE", "default")
+
+    @property
+    def SAMPLE_FIRST_SEEN_TIMEOUT(self):
+        return getattr(settings, "CSP_REPORTS_SAMPLE_FIRST_SEEN_TIMEOUT", 24 * 60 * 60)
+
+    @property
+    def SEARCH_INDEX(self):
+        return getattr(settings, "CSP_REPORTS_SEARCH_INDEX", False)
+
+    @property
+    def INTERN_TEXTS(self):
+        return getattr(settings, "CSP_REPORTS_INTERN_TEXTS", False)
+
+    @property
+    def TEXT_CACHE_SIZE(self):
+        return getattr(settings, "CSP_REPORTS_TEXT_CACHE_SIZE", 1000)
+
     @property
     def ADDITIONAL_HANDLERS(self):
         return getattr(settings, "CSP_REPORTS_ADDITIONAL_HANDLERS", [])
 
+    @property
+    def ADDITIONAL_HANDLERS_MODE(self):
+        return getattr(settings, "CSP_REPORTS_ADDITIONAL_HANDLERS_MODE", None)
+
+    @property
+    def HANDLER_POOL_SIZE(self):
+        return getattr(settings, "CSP_REPORTS_HANDLER_POOL_SIZE", 4)
+
+    @property
+    def HANDLER_QUEUE_SIZE(self):
+        return getattr(settings, "CSP_REPORTS_HANDLER_QUEUE_SIZE", 1000)
+
+    @property
+    def HANDLER_FULL_POLICY(self):
+        return getattr(settings, "CSP_REPORTS_HANDLER_FULL_POLICY", "drop")
+
+    @property
+    def HANDLER_TIMEOUT(self):
+        return getattr(settings, "CSP_REPORTS_HANDLER_TIMEOUT", 10)
+
     @property
     def FILTER_FUNCTION(self):
         return getattr(settings, "CSP_REPORTS_FILTER_FUNCTION", None)
 
+    @property
+    def FILTER_RULES(self):
+        return getattr(settings, "CSP_REPORTS_FILTER_RULES", ())
+
+    @property
+    def JSON_BACKEND(self):
+        return getattr(settings, "CSP_REPORTS_JSON_BACKEND", JSON_BACKEND_AUTO)
+
     @property
     def CSP_REPORT_MODEL(self):
         return getattr(settings, "CSP_REPORTS_MODEL", "cspreports.CSPReport")
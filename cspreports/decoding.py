@@ -0,0 +1,119 @@
+"""Decoding of CSP report fields to the report model fields.
+
+The field converters of each report model are looked up once. Values which are already clean,
+e.g. strings for text fields and integers in range for integer fields, are stored as they are,
+only the other values go through the full Django conversion and validation.
+"""
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxLengthValidator, MaxValueValidator, MinValueValidator
+from django.db import models
+
+# Field classes with a fast check, subclasses may convert the values differently.
+TEXT_FIELDS = (models.CharField, models.TextField)
+INTEGER_FIELDS = (models.IntegerField, models.SmallIntegerField, models.BigIntegerField, models.PositiveIntegerField,
+                  models.PositiveSmallIntegerField, getattr(models, "PositiveBigIntegerField", models.BigIntegerField))
+
+
+def _is_none(field):
+    """Return a check of `None` values, which are clean if the field is nullable."""
+    if field.null:
+        return lambda value: value is None
+    return lambda value: False
+
+
+def _get_limits(field, validator_classes):
+    """Return a dictionary of limits of the field validators, `None` if the field has other validators."""
+    limits = {}
+    for validator in field.validators:
+        if type(validator) not in validator_classes or callable(validator.limit_value):
+            return None
+        limits.setdefault(type(validator), []).append(validator.limit_value)
+    return limits
+
+
+def get_clean_check(field):
+    """Return a function which returns whether a value is already clean for the field.
+
+    Returns `None` if the field doesn't have a fast check, i.e. all its values have to be cleaned.
+    The check may return `False` for some clean values, they are cleaned by the full validation.
+    """
+    is_none = _is_none(field)
+    if type(field) is models.CharField and field.choices:
+        allowed = {value for value, _ in field.flatchoices if isinstance(value, str)}
+        if field.blank:
+            allowed.add("")
+        return lambda value: is_none(value) or type(value) is str and value in allowed
+    if type(field) in TEXT_FIELDS and not field.choices:
+        limits = _get_limits(field, (MaxLengthValidator, ))
+        if limits is None:
+            return None
+        max_length = min(limits.get(MaxLengthValidator, ()), default=None)
+        min_length = 0 if field.blank else 1
+        if max_length is None:
+            return lambda value: is_none(value) or type(value) is str and min_length <= len(value)
+        return lambda value: is_none(value) or type(value) is str and min_length <= len(value) <= max_length
+    if type(field) in INTEGER_FIELDS and not field.choices:
+        limits = _get_limits(field, (MinValueValidator, MaxValueValidator))
+        if limits is None:
+            return None
+        min_value = max(limits.get(MinValueValidator, ()), default=None)
+        max_value = min(limits.get(MaxValueValidator, ()), default=None)
+        min_value = float("-inf") if min_value is None else min_value
+        max_value = float("inf") if max_value is None else max_value
+        return lambda value: is_none(value) or type(value) is int and min_value <= value <= max_value
+    return None
+
+
+class ReportDecoder:
+    """Decoder of the 'csp-report' fields to the fields of a report model.
+
+    @ivar fields: List of tuples (report field name, model field name, clean check, to_python, clean).
+    """
+
+    def __init__(self, model, fields):
+        self.fields = []
+        for json_field_name, django_field_name in fields:
+            field = model._meta.get_field(django_field_name)
+            is_clean = get_clean_check(field) or (lambda value: False)
+            self.fields.append((json_field_name, field.attname, is_clean, field.to_python, field.clean))
+
+    def decode(self, instance, report_data):
+        """Set the model fields of the instance from the 'csp-report' fields.
+
+        If a value is not valid, the instance will still have it set as much as possible.
+
+        @return: Whether all the values are valid.
+        """
+        is_valid = True
+        for json_field_name, attname, is_clean, to_python, clean in self.fields:
+            value = report_data.get(json_field_name)
+            if is_clean(value):
+                setattr(instance, attname, value)
+                continue
+            # Try to pass the value through as much of Django's coercion/cleaning as possible, but
+            # if the data is not entirely valid that's not a reason to not still save the report
+            # if we can; even if the data isn't perfect, some information is better than none.
+            try:
+                value = to_python(value)
+                # If the first conversion step worked, then store the value, even if the next
+                # conversion fails
+                setattr(instance, attname, value)
+                value = clean(value, model_instance=instance)
+                setattr(instance, attname, value)
+            except ValidationError:
+                is_valid = False
+        return is_valid
+
+
+_decoders = {}
+
+
+def get_decoder(model, fields):
+    """Return the `ReportDecoder` of the model, it's created only once for each model.
+
+    @param fields: Pairs of the 'csp-report' field names and the model field names.
+    """
+    decoder = _decoders.get(model)
+    if decoder is None:
+        decoder = _decoders[model] = ReportDecoder(model, fields)
+    return decoder
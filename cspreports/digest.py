@@ -0,0 +1,85 @@
+"""Periodic digest emails of CSP reports."""
+import hashlib
+import threading
+import time
+
+from django.core.mail import mail_admins
+
+from cspreports.buffers import BatchBuffer
+from cspreports.fingerprints import get_report_fingerprint
+from cspreports.parsing import ParsedReport
+
+
+def get_digest_key(report):
+    """Return the key under which the `ParsedReport` is grouped in the digest.
+
+    Reports which are not valid or whose fields are of wrong types are grouped by their raw text.
+    """
+    csp_report = report.csp_report
+    fingerprint = get_report_fingerprint(csp_report) if csp_report else None
+    if fingerprint is not None:
+        return fingerprint
+    return hashlib.sha1(report.raw.encode("utf-8")).hexdigest()
+
+
+class EmailDigest:
+    """Collects CSP reports and periodically emails them to the site admins grouped by violation.
+
+    Violations which were already mailed within `suppress_window` seconds are left out of the
+    following digests.
+
+    @ivar interval: Number of seconds between the digests.
+    @ivar max_reports: Maximal number of reports in a single digest.
+    @ivar suppress_window: Number of seconds for which a mailed violation isn't mailed again.
+    """
+
+    def __init__(self, interval, max_reports, suppress_window):
+        self.interval = interval
+        self.max_reports = max_reports
+        self.suppress_window = suppress_window
+        self.buffer = BatchBuffer(self.send, batch_size=max_reports, flush_interval=interval,
+                                  max_size=max_reports * 10)
+        self._mailed = {}
+        self._lock = threading.Lock()
+
+    def add(self, report):
+        """Add a `ParsedReport` to the digest."""
+        self.buffer.put((get_digest_key(report), report.raw, report.user_agent))
+
+    def flush(self):
+        """Send the digest of all the collected reports now."""
+        self.buffer.flush()
+
+    def send(self, batch):
+        """Send a digest of the batch of collected reports."""
+        groups = {}
+        for key, raw, user_agent in batch:
+            group = groups.get(key)
+            if group is None:
+                groups[key] = [1, raw, user_agent]
+            else:
+                group[0] += 1
+
+        suppressed_count = 0
+        with self._lock:
+            current = time.monotonic()
+            self._mailed = {key: mailed for key, mailed in self._mailed.items()
+                            if current - mailed < self.suppress_window}
+            for key in list(groups):
+                if key in self._mailed:
+                    suppressed_count += groups.pop(key)[0]
+                else:
+                    self._mailed[key] = current
+        if not groups:
+            return
+
+        report_count = len(batch) - suppressed_count
+        lines = ["{} reports of {} violations.".format(report_count, len(groups))]
+        if suppressed_count:
+            lines.append("{} more reports of violations mailed in the last {} seconds are left out.".format(
+                suppressed_count, self.suppress_window))
+        ordered = sorted(groups.values(), key=lambda group: group[0], reverse=True)
+        for number, (count, raw, user_agent) in enumerate(ordered, start=1):
+            lines.append("\n{}. Reported {} times\n\nUser agent:\n{}\n\nReport:\n{}".format(
+                number, count, user_agent, ParsedReport(raw).formatted))
+        mail_admins("CSP Violation Reports digest ({} reports)".format(report_count), "\n".join(lines))
@@ -0,0 +1,133 @@
+"""Concurrent execution of the additional handlers off the request thread."""
+import asyncio
+import inspect
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections
+
+from cspreports import stats
+from cspreports.buffers import FULL_POLICIES, FULL_POLICY_DROP
+from cspreports.conf import app_settings
+from cspreports.parsing import call_handler
+
+logger = logging.getLogger(app_settings.LOGGER_NAME)
+
+OUTCOME_SUCCESS = "success"
+OUTCOME_FAILURE = "failure"
+OUTCOME_TIMEOUT = "timeout"
+OUTCOME_DROPPED = "dropped"
+# Name of the stats counter of the handler calls
+HANDLER_COUNTER = "handlers.{}.{}"
+
+
+def get_handler_name(handler):
+    return "{}.{}".format(handler.__module__, getattr(handler, "__qualname__", handler.__class__.__qualname__))
+
+
+def count_outcome(handler, outcome):
+    stats.increment(HANDLER_COUNTER.format(get_handler_name(handler), outcome))
+
+
+class HandlerPool:
+    """Bounded pool of threads which run the additional handlers.
+
+    A thread can't be interrupted, so a handler which exceeds the timeout keeps running, but it's
+    counted and logged as timed out. Exceptions of the handlers are logged and counted, they don't
+    affect the other handlers nor the request.
+
+    @ivar max_workers: Number of the threads.
+    @ivar max_queue: Maximal number of the handler calls which are queued or running.
+    @ivar full_policy: What to do with new calls when the queue is full, either 'drop' or 'block'.
+    @ivar timeout: Number of seconds after which a handler call is considered timed out.
+    """
+
+    def __init__(self, max_workers, max_queue, timeout, full_policy=FULL_POLICY_DROP):
+        if full_policy not in FULL_POLICIES:
+            raise ValueError("Unknown full policy '{}'.".format(full_policy))
+        self.max_workers = max_workers
+        self.max_queue = max(max_queue, max_workers)
+        self.full_policy = full_policy
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.max_queue)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        # The threads don't survive a fork, so start new ones in each process.
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="cspreports-handler")
+        return self._executor
+
+    def shutdown(self, wait=True):
+        """Stop the threads once the scheduled calls are finished."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def submit(self, handler, report, block=None):
+        """Schedule a call of a sync handler with the `ParsedReport`.
+
+        @param block: Whether to wait for a free slot if the queue is full, by default according to
+            the full policy.
+        @return: The future of the call, `None` if the call was dropped because the queue is full.
+        """
+        if block is None:
+            block = self.full_policy != FULL_POLICY_DROP
+        if not self._slots.acquire(blocking=block):
+            count_outcome(handler, OUTCOME_DROPPED)
+            return None
+        try:
+            return self.executor.submit(self._run, handler, report)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _run(self, handler, report):
+        start = time.monotonic()
+        try:
+            call_handler(handler, report)
+        except Exception:
+            logger.exception("Additional handler %s failed.", get_handler_name(handler))
+            count_outcome(handler, OUTCOME_FAILURE)
+        else:
+            duration = time.monotonic() - start
+            if duration > self.timeout:
+                logger.warning("Additional handler %s timed out after %.1f seconds.", get_handler_name(handler),
+                               duration)
+                count_outcome(handler, OUTCOME_TIMEOUT)
+            else:
+                count_outcome(handler, OUTCOME_SUCCESS)
+        finally:
+            close_old_connections()
+            self._slots.release()
+
+    async def run_async(self, handler, report):
+        """Await a handler call with the `ParsedReport`, sync handlers run in the pool.
+
+        The calls of the sync handlers are dropped if the queue is full, so the event loop is never blocked.
+        """
+        if inspect.iscoroutinefunction(handler):
+            try:
+                await asyncio.wait_for(call_handler(handler, report), self.timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Additional handler %s timed out.", get_handler_name(handler))
+                count_outcome(handler, OUTCOME_TIMEOUT)
+            except Exception:
+                logger.exception("Additional handler %s failed.", get_handler_name(handler))
+                count_outcome(handler, OUTCOME_FAILURE)
+            else:
+                count_outcome(handler, OUTCOME_SUCCESS)
+            return
+        future = self.submit(handler, report, block=False)
+        if future is not None:
+            # The outcome is counted by the pool, the future never raises.
+            await asyncio.wrap_future(future)
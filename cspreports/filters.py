@@ -1,26 +1,26 @@
-""" Filters for use with the  setting. """
-import json
+""" Filters for use with the CSP_REPORTS_FILTER_FUNCTION setting. """
+from cspreports.parsing import parsed_report_handler, to_parsed_report
 
+BROWSER_EXTENSION_PREFIXES = (
+    "safari-extension://",
+    "safari-web-extension://",
+    "moz-extension://",
+    "chrome-extension://",
+)
+# Filter rule equivalent to `filter_browser_extensions` for the CSP_REPORTS_FILTER_RULES setting
+BROWSER_EXTENSION_RULE = {"name": "browser_extensions", "field": "source-file", "prefix": BROWSER_EXTENSION_PREFIXES}
 
-def filter_browser_extensions(request):
+
+@parsed_report_handler
+def filter_browser_extensions(report):
     """ Filters out reports of CSP violations which are caused by browser extensions from common
         web browsers trying to inject resources.
     """
-    json_str = request.body
-    if isinstance(json_str, bytes):
-        json_str = json_str.decode(request.encoding or "utf-8")
-    try:
-        report = json.loads(json_str).get("csp-report", {})
-    except json.decoder.JSONDecodeError:
+    report = to_parsed_report(report)
+    if not report.is_valid:
         return False
     # Ignore reports caused by browser extensions trying to load stuff
-    src_file = report.get("source-file", "")
-    ignored_prefixes = (
-        "safari-extension://",
-        "safari-web-extension://",
-        "moz-extension://",
-        "chrome-extension://",
-    )
-    if any(src_file.startswith(prefix) for prefix in ignored_prefixes):
+    src_file = report.csp_report.get("source-file", "")
+    if src_file.startswith(BROWSER_EXTENSION_PREFIXES):
         return False
     return True
@@ -0,0 +1,44 @@
+"""Normalisation of CSP report values for grouping of violations."""
+import hashlib
+from urllib.parse import urlsplit, urlunsplit
+
+# The 'csp-report' fields of the fingerprint
+FINGERPRINT_FIELDS = ("document-uri", "blocked-uri", "violated-directive")
+
+
+def get_root_uri(uri):
+    """Return root URI - strip query and fragment.
+
+    Values which are not strings or which can't be parsed, e.g. 'http://[::1', have an empty root URI.
+    """
+    if not isinstance(uri, str):
+        return ""
+    try:
+        chunks = urlsplit(uri)
+    except ValueError:
+        return ""
+    return urlunsplit((chunks.scheme, chunks.netloc, chunks.path, "", ""))
+
+
+def get_directive(csp_report):
+    """Return the name of the violated directive of the 'csp-report' fields, empty string if there's none."""
+    directive = csp_report.get("effective-directive") or csp_report.get("violated-directive")
+    if not isinstance(directive, str):
+        return ""
+    return directive.split(" ", 1)[0]
+
+
+def get_fingerprint(document_uri, blocked_uri, violated_directive):
+    """Return a fingerprint of a violation - a hash of the document root, blocked root and violated directive."""
+    if not isinstance(violated_directive, str):
+        violated_directive = ""
+    key = "\n".join((get_root_uri(document_uri), get_root_uri(blocked_uri), violated_directive))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def get_report_fingerprint(csp_report):
+    """Return the fingerprint of the 'csp-report' fields, `None` if any of its fields is not a string."""
+    values = [csp_report.get(field) for field in FINGERPRINT_FIELDS]
+    if any(value is not None and not isinstance(value, str) for value in values):
+        return None
+    return get_fingerprint(*values)
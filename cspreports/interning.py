@@ -0,0 +1,130 @@
+"""Interning of the large texts repeated in many CSP reports, see the CSP_REPORTS_INTERN_TEXTS setting.
+
+The original policies and the user agents are almost the same in all the reports, so each distinct
+text of the `original_policy` and `user_agent` fields is stored once in `CSPReportText` and the
+reports refer to it. The raw JSON of the reports, which holds its own copy of the policy, is kept
+as it was received. The texts are identified by their hashes. The primary keys of the recently used
+texts are kept in an in-process LRU cache, so a batch of reports with known texts doesn't need any
+query.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import partial
+
+from django.db import transaction
+
+from cspreports.conf import app_settings
+from cspreports.models import CSPReportText
+
+# Map of the interned report fields to their foreign keys
+TEXT_FIELDS = (
+    ("original_policy", "original_policy_text"),
+    ("user_agent", "user_agent_text"),
+)
+
+
+def get_text_hash(value):
+    """Return the hash which identifies the text."""
+    return hashlib.sha1(value.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Thread safe mapping which holds only the most recently used items.
+
+    @ivar max_size: Maximal number of items.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the value of the key, `None` if it's not in the cache."""
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+_text_cache = None
+_text_cache_lock = threading.Lock()
+
+
+def get_text_cache():
+    """Return the cache of the text primary keys by the text hashes."""
+    global _text_cache
+    with _text_cache_lock:
+        if _text_cache is None:
+            _text_cache = LRUCache(app_settings.TEXT_CACHE_SIZE)
+    return _text_cache
+
+
+def reset_text_cache():
+    """Drop the cache, so it's created again from the current settings."""
+    global _text_cache
+    with _text_cache_lock:
+        _text_cache = None
+
+
+def get_text_ids(values):
+    """Return a dictionary of `CSPReportText` primary keys by the texts, the missing texts are created."""
+    cache = get_text_cache()
+    text_ids = {}
+    missing = {}
+    for value in set(values):
+        text_hash = get_text_hash(value)
+        text_id = cache.get(text_hash)
+        if text_id is None:
+            missing[text_hash] = value
+        else:
+            text_ids[value] = text_id
+    if not missing:
+        return text_ids
+
+    found = dict(CSPReportText.objects.filter(hash__in=missing).values_list("hash", "pk"))
+    new = [CSPReportText(hash=text_hash, value=value) for text_hash, value in missing.items() if text_hash not in found]
+    if new:
+        # The texts may be created concurrently, so fetch the primary keys afterwards.
+        CSPReportText.objects.bulk_create(new, ignore_conflicts=True)
+        found.update(CSPReportText.objects.filter(hash__in=[text.hash for text in new]).values_list("hash", "pk"))
+    for text_hash, text_id in found.items():
+        text_ids[missing[text_hash]] = text_id
+    # The new texts may still be rolled back, so they are cached only once they are committed.
+    transaction.on_commit(partial(_cache_text_ids, cache, found))
+    return text_ids
+
+
+def _cache_text_ids(cache, text_ids):
+    for text_hash, text_id in text_ids.items():
+        cache.set(text_hash, text_id)
+
+
+def intern_report_texts(reports):
+    """Move the original policies and the user agents of the reports to the shared texts.
+
+    Empty texts are kept in the reports.
+
+    @param reports: List of report model instances.
+    """
+    values = [getattr(report, field) for report in reports for field, _ in TEXT_FIELDS]
+    text_ids = get_text_ids([value for value in values if value])
+    for report in reports:
+        for field, text_field in TEXT_FIELDS:
+            value = getattr(report, field)
+            if value:
+                setattr(report, text_field + "_id", text_ids[value])
+                setattr(report, field, "")
@@ -0,0 +1,43 @@
+"""Command to fill the normalised fields of existing CSP reports."""
+from django.core.management.base import BaseCommand
+
+from cspreports.batches import iterate_in_batches
+from cspreports.models import get_report_model
+
+CSPReport = get_report_model()
+
+DEFAULT_BATCH_SIZE = 1000
+NORMALISED_FIELDS = ("document_root", "blocked_root", "fingerprint")
+
+
+class Command(BaseCommand):
+    help = "Fill the normalised fields (root URIs and fingerprint) of existing CSP reports."
+
+    def add_arguments(self, parser):
+        """Parse command arguments."""
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help="Number of reports updated in a single batch. By default %(default)s.")
+        parser.add_argument(
+            '--all', action='store_true',
+            help="Update all reports, not only those without a fingerprint.")
+
+    def handle(self, **options):
+        verbosity = options['verbosity']
+        batch_size = options['batch_size']
+
+        queryset = CSPReport.objects.only('pk', 'document_uri', 'blocked_uri', 'violated_directive')
+        if not options['all']:
+            queryset = queryset.filter(fingerprint='')
+
+        updated = 0
+        for batch in iterate_in_batches(queryset, batch_size):
+            for report in batch:
+                report.update_normalised_fields()
+            CSPReport.objects.bulk_update(batch, NORMALISED_FIELDS)
+            updated += len(batch)
+            if verbosity >= 3:
+                self.stdout.write("Updated {} reports.".format(updated))
+
+        if verbosity >= 2:
+            self.stdout.write("Updated normalised fields of {} reports.".format(updated))
@@ -4,12 +4,14 @@ from datetime import timedelta
 from django.core.management.base import BaseCommand, CommandError
 from django.utils.encoding import force_str
 
+from cspreports.batches import delete_in_batches
 from cspreports.models import get_report_model
 from cspreports.utils import get_midnight, parse_date_input
 
 CSPReport = get_report_model()
 
 DEFAULT_OFFSET = 7
+DEFAULT_BATCH_SIZE = 10000
 
 
 class Command(BaseCommand):
@@ -20,6 +22,12 @@ class Command(BaseCommand):
         parser.add_argument(
             'limit', nargs='?',
             help="The date until which the reports be deleted. By defalt {} days ago.".format(DEFAULT_OFFSET))
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help="Number of reports deleted in a single query. By default %(default)s.")
+        parser.add_argument(
+            '--sleep', type=float, default=0,
+            help="Number of seconds to sleep between the batches. By default %(default)s.")
 
     def handle(self, **options):
         verbosity = options['verbosity']
@@ -33,6 +41,13 @@ class Command(BaseCommand):
         else:
             limit = get_midnight() - timedelta(days=DEFAULT_OFFSET)
 
-        CSPReport.objects.filter(created__lt=limit).delete()
+        deleted = 0
+        batches = delete_in_batches(CSPReport.objects.filter(created__lt=limit), options['batch_size'],
+                                    options['sleep'])
+        for count in batches:
+            deleted += count
+            if verbosity >= 3:
+                self.stdout.write("Deleted {} reports.".format(deleted))
         if verbosity >= 2:
             self.stdout.write("Deleted all reports created before {}.".format(limit))
+
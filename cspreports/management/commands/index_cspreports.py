@@ -0,0 +1,43 @@
+"""Command to fill the search index of existing CSP reports."""
+from django.core.management.base import BaseCommand
+
+from cspreports.batches import iterate_in_batches
+from cspreports.models import CSPReportToken, get_report_model
+from cspreports.search import index_reports
+
+CSPReport = get_report_model()
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = "Fill the search index of existing CSP reports."
+
+    def add_arguments(self, parser):
+        """Parse command arguments."""
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help="Number of reports indexed in a single batch. By default %(default)s.")
+        parser.add_argument(
+            '--all', action='store_true',
+            help="Index all reports, not only those without any search tokens.")
+
+    def handle(self, **options):
+        verbosity = options['verbosity']
+        batch_size = options['batch_size']
+
+        queryset = CSPReport.objects.only(
+            'pk', 'document_uri', 'blocked_uri', 'referrer', 'source_file', 'violated_directive',
+            'effective_directive')
+        if not options['all']:
+            queryset = queryset.exclude(pk__in=CSPReportToken.objects.values('report_id'))
+
+        indexed = 0
+        for batch in iterate_in_batches(queryset, batch_size):
+            index_reports(batch)
+            indexed += len(batch)
+            if verbosity >= 3:
+                self.stdout.write("Indexed {} reports.".format(indexed))
+
+        if verbosity >= 2:
+            self.stdout.write("Filled the search index of {} reports.".format(indexed))
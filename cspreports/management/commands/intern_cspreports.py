@@ -0,0 +1,44 @@
+"""Command to move the repeated texts of existing CSP reports to the shared texts."""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from cspreports.batches import iterate_in_batches
+from cspreports.interning import TEXT_FIELDS, intern_report_texts
+from cspreports.models import get_report_model
+
+CSPReport = get_report_model()
+
+DEFAULT_BATCH_SIZE = 1000
+UPDATED_FIELDS = tuple(field for fields in TEXT_FIELDS for field in fields)
+
+
+class Command(BaseCommand):
+    help = "Move the original policies and the user agents of existing CSP reports to the shared texts."
+
+    def add_arguments(self, parser):
+        """Parse command arguments."""
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help="Number of reports updated in a single batch. By default %(default)s.")
+
+    def handle(self, **options):
+        verbosity = options['verbosity']
+        batch_size = options['batch_size']
+
+        not_interned = Q()
+        for field, _ in TEXT_FIELDS:
+            not_interned |= Q(**{field + '__gt': ''})
+        queryset = CSPReport.objects.filter(not_interned).only('pk', *UPDATED_FIELDS)
+
+        updated = 0
+        for batch in iterate_in_batches(queryset, batch_size):
+            with transaction.atomic():
+                intern_report_texts(batch)
+                CSPReport.objects.bulk_update(batch, UPDATED_FIELDS)
+            updated += len(batch)
+            if verbosity >= 3:
+                self.stdout.write("Updated {} reports.".format(updated))
+
+        if verbosity >= 2:
+            self.stdout.write("Moved the texts of {} reports.".format(updated))
@@ -0,0 +1,86 @@
+"""Command to load spooled CSP reports to the database."""
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from cspreports.conf import app_settings
+from cspreports.parsing import ParsedReport
+from cspreports.spool import LOADING_SUFFIX, decode_line, get_closed_segments, recover_stale_segments
+from cspreports.utils import build_report, save_reports
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_RECOVER_AFTER = 3600
+
+
+class Command(BaseCommand):
+    help = "Load spooled CSP reports to the database."
+
+    def add_arguments(self, parser):
+        """Parse command arguments."""
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help="Number of reports saved in a single query. By default %(default)s.")
+        parser.add_argument(
+            '--include-open', action='store_true',
+            help="Load also the segments which are still open. Use only when no process is writing to the spool.")
+        parser.add_argument(
+            '--recover-after', type=int, default=DEFAULT_RECOVER_AFTER,
+            help="Number of seconds after which segments which aren't modified, either claimed by a loader which "
+                 "didn't finish or left open by a writer, are loaded again. By default %(default)s.")
+
+    def handle(self, **options):
+        verbosity = options['verbosity']
+        directory = app_settings.SPOOL_DIR
+        if not directory:
+            raise CommandError("CSP_REPORTS_SPOOL_DIR is not set.")
+
+        recovered = recover_stale_segments(directory, options['recover_after'])
+        if recovered and verbosity >= 1:
+            self.stdout.write("Recovered {} segments of a process which didn't finish.".format(recovered))
+        for path in get_closed_segments(directory, include_open=options['include_open']):
+            loading_path = os.path.splitext(path)[0] + LOADING_SUFFIX
+            try:
+                # Claim the segment, so it isn't loaded by another process.
+                os.rename(path, loading_path)
+            except FileNotFoundError:
+                continue
+            # Mark the time of the claim, see `recover_stale_segments`.
+            os.utime(loading_path)
+            try:
+                with transaction.atomic():
+                    loaded, skipped = self.load_segment(loading_path, options['batch_size'])
+            except Exception:
+                os.rename(loading_path, path)
+                raise
+            os.remove(loading_path)
+            if verbosity >= 2:
+                self.stdout.write("Loaded {} reports from {}, skipped {} invalid lines.".format(
+                    loaded, os.path.basename(path), skipped))
+
+    def load_segment(self, path, batch_size):
+        """Load a spool segment to the database and return the number of loaded and skipped lines."""
+        loaded = skipped = 0
+        batch = []
+        with open(path, 'rb') as segment:
+            for line in segment:
+                try:
+                    raw, user_agent, created, weight = decode_line(line)
+                except ValueError:
+                    # Most likely a line cut off by a crash of the writer.
+                    skipped += 1
+                    continue
+                parsed = ParsedReport(raw, user_agent)
+                parsed.weight = weight
+                report = build_report(parsed)
+                report.created = parse_datetime(created)
+                batch.append(report)
+                if len(batch) >= batch_size:
+                    save_reports(batch)
+                    loaded += len(batch)
+                    batch = []
+        if batch:
+            save_reports(batch)
+            loaded += len(batch)
+        return loaded, skipped
@@ -4,6 +4,7 @@ from datetime import timedelta
 from django.core.management.base import BaseCommand, CommandError
 from django.utils.encoding import force_str
 
+from cspreports.conf import app_settings
 from cspreports.summary import DEFAULT_TOP, collect
 from cspreports.utils import get_midnight, parse_date_input
 
@@ -33,11 +34,19 @@ class Command(BaseCommand):
         parser.add_argument(
             '--top', type=int, default=DEFAULT_TOP,
             help="Specifies the size of each section. By default %(default)s.")
+        parser.add_argument(
+            '--rollups', action='store_true',
+            help="Count the reports from the daily rollups, see the rollup_cspreports command.")
+        parser.add_argument(
+            '--streaming', action='store_true',
+            help="Count the reports by reading them in chunks instead of grouping them in the database.")
 
     def handle(self, **options):
+        if app_settings.AGGREGATE:
+            raise CommandError("The summary can't count the aggregated reports, CSP_REPORTS_AGGREGATE is set.")
         since = _parse_date_input(options['since'], 1)
         to = _parse_date_input(options['to'], 1) + timedelta(days=1)
         top = options['top']
 
-        summary = collect(since, to, top)
+        summary = collect(since, to, top, use_rollups=options['rollups'], streaming=options['streaming'])
         self.stdout.write(summary.render())
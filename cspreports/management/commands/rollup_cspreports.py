@@ -0,0 +1,35 @@
+"""Command to count CSP reports in the daily rollups."""
+from django.core.management.base import BaseCommand, CommandError
+
+from cspreports.conf import app_settings
+from cspreports.rollups import rollup_reports
+
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_DELAY = 300
+
+
+class Command(BaseCommand):
+    help = "Count new CSP reports in the daily rollups."
+
+    def add_arguments(self, parser):
+        """Parse command arguments."""
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help="Number of reports counted in a single transaction. By default %(default)s.")
+        parser.add_argument(
+            '--delay', type=int, default=DEFAULT_DELAY,
+            help="Number of seconds after which the reports are counted, so the reports saved by transactions "
+                 "which are still running aren't skipped. By default %(default)s.")
+
+    def handle(self, **options):
+        if app_settings.AGGREGATE:
+            raise CommandError("The rollups can't count the aggregated reports, CSP_REPORTS_AGGREGATE is set.")
+        verbosity = options['verbosity']
+
+        counted = 0
+        for count in rollup_reports(options['batch_size'], options['delay']):
+            counted += count
+            if verbosity >= 3:
+                self.stdout.write("Counted {} reports.".format(counted))
+        if verbosity >= 2:
+            self.stdout.write("Counted {} new reports in the rollups.".format(counted))
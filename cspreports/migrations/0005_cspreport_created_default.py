@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cspreports', '0004_cspreport_user_agent'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cspreport',
+            name='created',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cspreports', '0005_cspreport_created_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CSPViolation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=40, unique=True)),
+                ('document_root', models.TextField(blank=True)),
+                ('blocked_root', models.TextField(blank=True)),
+                ('violated_directive', models.TextField(blank=True)),
+                ('count', models.PositiveBigIntegerField(default=0)),
+                ('first_seen', models.DateTimeField()),
+                ('last_seen', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ('-last_seen',),
+            },
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:26
+
+from django.db import migrations, models
+
+from cspreports.migration_operations import AddIndexOnline
+
+# Names of the indexes of the fields, the same as Django gives to the indexes of `db_index` fields.
+FIELD_INDEXES = (
+    ('blocked_root', 'cspreports_cspreport_blocked_root_6414109d'),
+    ('document_root', 'cspreports_cspreport_document_root_43eedf4a'),
+    ('fingerprint', 'cspreports_cspreport_fingerprint_fcdc9173'),
+)
+
+
+class Migration(migrations.Migration):
+    # Indexes can't be created concurrently inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('cspreports', '0006_cspviolation'),
+    ]
+
+    operations = [
+        # The columns are added without indexes, which are then created without locking the table for writes.
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.AddField(
+                    model_name='cspreport',
+                    name='blocked_root',
+                    field=models.CharField(blank=True, max_length=255),
+                ),
+                migrations.AddField(
+                    model_name='cspreport',
+                    name='document_root',
+                    field=models.CharField(blank=True, max_length=255),
+                ),
+                migrations.AddField(
+                    model_name='cspreport',
+                    name='fingerprint',
+                    field=models.CharField(blank=True, max_length=40),
+                ),
+            ] + [
+                AddIndexOnline(model_name='cspreport', index=models.Index(fields=[field], name=name))
+                for field, name in FIELD_INDEXES
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='cspreport',
+                    name='blocked_root',
+                    field=models.CharField(blank=True, db_index=True, max_length=255),
+                ),
+                migrations.AddField(
+                    model_name='cspreport',
+                    name='document_root',
+                    field=models.CharField(blank=True, db_index=True, max_length=255),
+                ),
+                migrations.AddField(
+                    model_name='cspreport',
+                    name='fingerprint',
+                    field=models.CharField(blank=True, db_index=True, max_length=40),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:26
+from django.db import migrations, models
+
+from cspreports.migration_operations import AddIndexOnline
+
+
+class Migration(migrations.Migration):
+    # Indexes can't be created concurrently inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('cspreports', '0007_cspreport_normalised_fields'),
+    ]
+
+    operations = [
+        AddIndexOnline(
+            model_name='cspreport',
+            index=models.Index(fields=['created'], name='cspreports__created_ea0991_idx'),
+        ),
+        AddIndexOnline(
+            model_name='cspreport',
+            index=models.Index(fields=['is_valid', 'created'], name='cspreports__is_vali_1c27f9_idx'),
+        ),
+    ]
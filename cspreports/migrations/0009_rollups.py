@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cspreports', '0008_cspreport_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CSPRollupHighWaterMark',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_label', models.CharField(max_length=255, unique=True)),
+                ('last_pk', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CSPReportRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('fingerprint', models.CharField(max_length=40)),
+                ('is_valid', models.BooleanField()),
+                ('document_root', models.CharField(blank=True, max_length=255)),
+                ('blocked_root', models.CharField(blank=True, max_length=255)),
+                ('violated_directive', models.TextField(blank=True)),
+                ('count', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ('-day', '-count'),
+                'unique_together': {('day', 'fingerprint', 'is_valid')},
+            },
+        ),
+    ]
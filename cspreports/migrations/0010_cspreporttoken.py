@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cspreports', '0009_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CSPReportToken',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report_id', models.BigIntegerField()),
+                ('field', models.CharField(max_length=20)),
+                ('token', models.CharField(max_length=255)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'field'], name='cspreports__token_62b136_idx'), models.Index(fields=['report_id'], name='cspreports__report__6ef798_idx')],
+            },
+        ),
+    ]
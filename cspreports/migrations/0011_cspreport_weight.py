@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cspreports', '0010_cspreporttoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cspreport',
+            name='weight',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
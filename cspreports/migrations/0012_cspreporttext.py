@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cspreports', '0011_cspreport_weight'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CSPReportText',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hash', models.CharField(max_length=40, unique=True)),
+                ('value', models.TextField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='cspreport',
+            name='original_policy_text',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='cspreports.cspreporttext'),
+        ),
+        migrations.AddField(
+            model_name='cspreport',
+            name='user_agent_text',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='cspreports.cspreporttext'),
+        ),
+    ]
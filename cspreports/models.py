@@ -1,21 +1,25 @@
-# STANDARD LIB
-import json
-
 # Third party
 from django.apps import apps
-from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.exceptions import ImproperlyConfigured
 from django.db import models
+from django.utils import timezone
 from django.utils.html import escape
 from django.utils.safestring import mark_safe
 
 # CSP Reports
+from cspreports import codec
 from cspreports.conf import app_settings
+from cspreports.decoding import get_decoder
+from cspreports.fingerprints import get_fingerprint, get_root_uri
+from cspreports.parsing import REPORTING_API_TYPE, get_csp_report
 
 DISPOSITIONS = (
     ("enforce", "enforce"),
     ("report", "report"),
 )
 
+ROOT_URI_MAX_LENGTH = 255
+
 # Map of required CSP report fields to model fields
 REQUIRED_FIELDS = (
     ("document-uri", "document_uri"),
@@ -42,6 +46,7 @@ class CSPReportBase(models.Model):
     @ivar modified: Date and time of last modification.
     @ivar json: Raw CSP report
     @ivar is_valid: Whether the CSP report is valid.
+    @ivar weight: Number of received reports the report stands for, see `cspreports.sampling`.
 
     All report fields are NULL is report is invalid.
     Report fields are NULL if the report follows the rules of lower protocol level.
@@ -62,17 +67,33 @@ class CSPReportBase(models.Model):
 
     CSP 3.0 fields
     @ivar disposition: The disposition of violation's policy.
+
+    Normalised fields
+    @ivar document_root: Root URI of the protected resource.
+    @ivar blocked_root: Root URI of the blocked resource.
+    @ivar fingerprint: Fingerprint of the violation, see `cspreports.fingerprints.get_fingerprint`.
+
+    Shared texts, see `cspreports.interning`
+    @ivar original_policy_text: The original policy, if it's moved out of the report.
+    @ivar user_agent_text: The user agent, if it's moved out of the report.
     """
 
     class Meta:
         ordering = ("-created",)
         abstract = True
+        # Unnamed, so each concrete model gets its own index names.
+        indexes = (
+            models.Index(fields=("created",)),
+            models.Index(fields=("is_valid", "created")),
+        )
 
-    created = models.DateTimeField(auto_now_add=True)
+    # Not `auto_now_add`, so that reports which are saved later in bulk keep the time they were received.
+    created = models.DateTimeField(default=timezone.now, editable=False)
     modified = models.DateTimeField(auto_now=True)
     user_agent = models.TextField(blank=True)
     json = models.TextField()
     is_valid = models.BooleanField(default=False)
+    weight = models.PositiveIntegerField(default=1)
     # Individual report fields - use `TextField` because there are no limits by any specification for these fields.
     document_uri = models.TextField(blank=True, null=True)
     referrer = models.TextField(blank=True, null=True)
@@ -85,6 +106,15 @@ class CSPReportBase(models.Model):
     line_number = models.PositiveIntegerField(blank=True, null=True)
     column_number = models.PositiveIntegerField(blank=True, null=True)
     disposition = models.CharField(max_length=10, blank=True, null=True, choices=DISPOSITIONS)
+    # Normalised report fields for grouping of violations, see `update_normalised_fields`.
+    document_root = models.CharField(max_length=ROOT_URI_MAX_LENGTH, blank=True, db_index=True)
+    blocked_root = models.CharField(max_length=ROOT_URI_MAX_LENGTH, blank=True, db_index=True)
+    fingerprint = models.CharField(max_length=40, blank=True, db_index=True)
+    # Texts shared by many reports, which replace the report fields when CSP_REPORTS_INTERN_TEXTS is enabled.
+    original_policy_text = models.ForeignKey("cspreports.CSPReportText", models.PROTECT, blank=True, null=True,
+                                             related_name="+")
+    user_agent_text = models.ForeignKey("cspreports.CSPReportText", models.PROTECT, blank=True, null=True,
+                                        related_name="+")
 
     @property
     def nice_report(self):
@@ -92,12 +122,14 @@ class CSPReportBase(models.Model):
         if not self.json:
             return "[no CSP report data]"
         try:
-            data = json.loads(self.json)
+            data = codec.loads(self.json)
         except ValueError:
             return "Invalid CSP report: '{}'".format(self.json)
-        if "csp-report" not in data:
-            return "Invalid CSP report: " + json.dumps(data, indent=4, sort_keys=True, separators=(",", ": "))
-        return json.dumps(data["csp-report"], indent=4, sort_keys=True, separators=(",", ": "))
+        if isinstance(data, dict) and "csp-report" in data:
+            return codec.dumps_formatted(data["csp-report"])
+        if isinstance(data, dict) and data.get("type") == REPORTING_API_TYPE and "body" in data:
+            return codec.dumps_formatted(data["body"])
+        return "Invalid CSP report: " + codec.dumps_formatted(data)
 
     def __str__(self):
         return self.nice_report
@@ -111,37 +143,32 @@ class CSPReportBase(models.Model):
         @param message: JSON encoded CSP report.
         @type message: text
         """
-        self = cls(json=message)
         try:
-            decoded_data = json.loads(message)
+            decoded_data = codec.loads(message)
         except ValueError:
             # Message is not a valid JSON. Return as invalid.
+            self = cls(json=message)
+            # The same fingerprint as `save` sets, so reports created in bulk are grouped the same.
+            self.update_normalised_fields()
             return self
-        try:
-            report_data = decoded_data["csp-report"]
-        except KeyError:
+        return cls.from_decoded(message, decoded_data)
+
+    @classmethod
+    def from_decoded(cls, message, decoded_data):
+        """Creates an instance from CSP report message which has already been decoded.
+
+        @param message: JSON encoded CSP report.
+        @type message: text
+        @param decoded_data: The message decoded from JSON.
+        """
+        self = cls(json=message)
+        report_data = get_csp_report(decoded_data)
+        if report_data is None:
             # Message is not a valid CSP report. Return as invalid.
+            self.update_normalised_fields()
             return self
 
-        is_valid = True
-
-        fields = REQUIRED_FIELDS + OPTIONAL_FIELDS
-        for json_field_name, django_field_name in fields:
-            value = report_data.get(json_field_name)
-            # Try to pass the value through as much of Django's coercion/cleaning as possible, but
-            # if the data is not entirely valid that's not a reason to not still save the report
-            # if we can; even if the data isn't perfect, some information is better than none.
-            to_python = cls._meta.get_field(django_field_name).to_python
-            clean = cls._meta.get_field(django_field_name).clean
-            try:
-                value = to_python(value)
-                # If the first conversion step worked, then store the value, even if the next
-                # conversion fails
-                setattr(self, django_field_name, value)
-                value = clean(value, model_instance=self)
-                setattr(self, django_field_name, value)
-            except ValidationError:
-                is_valid = False
+        is_valid = get_decoder(cls, REQUIRED_FIELDS + OPTIONAL_FIELDS).decode(self, report_data)
 
         # Go through the REQUIRED_FIELDS list and make sure that a valid value was supplied for
         # each of them. Note that for str-type fields we treat a value of "" as valid, but if the
@@ -156,16 +183,42 @@ class CSPReportBase(models.Model):
                 is_valid = False
                 break
         self.is_valid = is_valid
+        self.update_normalised_fields()
 
         return self
 
+    def update_normalised_fields(self):
+        """Update the root URIs and the fingerprint of the violation from the report fields.
+
+        The root URIs are truncated to fit their columns.
+        """
+        self.document_root = get_root_uri(self.document_uri)[:ROOT_URI_MAX_LENGTH]
+        self.blocked_root = get_root_uri(self.blocked_uri)[:ROOT_URI_MAX_LENGTH]
+        self.fingerprint = get_fingerprint(self.document_uri, self.blocked_uri, self.violated_directive)
+
+    def get_original_policy(self):
+        """Return the original policy, whether it's stored in the report or in the shared texts."""
+        if self.original_policy_text_id is not None:
+            return self.original_policy_text.value
+        return self.original_policy
+
+    def get_user_agent(self):
+        """Return the user agent, whether it's stored in the report or in the shared texts."""
+        if self.user_agent_text_id is not None:
+            return self.user_agent_text.value
+        return self.user_agent
+
+    def save(self, *args, **kwargs):
+        self.update_normalised_fields()
+        super().save(*args, **kwargs)
+
     @property
     def data(self):
         """Returns self.json loaded as a python object."""
         try:
             data = self._data
         except AttributeError:
-            data = self._data = json.loads(self.json)
+            data = self._data = codec.loads(self.json)
         return data
 
     def json_as_html(self):
@@ -182,6 +235,113 @@ class CSPReport(CSPReportBase):
     pass
 
 
+class CSPViolation(models.Model):
+    """Aggregate of CSP reports of the same violation.
+
+    @ivar fingerprint: Fingerprint of the violation, see `cspreports.fingerprints.get_fingerprint`.
+    @ivar document_root: Root URI of the protected resource.
+    @ivar blocked_root: Root URI of the blocked resource.
+    @ivar violated_directive: The policy directive that was violated.
+    @ivar count: Number of reports of the violation.
+    @ivar first_seen: Date and time of the first report of the violation.
+    @ivar last_seen: Date and time of the last report of the violation.
+    """
+
+    class Meta:
+        ordering = ("-last_seen",)
+
+    fingerprint = models.CharField(max_length=40, unique=True)
+    document_root = models.TextField(blank=True)
+    blocked_root = models.TextField(blank=True)
+    violated_directive = models.TextField(blank=True)
+    count = models.PositiveBigIntegerField(default=0)
+    first_seen = models.DateTimeField()
+    last_seen = models.DateTimeField()
+
+    def __str__(self):
+        return "{} blocked {} ({})".format(self.document_root, self.blocked_root, self.violated_directive)
+
+
+class CSPReportRollup(models.Model):
+    """Daily count of CSP reports of the same violation.
+
+    @ivar day: Date of the reports.
+    @ivar fingerprint: Fingerprint of the violation, see `cspreports.fingerprints.get_fingerprint`.
+    @ivar is_valid: Whether the reports are valid.
+    @ivar document_root: Root URI of the protected resource.
+    @ivar blocked_root: Root URI of the blocked resource.
+    @ivar violated_directive: The policy directive that was violated.
+    @ivar count: Number of the reports.
+    """
+
+    class Meta:
+        ordering = ("-day", "-count")
+        unique_together = (("day", "fingerprint", "is_valid"), )
+
+    day = models.DateField()
+    fingerprint = models.CharField(max_length=40)
+    is_valid = models.BooleanField()
+    document_root = models.CharField(max_length=ROOT_URI_MAX_LENGTH, blank=True)
+    blocked_root = models.CharField(max_length=ROOT_URI_MAX_LENGTH, blank=True)
+    violated_directive = models.TextField(blank=True)
+    count = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return "{}: {} blocked {} ({})".format(self.day, self.document_root, self.blocked_root, self.count)
+
+
+class CSPRollupHighWaterMark(models.Model):
+    """The last report which was counted in the rollups.
+
+    @ivar model_label: Label of the report model.
+    @ivar last_pk: Primary key of the last counted report.
+    """
+
+    model_label = models.CharField(max_length=255, unique=True)
+    last_pk = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return "{}: {}".format(self.model_label, self.last_pk)
+
+
+class CSPReportToken(models.Model):
+    """Search token of a CSP report, see `cspreports.search`.
+
+    The report is referred by its primary key only, because the report model is configurable.
+
+    @ivar report_id: Primary key of the report.
+    @ivar field: Name of the report field the token comes from.
+    @ivar token: Normalised token, e.g. a host name or a directive.
+    """
+
+    class Meta:
+        indexes = (
+            models.Index(fields=("token", "field")),
+            models.Index(fields=("report_id",)),
+        )
+
+    report_id = models.BigIntegerField()
+    field = models.CharField(max_length=20)
+    token = models.CharField(max_length=ROOT_URI_MAX_LENGTH)
+
+    def __str__(self):
+        return "{}:{}".format(self.field, self.token)
+
+
+class CSPReportText(models.Model):
+    """Text shared by many CSP reports, e.g. an original policy or a user agent, see `cspreports.interning`.
+
+    @ivar hash: SHA-1 hash of the text.
+    @ivar value: The text.
+    """
+
+    hash = models.CharField(max_length=40, unique=True)
+    value = models.TextField()
+
+    def __str__(self):
+        return self.value
+
+
 def get_report_model():
     model_string = app_settings.CSP_REPORT_MODEL
     try:
@@ -0,0 +1,50 @@
+"""Paginators for large report tables."""
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def get_estimated_count(model, using):
+    """Return the row count of the model table estimated by the database, `None` if not available.
+
+    The estimate is read from the database statistics, so it doesn't scan the table.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == "postgresql":
+        query = "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)"
+        params = [connection.ops.quote_name(table)]
+    elif connection.vendor == "mysql":
+        query = "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s"
+        params = [table]
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(query, params)
+        row = cursor.fetchone()
+    # PostgreSQL returns -1 for tables which were never analyzed.
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator which estimates the number of objects of large unfiltered querysets.
+
+    An exact count requires a full scan of the table on most databases. Unfiltered querysets of tables
+    with at least `estimate_threshold` rows according to the database statistics are not counted, the
+    estimate is used instead. Smaller tables and filtered querysets are counted exactly.
+
+    @ivar estimate_threshold: Minimal estimated number of rows for which the estimate is used.
+    """
+
+    estimate_threshold = 100000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, "query", None)
+        if query is not None and not query.where and not query.is_sliced:
+            estimate = get_estimated_count(self.object_list.model, self.object_list.db)
+            if estimate is not None and estimate >= self.estimate_threshold:
+                return estimate
+        return super().count
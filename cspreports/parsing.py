@@ -0,0 +1,175 @@
+"""Parsing of received CSP reports."""
+from django.conf import settings
+
+from cspreports import codec
+
+REPORTING_API_CONTENT_TYPE = "application/reports+json"
+REPORTING_API_TYPE = "csp-violation"
+# Map of the Reporting API report body fields to the 'csp-report' fields
+REPORTING_API_FIELDS = (
+    ("documentURL", "document-uri"),
+    ("referrer", "referrer"),
+    ("blockedURL", "blocked-uri"),
+    # The Reporting API has only the effective directive, which is what CSP 3 reports as violated.
+    ("effectiveDirective", "violated-directive"),
+    ("effectiveDirective", "effective-directive"),
+    ("originalPolicy", "original-policy"),
+    ("disposition", "disposition"),
+    ("sourceFile", "source-file"),
+    ("statusCode", "status-code"),
+    ("lineNumber", "line-number"),
+    ("columnNumber", "column-number"),
+    ("sample", "script-sample"),
+)
+
+_UNPARSED = object()
+
+
+def get_csp_report(data):
+    """Return the 'csp-report' fields of a decoded report, `None` if it isn't a CSP report.
+
+    Both the 'csp-report' reports and the Reporting API 'csp-violation' reports are supported, the
+    fields of the latter are mapped to the 'csp-report' field names.
+    """
+    if not isinstance(data, dict):
+        return None
+    if "csp-report" in data:
+        report = data["csp-report"]
+        return report if isinstance(report, dict) else None
+    body = data.get("body")
+    if data.get("type") == REPORTING_API_TYPE and isinstance(body, dict):
+        return {name: body[api_name] for api_name, name in REPORTING_API_FIELDS if api_name in body}
+    return None
+
+
+class ParsedReport:
+    """A CSP report received by the report view.
+
+    The report is decoded and parsed lazily and at most once, so a single instance can be passed
+    through all the stages of report processing.
+
+    @ivar request: The HTTP request which delivered the report, may be `None`.
+    @ivar raw: The report as a text.
+    @ivar data: The report decoded from JSON, `None` if the report is not a valid JSON.
+    @ivar user_agent: The user agent which sent the report.
+    @ivar is_valid: Whether the report is a valid JSON.
+    @ivar weight: Number of received reports the report stands for, see `cspreports.sampling`.
+    """
+
+    __slots__ = ("request", "user_agent", "weight", "_raw", "_data", "_is_valid", "_formatted")
+
+    def __init__(self, raw=None, user_agent="", request=None):
+        self.request = request
+        self.user_agent = user_agent
+        self.weight = 1
+        self._raw = raw
+        self._data = _UNPARSED
+        self._is_valid = False
+        self._formatted = None
+
+    @classmethod
+    def from_request(cls, request):
+        """Return a parsed report for a HTTP request, the body is not read until it's needed."""
+        return cls(user_agent=request.META.get("HTTP_USER_AGENT", ""), request=request)
+
+    @classmethod
+    def from_data(cls, data, user_agent="", request=None):
+        """Return a parsed report for already decoded data."""
+        self = cls(codec.dumps(data), user_agent=user_agent, request=request)
+        self._data = data
+        self._is_valid = True
+        return self
+
+    @property
+    def raw(self):
+        if self._raw is None:
+            self.read_body()
+        return self._raw
+
+    def read_body(self):
+        """Read the report from the body of the request, unless it's been read already.
+
+        The body isn't available once the response has been sent, so the reports processed after
+        that must read it before.
+        """
+        if self._raw is not None:
+            return
+        raw = self.request.body
+        if isinstance(raw, bytes):
+            raw = raw.decode(self.request.encoding or settings.DEFAULT_CHARSET, errors="replace")
+        self._raw = raw
+
+    def _parse(self):
+        try:
+            self._data = codec.loads(self.raw)
+            self._is_valid = True
+        except ValueError:
+            self._data = None
+
+    @property
+    def data(self):
+        if self._data is _UNPARSED:
+            self._parse()
+        return self._data
+
+    @property
+    def is_valid(self):
+        if self._data is _UNPARSED:
+            self._parse()
+        return self._is_valid
+
+    @property
+    def csp_report(self):
+        """Return the fields of the 'csp-report' object, empty dictionary if there's none.
+
+        The fields of the Reporting API reports are mapped to the 'csp-report' field names.
+        """
+        return get_csp_report(self.data) or {}
+
+    @property
+    def formatted(self):
+        """Return the report nicely formatted (i.e. with indentation)."""
+        if self._formatted is None:
+            if self.is_valid:
+                self._formatted = codec.dumps_formatted(self.data)
+            else:
+                self._formatted = "Invalid JSON. Raw dump is below.\n\n" + self.raw
+        return self._formatted
+
+
+def parse_reports(request):
+    """Return a list of `ParsedReport`s delivered by the HTTP request.
+
+    Reporting API requests may deliver a batch of reports, only its CSP violation reports are
+    returned. Other requests deliver a single report, which is not parsed until it's needed.
+    """
+    report = ParsedReport.from_request(request)
+    if request.content_type != REPORTING_API_CONTENT_TYPE or not isinstance(report.data, list):
+        return [report]
+    return [
+        ParsedReport.from_data(item, user_agent=item.get("user_agent") or report.user_agent, request=request)
+        for item in report.data if isinstance(item, dict) and item.get("type") == REPORTING_API_TYPE
+    ]
+
+
+def parsed_report_handler(function):
+    """Mark a filter function or an additional handler as accepting a `ParsedReport`.
+
+    Functions which are not marked are passed the `HttpRequest` of the CSP report.
+    """
+    function.accepts_parsed_report = True
+    return function
+
+
+def to_parsed_report(report_or_request):
+    """Return a `ParsedReport` for either a `ParsedReport` or a `HttpRequest`."""
+    if isinstance(report_or_request, ParsedReport):
+        return report_or_request
+    return ParsedReport.from_request(report_or_request)
+
+
+def call_handler(handler, report):
+    """Call the filter function or handler with the argument matching its signature."""
+    if getattr(handler, "accepts_parsed_report", False):
+        return handler(report)
+    return handler(report.request)
@@ -0,0 +1,154 @@
+"""Processing pipeline of CSP reports resolved from the settings.
+
+The pipeline is built once when the app is ready - the filter function and the additional handlers
+are imported and the enabled stages are bound in their order with their options - so the
+validation and the processing of a report don't look up any settings. It's rebuilt on the first use
+after any of the CSP_REPORTS_* settings changes. The components built from the settings, such as
+the save buffer or the spool writer, are replaced as well.
+"""
+import threading
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from cspreports import codec, interning, sampling, throttling, utils
+from cspreports.conf import HANDLERS_POOL, app_settings
+from cspreports.rules import get_filter_rules
+
+SETTINGS_PREFIX = "CSP_REPORTS_"
+
+
+def _call_each(function, reports):
+    for report in reports:
+        function(report)
+
+
+def _await_each(function, reports):
+    return [function(report) for report in reports]
+
+
+class Pipeline:
+    """The stages of the report processing enabled by the settings.
+
+    The instances are not modified once they are built.
+
+    @ivar content_types: Accepted content types of the report requests, `None` if any is accepted.
+    @ivar max_body_size: Maximal size of the report requests, `None` if there's no limit.
+    @ivar max_json_depth: Maximal depth of the reports, `None` if there's no limit.
+    @ivar rate_limits: The rate limits, see `cspreports.throttling.get_rate_limits`.
+    @ivar rate_limit_cache: Name of the cache of the rate limits.
+    @ivar filter_rules: The `CompiledRules` of the filter rules, `None` if there are none.
+    @ivar filter_function: The filter function, `None` if there's none.
+    @ivar sample: Whether the reports are sampled.
+    @ivar sample_options: The `SampleOptions` of the sampling.
+    @ivar save_options: The `SaveOptions` of the saved reports.
+    @ivar stages: Tuple of functions called with the list of `ParsedReport`s which should be processed.
+    @ivar async_stages: Tuple of functions which return a list of awaitables for the list of
+        `ParsedReport`s which should be processed.
+    @ivar additional_handlers: Tuple of the additional handler functions.
+    @ivar handler_pool: The `HandlerPool` which runs the additional handlers, `None` if they are
+        called directly.
+    """
+
+    __slots__ = ("content_types", "max_body_size", "max_json_depth", "rate_limits", "rate_limit_cache",
+                 "filter_rules", "filter_function", "sample", "sample_options", "save_options", "stages",
+                 "async_stages", "additional_handlers", "handler_pool")
+
+    def __init__(self):
+        self.content_types = app_settings.CONTENT_TYPES
+        self.max_body_size = app_settings.MAX_BODY_SIZE
+        self.max_json_depth = app_settings.MAX_JSON_DEPTH
+        self.rate_limits = throttling.get_rate_limits()
+        self.rate_limit_cache = app_settings.RATE_LIMIT_CACHE
+        self.filter_rules = get_filter_rules()
+        self.filter_function = None
+        if app_settings.FILTER_FUNCTION:
+            self.filter_function = utils.import_from_dotted_path(app_settings.FILTER_FUNCTION)
+        self.sample = sampling.is_enabled()
+        self.sample_options = sampling.get_sample_options()
+        self.save_options = utils.get_save_options()
+        self.additional_handlers = tuple(
+            utils.import_from_dotted_path(name) for name in app_settings.ADDITIONAL_HANDLERS)
+        self.handler_pool = None
+        if self.additional_handlers and app_settings.ADDITIONAL_HANDLERS_MODE == HANDLERS_POOL:
+            self.handler_pool = utils.get_handler_pool()
+
+        stages = []
+        async_stages = []
+        if app_settings.EMAIL_ADMINS:
+            email_admins = partial(utils.email_admins, mode=app_settings.EMAIL_ADMINS)
+            stages.append(partial(_call_each, email_admins))
+            async_stages.append(partial(_await_each, sync_to_async(email_admins, thread_sensitive=False)))
+        if app_settings.LOG:
+            log_report = partial(utils.log_report, level_name=app_settings.LOG_LEVEL,
+                                 log_format=app_settings.LOG_FORMAT)
+            stages.append(partial(_call_each, log_report))
+            async_stages.append(partial(_await_each, sync_to_async(log_report, thread_sensitive=False)))
+        if app_settings.SAVE:
+            save_report = partial(utils.save_report, mode=app_settings.SAVE, options=self.save_options)
+            # The ORM must be used from the thread-sensitive context.
+            save_report_async = sync_to_async(save_report)
+            stages.append(save_report)
+            async_stages.append(lambda reports: [save_report_async(reports)])
+        if self.additional_handlers:
+            stages.append(partial(_call_each, utils.run_additional_handlers))
+            async_stages.append(partial(_await_each, utils.run_additional_handlers_async))
+        self.stages = tuple(stages)
+        self.async_stages = tuple(async_stages)
+
+
+_pipeline = None
+_pipeline_generation = 0
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline():
+    """Return the `Pipeline` of the current settings."""
+    pipeline = _pipeline
+    if pipeline is None:
+        pipeline = _build_pipeline()
+    return pipeline
+
+
+def _build_pipeline():
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is not None:
+            return _pipeline
+        generation = _pipeline_generation
+    pipeline = Pipeline()
+    with _pipeline_lock:
+        # Don't keep a pipeline of settings which changed while it was built.
+        if generation == _pipeline_generation:
+            _pipeline = pipeline
+    return pipeline
+
+
+@receiver(setting_changed)
+def reset_pipeline(setting, **kwargs):
+    """Drop the pipeline when a CSP_REPORTS_* setting changes, it's rebuilt on its next use."""
+    global _pipeline, _pipeline_generation
+    if not setting.startswith(SETTINGS_PREFIX):
+        return
+    with _pipeline_lock:
+        _pipeline = None
+        _pipeline_generation += 1
+    reset_components(setting)
+
+
+def reset_components(setting):
+    """Replace the components built from the changed setting."""
+    if setting == "CSP_REPORTS_JSON_BACKEND":
+        codec.reset_backend()
+    elif setting == "CSP_REPORTS_TEXT_CACHE_SIZE":
+        interning.reset_text_cache()
+    elif setting.startswith("CSP_REPORTS_EMAIL_DIGEST_"):
+        utils.reset_email_digest()
+    elif setting.startswith("CSP_REPORTS_BUFFER_"):
+        utils.reset_save_buffer()
+    elif setting.startswith("CSP_REPORTS_SPOOL_"):
+        utils.reset_spool_writer()
+    elif setting.startswith("CSP_REPORTS_HANDLER_"):
+        utils.reset_handler_pool()
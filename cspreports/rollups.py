@@ -0,0 +1,63 @@
+"""Incremental daily rollups of CSP reports."""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils.timezone import now
+
+from cspreports.models import CSPReportRollup, CSPRollupHighWaterMark, get_report_model
+
+CSPReport = get_report_model()
+
+ROLLUP_FIELDS = ("fingerprint", "is_valid", "document_root", "blocked_root", "violated_directive")
+
+
+def rollup_reports(batch_size, delay=0):
+    """Count the reports which were not counted yet in the daily rollups.
+
+    The reports are counted in batches ordered by primary key. Each batch is counted in a single
+    transaction together with the update of the high-water mark, so the rollup can be interrupted
+    and run again without counting any report twice. Reports saved with a lower primary key than
+    the high-water mark (e.g. by a transaction which committed late) are not counted, so the rollup
+    stops at the first report created less than `delay` seconds ago. Reports of the transactions
+    which take less than the delay are thus all counted.
+
+    Yields the number of reports counted in each batch.
+    """
+    CSPRollupHighWaterMark.objects.get_or_create(model_label=CSPReport._meta.label)
+    cutoff = now() - timedelta(seconds=delay)
+    while True:
+        with transaction.atomic():
+            mark = CSPRollupHighWaterMark.objects.select_for_update().get(model_label=CSPReport._meta.label)
+            queryset = CSPReport.objects.filter(pk__gt=mark.last_pk).order_by("pk")
+            recent_pk = queryset.filter(created__gte=cutoff).values_list("pk", flat=True).first()
+            if recent_pk is not None:
+                queryset = queryset.filter(pk__lt=recent_pk)
+            last_pk = queryset.values_list("pk", flat=True)[batch_size - 1:batch_size].first()
+            if last_pk is None:
+                last_pk = queryset.values_list("pk", flat=True).last()
+                if last_pk is None:
+                    return
+            count = rollup_batch(queryset.filter(pk__lte=last_pk))
+            mark.last_pk = last_pk
+            mark.save(update_fields=("last_pk", ))
+        yield count
+
+
+def rollup_batch(queryset):
+    """Add the reports in the queryset to the rollups and return their number.
+
+    The reports are counted by their weights, see `cspreports.sampling`.
+    """
+    groups = queryset.order_by().annotate(day=TruncDate("created")).values("day", *ROLLUP_FIELDS).annotate(
+        count=Sum("weight"), reports=Count("pk"))
+    total = 0
+    for group in groups:
+        count = group.pop("count")
+        total += group.pop("reports")
+        group["violated_directive"] = group["violated_directive"] or ""
+        key = {"day": group["day"], "fingerprint": group["fingerprint"], "is_valid": group["is_valid"]}
+        if not CSPReportRollup.objects.filter(**key).update(count=F("count") + count):
+            CSPReportRollup.objects.create(count=count, **group)
+    return total
@@ -0,0 +1,150 @@
+"""Declarative filter rules of CSP reports, see the CSP_REPORTS_FILTER_RULES setting.
+
+Each rule is a dictionary with an optional `name`, the `field` of the 'csp-report' it matches and
+one of the conditions:
+
+* `prefix` - the field starts with the prefix,
+* `host` - the host name of the URI in the field is the domain or its subdomain,
+* `regex` - the regular expression matches the field (by `re.search`),
+* `directive` - the name of the violated directive is equal, the field isn't used,
+* `disposition` - the disposition of the report is equal, the field isn't used.
+
+The condition may be a single value or a list of values. Reports matched by any of the rules are
+filtered out.
+
+The rules are compiled once to a few lookups per field - a combined regular expression for the
+prefixes and dictionaries for the hosts, directives and dispositions - so the cost of a report
+doesn't grow much with the number of those rules. The regexes are compiled each on its own, so
+their flags, groups and backreferences keep their meaning.
+"""
+import re
+from urllib.parse import urlsplit
+
+from django.core.exceptions import ImproperlyConfigured
+
+from cspreports import stats
+from cspreports.conf import app_settings
+from cspreports.fingerprints import get_directive
+
+CONDITIONS = ("prefix", "host", "regex", "directive", "disposition")
+# Name of the stats counter of the rule hits
+HIT_COUNTER = "filter_rules.{}"
+
+
+class CompiledRules:
+    """The filter rules compiled for a fast matching.
+
+    @ivar names: List of the rule names, indexed by the rule number.
+    """
+
+    def __init__(self, rules):
+        self.names = []
+        patterns = {}
+        self._regexes = {}
+        self._hosts = {}
+        self._directives = {}
+        self._dispositions = {}
+        for number, rule in enumerate(rules):
+            self.names.append(rule.get("name") or "rule{}".format(number))
+            conditions = [condition for condition in CONDITIONS if condition in rule]
+            if len(conditions) != 1:
+                raise ImproperlyConfigured(
+                    "Filter rule {} must have exactly one of {}.".format(self.names[-1], ", ".join(CONDITIONS)))
+            condition = conditions[0]
+            values = rule[condition]
+            if isinstance(values, str):
+                values = [values]
+            if condition == "directive":
+                self._directives.update((value, number) for value in values)
+            elif condition == "disposition":
+                self._dispositions.update((value, number) for value in values)
+            else:
+                field = rule.get("field")
+                if not field:
+                    raise ImproperlyConfigured("Filter rule {} must have a field.".format(self.names[-1]))
+                if condition == "host":
+                    self._hosts.setdefault(field, {}).update((value.lower(), number) for value in values)
+                elif condition == "prefix":
+                    alternatives = "|".join(re.escape(value) for value in values)
+                    patterns.setdefault(field, []).append(r"(?P<r{}>^(?:{}))".format(number, alternatives))
+                else:
+                    regexes = self._regexes.setdefault(field, [])
+                    for value in values:
+                        try:
+                            regexes.append((re.compile(value), number))
+                        except re.error as error:
+                            raise ImproperlyConfigured("Invalid regular expression in filter rule {}: {}".format(
+                                self.names[-1], error))
+        # Only the escaped prefixes are combined, so the group names can't collide.
+        self._patterns = {field: re.compile("|".join(field_patterns)) for field, field_patterns in patterns.items()}
+
+    def match(self, csp_report):
+        """Return the number of a rule which matches the 'csp-report' fields, `None` if there's none."""
+        if self._directives:
+            number = self._directives.get(get_directive(csp_report))
+            if number is not None:
+                return number
+        if self._dispositions:
+            disposition = csp_report.get("disposition")
+            number = self._dispositions.get(disposition) if isinstance(disposition, str) else None
+            if number is not None:
+                return number
+        for match_field, lookups in ((self._match_hosts, self._hosts), (self._match_pattern, self._patterns),
+                                     (self._match_regexes, self._regexes)):
+            for field, lookup in lookups.items():
+                value = csp_report.get(field)
+                if not isinstance(value, str):
+                    continue
+                number = match_field(lookup, value)
+                if number is not None:
+                    return number
+        return None
+
+    def _match_hosts(self, hosts, value):
+        try:
+            labels = (urlsplit(value).hostname or "").split(".")
+        except ValueError:
+            return None
+        for index in range(len(labels)):
+            number = hosts.get(".".join(labels[index:]))
+            if number is not None:
+                return number
+        return None
+
+    def _match_pattern(self, pattern, value):
+        match = pattern.search(value)
+        return None if match is None else int(match.lastgroup[1:])
+
+    def _match_regexes(self, regexes, value):
+        for regex, number in regexes:
+            if regex.search(value):
+                return number
+        return None
+
+    def should_process(self, report):
+        """Return whether the `ParsedReport` passes the rules, count the hit of the matching rule."""
+        csp_report = report.csp_report
+        if not csp_report:
+            return True
+        number = self.match(csp_report)
+        if number is None:
+            return True
+        stats.increment(HIT_COUNTER.format(self.names[number]))
+        return False
+
+
+_compiled_rules = None
+_compiled_from = None
+
+
+def get_filter_rules():
+    """Return the `CompiledRules` of the CSP_REPORTS_FILTER_RULES setting, `None` if there are no rules.
+
+    The rules are compiled only once, unless the setting changes.
+    """
+    global _compiled_rules, _compiled_from
+    rules = app_settings.FILTER_RULES
+    if rules is not _compiled_from:
+        _compiled_rules = CompiledRules(rules) if rules else None
+        _compiled_from = rules
+    return _compiled_rules
@@ -0,0 +1,99 @@
+"""Sampling of reports of frequent violations.
+
+The first report of each violation is always kept. The later reports of the violation are kept
+with the probability given by the sample rate, each kept report then stands for `1 / rate` received
+reports. The number is stored as the weight of the report, so the summaries and the rollups still
+count estimates of the received reports.
+"""
+import random
+from collections import namedtuple
+
+from django.core.cache import caches
+
+from cspreports import stats
+from cspreports.conf import app_settings
+from cspreports.fingerprints import get_directive, get_report_fingerprint
+
+FIRST_SEEN_KEY = "cspreports:seen:{}"
+
+# Options of the sampling, see `get_sample_options`.
+SampleOptions = namedtuple("SampleOptions", ("rate", "rates", "cache", "first_seen_timeout"))
+
+
+def is_enabled():
+    """Return whether the reports are sampled."""
+    return app_settings.SAMPLE_RATE < 1 or bool(app_settings.SAMPLE_RATES)
+
+
+def get_sample_options():
+    """Return the `SampleOptions` of the current settings."""
+    return SampleOptions(
+        rate=app_settings.SAMPLE_RATE,
+        rates=app_settings.SAMPLE_RATES,
+        cache=app_settings.SAMPLE_CACHE,
+        first_seen_timeout=app_settings.SAMPLE_FIRST_SEEN_TIMEOUT,
+    )
+
+
+def get_sample_rate(fingerprint, directive, options=None):
+    """Return the sample rate of a violation, set either by its fingerprint or by its directive.
+
+    @param options: The `SampleOptions`, by default they are read from the settings.
+    """
+    if options is None:
+        options = get_sample_options()
+    if fingerprint in options.rates:
+        return options.rates[fingerprint]
+    return options.rates.get(directive, options.rate)
+
+
+def get_weight(rate):
+    """Return the weight of the reports sampled at the rate, `None` if no reports are kept.
+
+    The weight is an integer, the rate is effectively rounded to `1 / weight`.
+    """
+    if rate >= 1:
+        return 1
+    if rate <= 0:
+        return None
+    return max(round(1 / rate), 1)
+
+
+def sample_report(report, options=None):
+    """Decide whether the `ParsedReport` is kept and set its weight.
+
+    Invalid reports and reports whose fingerprint fields are not strings are always kept.
+
+    @param options: The `SampleOptions`, by default they are read from the settings.
+    @return: Whether the report is kept.
+    """
+    if options is None:
+        options = get_sample_options()
+    csp_report = report.csp_report
+    if not csp_report:
+        return True
+    fingerprint = get_report_fingerprint(csp_report)
+    if fingerprint is None:
+        return True
+    weight = get_weight(get_sample_rate(fingerprint, get_directive(csp_report), options))
+    if weight == 1:
+        return True
+    cache = caches[options.cache]
+    if cache.add(FIRST_SEEN_KEY.format(fingerprint), True, options.first_seen_timeout):
+        # The first report of the violation
+        return True
+    if weight is not None and random.random() * weight < 1:
+        report.weight = weight
+        return True
+    stats.increment("sampling.dropped")
+    return False
+
+
+def sample_reports(reports, options=None):
+    """Return the list of the `ParsedReport`s which are kept by the sampling.
+
+    @param options: The `SampleOptions`, by default they are read from the settings.
+    """
+    if options is None:
+        options = get_sample_options()
+    return [report for report in reports if sample_report(report, options)]
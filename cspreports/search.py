@@ -0,0 +1,113 @@
+"""Search of CSP reports by an index of normalised tokens.
+
+Each report is split to tokens, i.e. the host names (with their parent domains) and the root URIs of
+its URIs and its directives, which are stored in `CSPReportToken` and looked up by an index.
+A search term matches the reports with an equal token, e.g. `cdn.example.com` matches all the
+reports with an URI on that host. The term may be restricted to a single field by a prefix,
+e.g. `blocked:cdn.example.com`.
+"""
+from urllib.parse import urlsplit
+
+from django.db import transaction
+from django.utils.text import smart_split, unescape_string_literal
+
+from cspreports.fingerprints import get_root_uri
+from cspreports.models import ROOT_URI_MAX_LENGTH, CSPReportToken
+
+# Map of token fields to the report fields they are collected from
+TOKEN_FIELDS = (
+    ("document", ("document_uri", )),
+    ("blocked", ("blocked_uri", )),
+    ("referrer", ("referrer", )),
+    ("source", ("source_file", )),
+    ("directive", ("violated_directive", "effective_directive")),
+)
+URI_TOKEN_FIELDS = ("document", "blocked", "referrer", "source")
+
+
+def get_uri_tokens(uri):
+    """Return the tokens of an URI - the host name, its parent domains and the root URI.
+
+    Values which are not URIs, e.g. 'inline' or 'eval' blocked URIs, are returned as they are.
+    """
+    uri = uri.strip().lower()
+    try:
+        chunks = urlsplit(uri)
+    except ValueError:
+        # Invalid URIs, e.g. 'http://[::1', are returned as they are
+        return {uri}
+    if not chunks.hostname:
+        # Values like 'data:...' are represented by their scheme
+        return {chunks.scheme} if chunks.scheme else {uri}
+    labels = chunks.hostname.split(".")
+    tokens = {".".join(labels[index:]) for index in range(len(labels) - 1)}
+    tokens.add(chunks.hostname)
+    tokens.add(get_root_uri(uri))
+    return tokens
+
+
+def get_directive_tokens(directive):
+    """Return the tokens of a directive - the directive name."""
+    return set(directive.strip().lower().split()[:1])
+
+
+def get_report_tokens(report):
+    """Return the set of (field, token) pairs of the report."""
+    tokens = set()
+    for field, report_fields in TOKEN_FIELDS:
+        tokenize = get_uri_tokens if field in URI_TOKEN_FIELDS else get_directive_tokens
+        for report_field in report_fields:
+            value = getattr(report, report_field)
+            if value:
+                tokens.update((field, token[:ROOT_URI_MAX_LENGTH]) for token in tokenize(value) if token)
+    return tokens
+
+
+def index_reports(reports):
+    """Replace the search tokens of the saved reports.
+
+    Reports which don't have a primary key (e.g. created in bulk on a database which doesn't return
+    the primary keys) are skipped.
+    """
+    reports = [report for report in reports if report.pk is not None]
+    if not reports:
+        return
+    tokens = [CSPReportToken(report_id=report.pk, field=field, token=token)
+              for report in reports for field, token in sorted(get_report_tokens(report))]
+    with transaction.atomic():
+        CSPReportToken.objects.filter(report_id__in=[report.pk for report in reports]).delete()
+        CSPReportToken.objects.bulk_create(tokens)
+
+
+def parse_term(term):
+    """Return a (field, token) pair of a search term, field is `None` if the term isn't restricted."""
+    field = None
+    prefix, separator, value = term.partition(":")
+    if separator and prefix.lower() in dict(TOKEN_FIELDS):
+        field, term = prefix.lower(), value
+    term = term.strip().lower()
+    try:
+        hostname = urlsplit(term).hostname
+    except ValueError:
+        hostname = None
+    if hostname:
+        term = get_root_uri(term)
+    return field, term[:ROOT_URI_MAX_LENGTH]
+
+
+def search_reports(queryset, search_term):
+    """Filter the reports queryset by the search term.
+
+    The search term is split to words, which must all match a token of the report.
+    """
+    for bit in smart_split(search_term):
+        if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+            bit = unescape_string_literal(bit)
+        field, token = parse_term(bit)
+        if not token:
+            continue
+        tokens = CSPReportToken.objects.filter(token=token)
+        if field is not None:
+            tokens = tokens.filter(field=field)
+        queryset = queryset.filter(pk__in=tokens.values("report_id"))
+    return queryset
@@ -0,0 +1,189 @@
+"""Append-only spool files of received CSP reports.
+
+Each line of a spool file is a JSON object holding the raw report, the user agent, the time the
+report was received and the sampling weight of the report, if it isn't 1. Each process appends to
+its own open segment, which is renamed to `<name>.spool` when it reaches the maximal size or when
+the process exits. Only such closed segments are loaded to the database by the
+`load_cspreports_spool` command. The open segments of processes which no longer run, e.g. were
+killed, are recovered to the closed segments by the command.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from itertools import count
+
+from django.utils.timezone import now
+
+from cspreports import codec
+
+OPEN_SUFFIX = ".open"
+CLOSED_SUFFIX = ".spool"
+LOADING_SUFFIX = ".loading"
+# Number of seconds after which the writer checks its idle segment wasn't recovered by the loader.
+IDLE_CHECK_INTERVAL = 60
+
+
+def encode_line(raw, user_agent, created, weight=1):
+    """Return a spool line for a report."""
+    data = {"report": raw, "user_agent": user_agent, "created": created.isoformat()}
+    if weight != 1:
+        data["weight"] = weight
+    line = json.dumps(data)
+    return (line + "\n").encode("ascii")
+
+
+def decode_line(line):
+    """Return a tuple (raw report, user agent, created, weight) from a spool line.
+
+    @raise ValueError: If the line is not a valid spool line.
+    """
+    data = codec.loads(line)
+    try:
+        return data["report"], data["user_agent"], data["created"], data.get("weight", 1)
+    except (KeyError, TypeError):
+        raise ValueError("Invalid spool line.")
+
+
+class SpoolWriter:
+    """Appends reports to the spool files in a directory.
+
+    @ivar directory: The spool directory.
+    @ivar max_bytes: Size of the segment when it's closed and a new one is started.
+    @ivar fsync_every: Number of writes after which the segment is synced to the disk.
+    """
+
+    def __init__(self, directory, max_bytes, fsync_every):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.fsync_every = fsync_every
+        self._lock = threading.Lock()
+        self._counter = count()
+        self._fd = None
+        self._path = None
+        self._pid = None
+        self._size = 0
+        self._unsynced = 0
+        self._written = 0
+        atexit.register(self.close)
+
+    def write(self, raw, user_agent, created=None, weight=1):
+        """Append a report to the spool."""
+        line = encode_line(raw, user_agent, created or now(), weight)
+        with self._lock:
+            if self._fd is not None and self._pid != os.getpid():
+                # The file was inherited from the parent process, leave it to the parent.
+                self._fd = None
+            if self._fd is not None and self._is_recovered():
+                # The loader took the idle segment, start a new one.
+                os.close(self._fd)
+                self._fd = None
+            if self._fd is not None and self._size + len(line) > self.max_bytes:
+                self._close_segment()
+            if self._fd is None:
+                self._open_segment()
+            os.write(self._fd, line)
+            self._written = time.monotonic()
+            self._size += len(line)
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_every:
+                os.fsync(self._fd)
+                self._unsynced = 0
+
+    def close(self):
+        """Close the current segment, so it can be loaded."""
+        with self._lock:
+            if self._fd is not None and self._pid == os.getpid():
+                self._close_segment()
+
+    def _is_recovered(self):
+        if time.monotonic() - self._written < IDLE_CHECK_INTERVAL:
+            return False
+        return not os.path.exists(self._path + OPEN_SUFFIX)
+
+    def _open_segment(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._pid = os.getpid()
+        name = "{}-{}-{:06d}".format(now().strftime("%Y%m%d%H%M%S%f"), self._pid, next(self._counter))
+        self._path = os.path.join(self.directory, name)
+        self._fd = os.open(self._path + OPEN_SUFFIX, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o640)
+        self._size = 0
+        self._unsynced = 0
+
+    def _close_segment(self):
+        os.fsync(self._fd)
+        os.close(self._fd)
+        self._fd = None
+        try:
+            os.rename(self._path + OPEN_SUFFIX, self._path + CLOSED_SUFFIX)
+        except FileNotFoundError:
+            # The segment was recovered by the loader.
+            pass
+
+
+def get_closed_segments(directory, include_open=False):
+    """Return sorted paths of the spool segments which are ready to be loaded."""
+    suffixes = (CLOSED_SUFFIX, OPEN_SUFFIX) if include_open else (CLOSED_SUFFIX, )
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return sorted(os.path.join(directory, name) for name in names if name.endswith(suffixes))
+
+
+def is_writer_running(name):
+    """Return whether the process which writes the open segment is running.
+
+    The process ID is a part of the segment name. The processes are looked up on this host only.
+    Segments whose process can't be checked are considered as written to.
+    """
+    try:
+        pid = int(name.split("-")[1])
+    except (IndexError, ValueError):
+        return True
+    if pid == os.getpid() or os.name != "posix":
+        # Other systems can't check a process by a signal.
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # The process runs under another user.
+        pass
+    return True
+
+
+def recover_stale_segments(directory, max_age):
+    """Return the segments left by a process which didn't finish, e.g. was killed, to the closed segments.
+
+    These are the segments claimed by a loader and the open segments. The loader marks the time it
+    claims a segment as its modification time. The open segments are recovered as soon as their
+    writer process doesn't run.
+
+    @param max_age: Number of seconds after which a segment which isn't modified is considered stale.
+    @return: Number of the recovered segments.
+    """
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return 0
+    recovered = 0
+    deadline = time.time() - max_age
+    for name in names:
+        if not name.endswith((LOADING_SUFFIX, OPEN_SUFFIX)):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            stale = os.path.getmtime(path) < deadline
+            if not stale and name.endswith(OPEN_SUFFIX):
+                stale = not is_writer_running(name)
+            if not stale:
+                continue
+            os.rename(path, os.path.splitext(path)[0] + CLOSED_SUFFIX)
+        except FileNotFoundError:
+            # Loaded or recovered by another process.
+            continue
+        recovered += 1
+    return recovered
@@ -0,0 +1,24 @@
+"""In-process counters of received CSP reports."""
+import threading
+from collections import Counter
+
+_counters = Counter()
+_lock = threading.Lock()
+
+
+def increment(name, count=1):
+    """Increment the counter of the given name."""
+    with _lock:
+        _counters[name] += count
+
+
+def get_counts():
+    """Return a dictionary of the current values of all counters."""
+    with _lock:
+        return dict(_counters)
+
+
+def reset():
+    """Reset all counters."""
+    with _lock:
+        _counters.clear()
@@ -1,43 +1,52 @@
 """Collect summary of CSP reports."""
+import heapq
 
-from operator import attrgetter
-from urllib.parse import urlsplit, urlunsplit
-
+from django.db.models import Sum
 from django.template.loader import get_template
+from django.utils import timezone
 
-from cspreports.models import get_report_model
+from cspreports.fingerprints import get_root_uri  # noqa: F401 - kept importable from here
+from cspreports.models import CSPReportRollup, get_report_model
 
 CSPReport = get_report_model()
 DEFAULT_TOP = 10
-
-
-def get_root_uri(uri):
-    """Return root URI - strip query and fragment."""
-    chunks = urlsplit(uri)
-    return urlunsplit((chunks.scheme, chunks.netloc, chunks.path, "", ""))
+DEFAULT_CHUNK_SIZE = 2000
 
 
 class ViolationInfo:
     """Container for violation details.
 
+    Only primary keys of the examples are collected, the examples themselves are fetched by
+    `fetch_examples` once the top violations are known.
+
     @ivar root_uri: A violation root URI.
     @ivar count: A number of violations related to the root URI.
+    @ivar example_pks: List of primary keys of violation examples.
     @ivar examples: List of violation examples.
     @ivar top: Maximal number of examples.
     """
 
+    __slots__ = ("root_uri", "count", "example_pks", "examples", "top")
+
     def __init__(self, root_uri, top=DEFAULT_TOP):
         self.root_uri = root_uri
         self.count = 0
+        self.example_pks = []
         self.examples = []
         self.top = top
 
-    def append(self, report):
-        """Append a new CSP report."""
-        assert report not in self.examples
-        self.count += 1
-        if len(self.examples) < self.top:
-            self.examples.append(report)
+    def append(self, report_pk, weight=1):
+        """Append a new CSP report by its primary key and weight."""
+        self.count += weight
+        if len(self.example_pks) < self.top:
+            self.example_pks.append(report_pk)
+
+
+def fetch_examples(violations, queryset):
+    """Fetch examples of the violations from the queryset in a single query."""
+    reports = queryset.in_bulk([pk for info in violations for pk in info.example_pks])
+    for info in violations:
+        info.examples = [reports[pk] for pk in info.example_pks if pk in reports]
 
 
 class CspReportSummary:
@@ -76,9 +85,82 @@ class CspReportSummary:
         return template.render(self.__dict__)
 
 
-def collect(since, to, top=DEFAULT_TOP):
+def collect_violations(queryset, field_name, top=DEFAULT_TOP, rollups=None):
+    """Return top violations by the root URI field ordered by descending count.
+
+    The reports are counted by their weights in the database, examples are fetched only for the top violations.
+
+    @param field_name: Name of the root URI field, i.e. 'document_root' or 'blocked_root'.
+    @param rollups: Queryset of `CSPReportRollup`s to count the reports from instead of the queryset.
+    @returntype: List[ViolationInfo]
+    """
+    if rollups is None:
+        counts = queryset.order_by().values_list(field_name).annotate(count=Sum("weight"))
+    else:
+        counts = rollups.order_by().values_list(field_name).annotate(count=Sum("count"))
+    counts = counts.order_by("-count")[:top]
+    violations = []
+    for root_uri, count in counts:
+        info = ViolationInfo(root_uri, top=top)
+        info.count = count
+        info.examples = list(queryset.filter(**{field_name: root_uri})[:top])
+        violations.append(info)
+    return violations
+
+
+def stream_violations(queryset, field_names, top=DEFAULT_TOP, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Return top violations by each of the root URI fields ordered by descending count.
+
+    The reports are read in a single pass in chunks ordered by primary key and only the root URIs
+    and the primary keys are loaded, so the memory doesn't grow with the number of reports.
+    Examples are fetched only for the top violations.
+
+    @param field_names: Names of the root URI fields, i.e. 'document_root' and 'blocked_root'.
+    @returntype: List[List[ViolationInfo]]
+    """
+    all_violations = [{} for _ in field_names]
+    queryset = queryset.order_by("pk")
+    rows = queryset.values_list("pk", "weight", *field_names)
+    last_pk = None
+    while True:
+        chunk = rows if last_pk is None else rows.filter(pk__gt=last_pk)
+        count = 0
+        for row in chunk[:chunk_size].iterator(chunk_size=chunk_size):
+            last_pk = row[0]
+            count += 1
+            for violations, root_uri in zip(all_violations, row[2:]):
+                info = violations.get(root_uri)
+                if info is None:
+                    info = violations[root_uri] = ViolationInfo(root_uri, top=top)
+                info.append(last_pk, row[1])
+        if count < chunk_size:
+            break
+
+    results = [heapq.nlargest(top, violations.values(), key=lambda info: info.count)
+               for violations in all_violations]
+    fetch_examples([info for result in results for info in result], queryset)
+    return results
+
+
+def _count_reports(queryset):
+    """Return the number of received reports, i.e. the sum of the weights of the reports."""
+    return queryset.aggregate(count=Sum("weight"))["count"] or 0
+
+
+def _get_day(value):
+    """Return the date of a date and time in the current time zone."""
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.date()
+
+
+def collect(since, to, top=DEFAULT_TOP, use_rollups=False, streaming=False):
     """Collect the CSP report.
 
+    @param use_rollups: Whether to count the reports from the daily rollups, see `cspreports.rollups`.
+        The rollups cover whole days only, so `since` and `to` should be midnights.
+    @param streaming: Whether to count the violations by streaming the reports instead of grouping
+        them in the database, see `stream_violations`. Ignored if `use_rollups` is set.
     @returntype: CspReportSummary
     """
     summary = CspReportSummary(since, to, top=top)
@@ -86,27 +168,26 @@ def collect(since, to, top=DEFAULT_TOP):
     valid_queryset = queryset.filter(is_valid=True)
     invalid_queryset = queryset.filter(is_valid=False)
 
-    summary.total_count = queryset.count()
-    summary.valid_count = valid_queryset.count()
-
-    # Collect sources
-    sources = {}
-    for report in valid_queryset:
-        root_uri = get_root_uri(report.document_uri)
-        info = sources.setdefault(root_uri, ViolationInfo(root_uri))
-        info.append(report)
-    summary.sources = sorted(sources.values(), key=attrgetter("count"), reverse=True)[:top]
-
-    # Collect blocks
-    blocks = {}
-    for report in valid_queryset:
-        root_uri = get_root_uri(report.blocked_uri)
-        info = blocks.setdefault(root_uri, ViolationInfo(root_uri))
-        info.append(report)
-    summary.blocks = sorted(blocks.values(), key=attrgetter("count"), reverse=True)[:top]
+    if use_rollups:
+        rollups = CSPReportRollup.objects.filter(day__gte=_get_day(since), day__lt=_get_day(to))
+        valid_rollups = rollups.filter(is_valid=True)
+        summary.valid_count = valid_rollups.aggregate(count=Sum("count"))["count"] or 0
+        summary.invalid_count = rollups.filter(is_valid=False).aggregate(count=Sum("count"))["count"] or 0
+        summary.total_count = summary.valid_count + summary.invalid_count
+    else:
+        valid_rollups = None
+        summary.valid_count = _count_reports(valid_queryset)
+        summary.invalid_count = _count_reports(invalid_queryset)
+        summary.total_count = summary.valid_count + summary.invalid_count
+
+    # Collect sources and blocks
+    if streaming and not use_rollups:
+        summary.sources, summary.blocks = stream_violations(valid_queryset, ("document_root", "blocked_root"), top)
+    else:
+        summary.sources = collect_violations(valid_queryset, "document_root", top, valid_rollups)
+        summary.blocks = collect_violations(valid_queryset, "blocked_root", top, valid_rollups)
 
     # Collect invalid reports
-    summary.invalid_count = invalid_queryset.count()
     summary.invalid_reports = tuple(invalid_queryset[:top])
 
     return summary
@@ -0,0 +1,73 @@
+"""Tests for `cspreports.admin`."""
+from datetime import datetime
+from unittest.mock import Mock, patch
+
+from django.contrib.admin import site
+from django.test import RequestFactory, TestCase, override_settings
+
+from cspreports.admin import CSPReportAdmin
+from cspreports.models import CSPReport
+from cspreports.paginators import EstimatedCountPaginator, get_estimated_count
+from cspreports.search import index_reports
+
+from .utils import create_csp_report
+
+
+class TestCSPReportAdmin(TestCase):
+    """Test `CSPReportAdmin` class."""
+
+    def get_changelist(self, **params):
+        request = RequestFactory().get('/admin/cspreports/cspreport/', params)
+        request.user = Mock(**{'has_perm.return_value': True})
+        return CSPReportAdmin(CSPReport, site).get_changelist_instance(request)
+
+    def test_changelist(self):
+        report = create_csp_report(datetime(2016, 4, 27, 12), is_valid=True, document_uri='http://example.cz/',
+                                   blocked_uri='http://example.evil/', json='{"csp-report": {}}')
+
+        changelist = self.get_changelist()
+
+        self.assertEqual(changelist.result_count, 1)
+        self.assertEqual(list(changelist.result_list), [report])
+        # The large text fields are not loaded
+        self.assertEqual(changelist.result_list[0].get_deferred_fields(), {'json', 'original_policy', 'user_agent'})
+        self.assertEqual(changelist.result_list[0].document_uri, 'http://example.cz/')
+
+    @override_settings(CSP_REPORTS_SEARCH_INDEX=True)
+    def test_search(self):
+        report = create_csp_report(datetime(2016, 4, 27, 12), blocked_uri='https://cdn.example.com/lib.js')
+        create_csp_report(datetime(2016, 4, 27, 12), blocked_uri='https://other.example.com/lib.js',
+                          json='cdn.example.com')
+        index_reports(CSPReport.objects.all())
+
+        changelist = self.get_changelist(q='cdn.example.com')
+
+        self.assertEqual(list(changelist.result_list), [report])
+
+
+class TestEstimatedCountPaginator(TestCase):
+    """Test `EstimatedCountPaginator` class."""
+
+    def test_count_exact(self):
+        create_csp_report(datetime(2016, 4, 27, 12))
+
+        # SQLite doesn't provide the estimate
+        self.assertIsNone(get_estimated_count(CSPReport, 'default'))
+        self.assertEqual(EstimatedCountPaginator(CSPReport.objects.order_by('pk'), 10).count, 1)
+
+    def test_count_estimate(self):
+        with patch('cspreports.paginators.get_estimated_count', return_value=1000000) as estimate_mock:
+            with self.assertNumQueries(0):
+                self.assertEqual(EstimatedCountPaginator(CSPReport.objects.order_by('pk'), 10).count, 1000000)
+        estimate_mock.assert_called_once_with(CSPReport, 'default')
+
+    def test_count_estimate_small(self):
+        create_csp_report(datetime(2016, 4, 27, 12))
+
+        with patch('cspreports.paginators.get_estimated_count', return_value=10):
+            self.assertEqual(EstimatedCountPaginator(CSPReport.objects.order_by('pk'), 10).count, 1)
+
+    def test_count_filtered(self):
+        with patch('cspreports.paginators.get_estimated_count', return_value=1000000) as estimate_mock:
+            self.assertEqual(EstimatedCountPaginator(CSPReport.objects.filter(is_valid=True), 10).count, 0)
+        estimate_mock.assert_not_called()
@@ -0,0 +1,83 @@
+"""Test `aggregation` module."""
+import json
+from datetime import datetime, timezone as dt_timezone
+
+from django.test import RequestFactory, TestCase, override_settings
+
+from cspreports import utils
+from cspreports.aggregation import aggregate_reports, increment_violation
+from cspreports.fingerprints import get_fingerprint
+from cspreports.models import CSPReport, CSPViolation
+
+
+def make_report(document_uri='http://example.cz/?query', blocked_uri='http://example.evil/script.js',
+                created=datetime(2016, 4, 27, 12, tzinfo=dt_timezone.utc)):
+    report = CSPReport(is_valid=True, document_uri=document_uri, blocked_uri=blocked_uri,
+                       violated_directive='script-src', created=created)
+    report.update_normalised_fields()
+    return report
+
+
+class TestAggregateReports(TestCase):
+    """Test `aggregate_reports` function."""
+
+    def test_new_violation(self):
+        reports = [make_report(), make_report(created=datetime(2016, 4, 27, 13, tzinfo=dt_timezone.utc))]
+
+        self.assertEqual(aggregate_reports(reports, 10), reports)
+
+        violation = CSPViolation.objects.get()
+        self.assertEqual(violation.fingerprint,
+                         get_fingerprint('http://example.cz/', 'http://example.evil/script.js', 'script-src'))
+        self.assertEqual(violation.document_root, 'http://example.cz/')
+        self.assertEqual(violation.blocked_root, 'http://example.evil/script.js')
+        self.assertEqual(violation.violated_directive, 'script-src')
+        self.assertEqual(violation.count, 2)
+        self.assertEqual(violation.first_seen, datetime(2016, 4, 27, 12, tzinfo=dt_timezone.utc))
+        self.assertEqual(violation.last_seen, datetime(2016, 4, 27, 13, tzinfo=dt_timezone.utc))
+
+    def test_examples_limit(self):
+        self.assertEqual(len(aggregate_reports([make_report(), make_report()], 3)), 2)
+        self.assertEqual(len(aggregate_reports([make_report(), make_report()], 3)), 1)
+        self.assertEqual(aggregate_reports([make_report()], 3), [])
+
+        self.assertEqual(CSPViolation.objects.get().count, 5)
+
+    def test_groups(self):
+        other = make_report(blocked_uri='http://other.evil/')
+        invalid = CSPReport(is_valid=False)
+
+        saved = aggregate_reports([make_report(), other, invalid, make_report()], 1)
+
+        self.assertEqual(len(saved), 3)
+        self.assertIn(other, saved)
+        self.assertIn(invalid, saved)
+        self.assertQuerySetEqual(CSPViolation.objects.order_by('count').values_list('blocked_root', 'count'),
+                                 [('http://other.evil/', 1), ('http://example.evil/script.js', 2)], transform=tuple)
+
+    def test_last_seen(self):
+        aggregate_reports([make_report()], 1)
+        aggregate_reports([make_report(created=datetime(2016, 4, 27, 10, tzinfo=dt_timezone.utc))], 1)
+
+        self.assertEqual(CSPViolation.objects.get().last_seen, datetime(2016, 4, 27, 12, tzinfo=dt_timezone.utc))
+
+    def test_increment_violation(self):
+        fingerprint = get_fingerprint('http://example.cz/', 'http://example.evil/script.js', 'script-src')
+        self.assertEqual(increment_violation(fingerprint, [make_report()]), 0)
+        self.assertEqual(increment_violation(fingerprint, [make_report(), make_report()]), 1)
+        self.assertEqual(CSPViolation.objects.get().count, 3)
+
+
+class TestSaveReportAggregate(TestCase):
+    """Test `save_report` with CSP_REPORTS_AGGREGATE."""
+
+    @override_settings(CSP_REPORTS_AGGREGATE=True, CSP_REPORTS_AGGREGATE_EXAMPLES=1)
+    def test_save_report(self):
+        body = json.dumps({'csp-report': {'document-uri': 'http://example.cz/', 'referrer': '',
+                                          'blocked-uri': 'http://example.evil/', 'violated-directive': 'script-src',
+                                          'original-policy': "script-src 'self'"}})
+        for i in range(3):
+            utils.save_report(RequestFactory().post('/dummy/', body, content_type='application/json'))
+
+        self.assertEqual(CSPReport.objects.count(), 1)
+        self.assertEqual(CSPViolation.objects.get().count, 3)
@@ -0,0 +1,30 @@
+"""Test `batches` module."""
+from datetime import datetime, timezone as dt_timezone
+
+from django.test import TestCase
+
+from cspreports.batches import iterate_in_batches
+from cspreports.models import CSPReport
+
+from .utils import create_csp_report
+
+
+class TestIterateInBatches(TestCase):
+    """Test `iterate_in_batches` function."""
+
+    def test_batches(self):
+        created = datetime(2016, 4, 27, 12, tzinfo=dt_timezone.utc)
+        reports = [create_csp_report(created, fingerprint='') for _ in range(5)]
+        queryset = CSPReport.objects.filter(document_uri__isnull=True).order_by('-pk')
+
+        batches = []
+        for batch in iterate_in_batches(queryset, 2):
+            batches.append([report.pk for report in batch])
+            # Reports which no longer match the queryset don't affect the batches
+            CSPReport.objects.filter(pk__in=batches[-1]).update(document_uri='http://example.cz/')
+
+        pks = [report.pk for report in reports]
+        self.assertEqual(batches, [pks[:2], pks[2:4], pks[4:]])
+
+    def test_empty(self):
+        self.assertEqual(list(iterate_in_batches(CSPReport.objects.all(), 2)), [])
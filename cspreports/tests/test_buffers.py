@@ -0,0 +1,88 @@
+"""Test `buffers` module."""
+import threading
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from cspreports.buffers import BatchBuffer
+
+
+class TestBatchBuffer(SimpleTestCase):
+    """Test `BatchBuffer` class."""
+
+    def setUp(self):
+        self.batches = []
+        self.flushed = threading.Event()
+        patcher = patch('cspreports.buffers.atexit.register')
+        self.atexit_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def flush_function(self, batch):
+        self.batches.append(batch)
+        self.flushed.set()
+
+    def test_flush(self):
+        buffer = BatchBuffer(self.flush_function, batch_size=2, flush_interval=3600, max_size=10)
+        buffer.put(1)
+
+        buffer.flush()
+
+        self.assertEqual(self.batches, [[1]])
+        self.assertEqual(len(buffer), 0)
+        self.atexit_mock.assert_called_once_with(buffer.flush)
+
+    def test_flush_batches(self):
+        buffer = BatchBuffer(self.flush_function, batch_size=2, flush_interval=3600, max_size=10)
+        with patch.object(buffer, '_ensure_thread'):
+            for item in range(5):
+                buffer.put(item)
+
+        buffer.flush()
+
+        self.assertEqual(self.batches, [[0, 1], [2, 3], [4]])
+
+    def test_batch_size(self):
+        buffer = BatchBuffer(self.flush_function, batch_size=2, flush_interval=3600, max_size=10)
+        buffer.put(1)
+        buffer.put(2)
+
+        self.assertTrue(self.flushed.wait(5))
+        self.assertEqual(self.batches, [[1, 2]])
+
+    def test_flush_interval(self):
+        buffer = BatchBuffer(self.flush_function, batch_size=100, flush_interval=0.01, max_size=1000)
+        buffer.put(1)
+
+        self.assertTrue(self.flushed.wait(5))
+        self.assertEqual(self.batches, [[1]])
+
+    def test_full_drop(self):
+        buffer = BatchBuffer(self.flush_function, batch_size=2, flush_interval=3600, max_size=2)
+        with patch.object(buffer, '_ensure_thread'):
+            self.assertTrue(buffer.put(1))
+            self.assertTrue(buffer.put(2))
+            self.assertFalse(buffer.put(3))
+
+        self.assertEqual(buffer.dropped_count, 1)
+        self.assertEqual(len(buffer), 2)
+
+    def test_full_block(self):
+        buffer = BatchBuffer(self.flush_function, batch_size=1, flush_interval=3600, max_size=1, full_policy='block')
+        with patch.object(buffer, '_ensure_thread'):
+            buffer.put(1)
+            threading.Timer(0.01, buffer.flush).start()
+            self.assertTrue(buffer.put(2))
+
+        self.assertEqual(self.batches, [[1]])
+        self.assertEqual(len(buffer), 1)
+
+    def test_flush_error(self):
+        buffer = BatchBuffer(lambda batch: 1 / 0, batch_size=2, flush_interval=3600, max_size=10)
+        buffer.put(1)
+        with self.assertLogs('CSP Reports', 'ERROR'):
+            buffer.flush()
+        self.assertEqual(len(buffer), 0)
+
+    def test_invalid_policy(self):
+        with self.assertRaisesMessage(ValueError, "Unknown full policy 'JUNK'."):
+            BatchBuffer(self.flush_function, batch_size=2, flush_interval=3600, max_size=10, full_policy='JUNK')
@@ -0,0 +1,82 @@
+"""Test `codec` module."""
+from unittest import skipIf
+from unittest.mock import patch
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from cspreports import codec
+from cspreports.parsing import ParsedReport
+from cspreports.utils import format_report
+
+REPORT = '{"csp-report": {"document-uri": "http://example.cz/\\u00e9", "line-number": 3, "sample": 1.5}}'
+
+
+class TestGetBackend(SimpleTestCase):
+    """Test `get_backend` function."""
+
+    def setUp(self):
+        codec.reset_backend()
+        self.addCleanup(codec.reset_backend)
+
+    def test_auto(self):
+        with patch('cspreports.codec.orjson', None):
+            self.assertEqual(codec.get_backend(), 'json')
+
+    def test_resolved_once(self):
+        backend = codec.get_backend()
+        with patch('cspreports.codec.orjson', None):
+            self.assertEqual(codec.get_backend(), backend)
+
+    @override_settings(CSP_REPORTS_JSON_BACKEND='json')
+    def test_stdlib(self):
+        self.assertEqual(codec.get_backend(), 'json')
+
+    @override_settings(CSP_REPORTS_JSON_BACKEND='orjson')
+    def test_orjson_missing(self):
+        with patch('cspreports.codec.orjson', None):
+            with self.assertRaisesMessage(ImproperlyConfigured, "orjson is not installed"):
+                codec.get_backend()
+
+    @override_settings(CSP_REPORTS_JSON_BACKEND='JUNK')
+    def test_unknown(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, "Unknown CSP_REPORTS_JSON_BACKEND"):
+            codec.get_backend()
+
+
+@skipIf(codec.orjson is None, "orjson is not installed")
+class TestBackends(SimpleTestCase):
+    """Test the results are the same with both backends."""
+
+    def assertSameResults(self, function, *args):
+        with self.settings(CSP_REPORTS_JSON_BACKEND='json'):
+            expected = function(*args)
+        with self.settings(CSP_REPORTS_JSON_BACKEND='orjson'):
+            self.assertEqual(function(*args), expected)
+        return expected
+
+    def test_loads(self):
+        self.assertSameResults(codec.loads, REPORT)
+        self.assertSameResults(codec.loads, REPORT.encode())
+        # Documents which orjson rejects
+        self.assertSameResults(lambda data: str(codec.loads(data)), '{"value": NaN}')
+        self.assertSameResults(codec.loads, '{"value": %d}' % 2 ** 70)
+
+    def test_loads_invalid(self):
+        for backend in ('json', 'orjson'):
+            with self.settings(CSP_REPORTS_JSON_BACKEND=backend):
+                with self.assertRaises(ValueError):
+                    codec.loads('NOT_A_JSON')
+
+    def test_dumps(self):
+        self.assertEqual(self.assertSameResults(codec.dumps, {'a': 'é', 'b': [1, 2]}), '{"a": "\\u00e9", "b": [1, 2]}')
+        self.assertSameResults(codec.dumps, {'value': 2 ** 70})
+
+    def test_from_data(self):
+        # The stored JSON of the Reporting API reports is the same with any backend
+        self.assertSameResults(lambda data: ParsedReport.from_data(data).raw, {'body': {'sample': 'é'}})
+
+    def test_formatted(self):
+        formatted = self.assertSameResults(format_report, REPORT)
+        self.assertIn('    "document-uri": "http://example.cz/\\u00e9"', formatted)
+        self.assertSameResults(lambda raw: ParsedReport(raw).formatted, REPORT)
@@ -1,13 +1,21 @@
 """Test commands."""
 
-from datetime import datetime, timezone as dt_timezone
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import date, datetime, timezone as dt_timezone
 from io import StringIO
 from unittest.mock import patch
 
 from django.core.management import CommandError, call_command
 from django.test import TestCase, override_settings
 
-from cspreports.models import CSPReport
+from cspreports.interning import LRUCache
+from cspreports.models import CSPReport, CSPReportRollup, CSPReportText, CSPReportToken, CSPRollupHighWaterMark
+from cspreports.search import index_reports
+from cspreports.spool import SpoolWriter
 
 from .utils import create_csp_report
 
@@ -51,6 +59,36 @@ class TestCleanCspreports(TestCase):
         with self.assertRaisesMessage(CommandError, "'JUNK' is not a valid date."):
             call_command("clean_cspreports", "JUNK")
 
+    def test_batches(self):
+        # Test reports are deleted in batches
+        for day in range(1, 6):
+            self.create_cspreport(datetime(2016, 4, day, tzinfo=dt_timezone.utc))
+        keep = self.create_cspreport(datetime(2016, 4, 27, tzinfo=dt_timezone.utc))
+        # Report with lower primary key than some of the deleted ones
+        self.create_cspreport(datetime(2016, 4, 6, tzinfo=dt_timezone.utc))
+        buff = StringIO()
+
+        with patch("cspreports.batches.time.sleep") as sleep_mock:
+            call_command("clean_cspreports", "2016-04-20", batch_size=2, sleep=0.5, verbosity=3, stdout=buff)
+
+        self.assertQuerySetEqual(CSPReport.objects.values_list("pk", flat=True), [keep.pk])
+        self.assertEqual(buff.getvalue().count("Deleted 2 reports."), 1)
+        self.assertIn("Deleted 4 reports.", buff.getvalue())
+        self.assertIn("Deleted 6 reports.", buff.getvalue())
+        self.assertEqual(sleep_mock.call_count, 3)
+
+    def test_search_tokens(self):
+        # Test search tokens of the deleted reports are deleted too
+        old = self.create_cspreport(datetime(2016, 4, 1, tzinfo=dt_timezone.utc))
+        keep = self.create_cspreport(datetime(2016, 4, 27, tzinfo=dt_timezone.utc))
+        CSPReport.objects.update(document_uri='http://example.cz/')
+        index_reports(CSPReport.objects.all())
+
+        call_command("clean_cspreports", "2016-04-20")
+
+        self.assertFalse(CSPReportToken.objects.filter(report_id=old.pk).exists())
+        self.assertTrue(CSPReportToken.objects.filter(report_id=keep.pk).exists())
+
 
 class TestMakeCspSummary(TestCase):
     """Test `make_csp_summary` command."""
@@ -85,3 +123,235 @@ class TestMakeCspSummary(TestCase):
         # Test invalid since to
         with self.assertRaisesMessage(CommandError, "'JUNK' is not a valid date."):
             call_command("make_csp_summary", to="JUNK")
+
+    @override_settings(CSP_REPORTS_AGGREGATE=True)
+    def test_aggregate(self):
+        # The reports which are only counted in the violations would be missing in the summary
+        with self.assertRaisesMessage(CommandError, "CSP_REPORTS_AGGREGATE is set"):
+            call_command("make_csp_summary")
+        with self.assertRaisesMessage(CommandError, "CSP_REPORTS_AGGREGATE is set"):
+            call_command("make_csp_summary", rollups=True)
+
+
+class TestBackfillCspreports(TestCase):
+    """Test `backfill_cspreports` command."""
+
+    def test_backfill(self):
+        report = create_csp_report(datetime(2016, 4, 27, 12, tzinfo=dt_timezone.utc), is_valid=True,
+                                   document_uri='http://example.cz/?query', blocked_uri='http://example.evil/')
+        other = create_csp_report(datetime(2016, 4, 27, 12, tzinfo=dt_timezone.utc), is_valid=True,
+                                  document_uri='http://other.cz/', blocked_uri='http://example.evil/')
+        CSPReport.objects.update(document_root='', blocked_root='', fingerprint='')
+        CSPReport.objects.filter(pk=other.pk).update(fingerprint='KEEP')
+        buff = StringIO()
+
+        call_command("backfill_cspreports", batch_size=1, verbosity=3, stdout=buff)
+
+        report.refresh_from_db()
+        self.assertEqual(report.document_root, 'http://example.cz/')
+        self.assertEqual(report.blocked_root, 'http://example.evil/')
+        self.assertEqual(len(report.fingerprint), 40)
+        self.assertEqual(CSPReport.objects.get(pk=other.pk).fingerprint, 'KEEP')
+        self.assertIn("Updated normalised fields of 1 reports.", buff.getvalue())
+
+    def test_backfill_all(self):
+        report = create_csp_report(datetime(2016, 4, 27, 12, tzinfo=dt_timezone.utc), document_uri='http://a.cz/')
+        CSPReport.objects.update(fingerprint='KEEP')
+
+        call_command("backfill_cspreports", all=True)
+
+        report.refresh_from_db()
+        self.assertNotEqual(report.fingerprint, 'KEEP')
+
+
+class TestIndexCspreports(TestCase):
+    """Test `index_cspreports` command."""
+
+    def test_index(self):
+        report = create_csp_report(datetime(2016, 4, 27, 12, tzinfo=dt_timezone.utc), document_uri='http://a.cz/')
+        indexed = create_csp_report(datetime(2016, 4, 27, 12, tzinfo=dt_timezone.utc), document_uri='http://b.cz/')
+        CSPReportToken.objects.create(report_id=indexed.pk, field='document', token='KEEP')
+        buff = StringIO()
+
+        call_command("index_cspreports", batch_size=1, verbosity=3, stdout=buff)
+
+        self.assertTrue(CSPReportToken.objects.filter(report_id=report.pk, token='a.cz').exists())
+        self.assertQuerySetEqual(CSPReportToken.objects.filter(report_id=indexed.pk).values_list('token', flat=True),
+                                 ['KEEP'])
+        self.assertIn("Filled the search index of 1 reports.", buff.getvalue())
+
+    def test_index_all(self):
+        report = create_csp_report(datetime(2016, 4, 27, 12, tzinfo=dt_timezone.utc), document_uri='http://a.cz/')
+        CSPReportToken.objects.create(report_id=report.pk, field='document', token='OLD')
+
+        call_command("index_cspreports", all=True)
+
+        self.assertFalse(CSPReportToken.objects.filter(token='OLD').exists())
+        self.assertTrue(CSPReportToken.objects.filter(report_id=report.pk, token='a.cz').exists())
+
+
+class TestInternCspreports(TestCase):
+    """Test `intern_cspreports` command."""
+
+    def test_intern(self):
+        created = datetime(2016, 4, 27, 12, tzinfo=dt_timezone.utc)
+        report = create_csp_report(created, original_policy='default-src self', user_agent='Agent')
+        other = create_csp_report(created, original_policy='default-src self', user_agent='')
+        buff = StringIO()
+
+        with patch('cspreports.interning._text_cache', LRUCache(10)):
+            call_command("intern_cspreports", batch_size=1, verbosity=3, stdout=buff)
+
+        report.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(report.original_policy, '')
+        self.assertEqual(report.get_original_policy(), 'default-src self')
+        self.assertEqual(report.get_user_agent(), 'Agent')
+        self.assertEqual(other.original_policy_text_id, report.original_policy_text_id)
+        self.assertIsNone(other.user_agent_text_id)
+        self.assertEqual(CSPReportText.objects.count(), 2)
+        self.assertIn("Moved the texts of 2 reports.", buff.getvalue())
+
+
+@override_settings(USE_TZ=True, TIME_ZONE="UTC")
+class TestRollupCspreports(TestCase):
+    """Test `rollup_cspreports` command."""
+
+    def test_rollup(self):
+        for day in (27, 27, 28):
+            create_csp_report(datetime(2016, 4, day, 12, tzinfo=dt_timezone.utc), is_valid=True,
+                              document_uri='http://example.cz/?%d' % day, blocked_uri='http://example.evil/')
+        create_csp_report(datetime(2016, 4, 27, 12, tzinfo=dt_timezone.utc))
+        buff = StringIO()
+
+        call_command("rollup_cspreports", batch_size=2, verbosity=3, stdout=buff)
+
+        rollups = CSPReportRollup.objects.order_by('day', '-is_valid')
+        self.assertEqual(
+            list(rollups.values_list('day', 'is_valid', 'document_root', 'count')),
+            [(date(2016, 4, 27), True, 'http://example.cz/', 2), (date(2016, 4, 27), False, '', 1),
+             (date(2016, 4, 28), True, 'http://example.cz/', 1)])
+        self.assertEqual(CSPRollupHighWaterMark.objects.get().last_pk, CSPReport.objects.order_by('pk').last().pk)
+        self.assertIn("Counted 2 reports.", buff.getvalue())
+        self.assertIn("Counted 4 new reports in the rollups.", buff.getvalue())
+
+    def test_rollup_incremental(self):
+        create_csp_report(datetime(2016, 4, 27, 12, tzinfo=dt_timezone.utc), is_valid=True,
+                          document_uri='http://example.cz/')
+        call_command("rollup_cspreports")
+        # Reports are counted only once
+        call_command("rollup_cspreports")
+        create_csp_report(datetime(2016, 4, 27, 13, tzinfo=dt_timezone.utc), is_valid=True,
+                          document_uri='http://example.cz/')
+
+        call_command("rollup_cspreports")
+
+        self.assertEqual(CSPReportRollup.objects.get().count, 2)
+
+    def test_rollup_delay(self):
+        # The rollup stops at the first recent report, reports before it may still be committed
+        old = create_csp_report(datetime(2016, 4, 27, 12, tzinfo=dt_timezone.utc), is_valid=True)
+        CSPReport.objects.create(is_valid=True)
+        create_csp_report(datetime(2016, 4, 27, 13, tzinfo=dt_timezone.utc), is_valid=True)
+
+        call_command("rollup_cspreports")
+
+        self.assertEqual(CSPReportRollup.objects.get().count, 1)
+        self.assertEqual(CSPRollupHighWaterMark.objects.get().last_pk, old.pk)
+
+        call_command("rollup_cspreports", delay=0)
+
+        self.assertEqual(sum(CSPReportRollup.objects.values_list('count', flat=True)), 3)
+
+    @override_settings(CSP_REPORTS_AGGREGATE=True)
+    def test_aggregate(self):
+        with self.assertRaisesMessage(CommandError, "CSP_REPORTS_AGGREGATE is set"):
+            call_command("rollup_cspreports")
+
+    def test_rollup_weight(self):
+        # Test sampled reports are counted by their weights
+        create_csp_report(datetime(2016, 4, 27, 12, tzinfo=dt_timezone.utc), is_valid=True, weight=10)
+        buff = StringIO()
+
+        call_command("rollup_cspreports", verbosity=2, stdout=buff)
+
+        self.assertEqual(CSPReportRollup.objects.get().count, 10)
+        self.assertIn("Counted 1 new reports in the rollups.", buff.getvalue())
+
+
+class TestLoadCspreportsSpool(TestCase):
+    """Test `load_cspreports_spool` command."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        patcher = patch('cspreports.spool.atexit.register')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_not_configured(self):
+        with self.assertRaisesMessage(CommandError, "CSP_REPORTS_SPOOL_DIR is not set."):
+            call_command("load_cspreports_spool")
+
+    def test_load(self):
+        writer = SpoolWriter(self.directory, max_bytes=1024, fsync_every=1)
+        writer.write('{"csp-report": {"document-uri": "http://example.cz/"}}', 'Agent007',
+                     datetime(2016, 4, 27, 12, tzinfo=dt_timezone.utc))
+        writer.write('NOT_A_JSON', 'Agent007', datetime(2016, 4, 27, 13, tzinfo=dt_timezone.utc))
+        writer.close()
+        # Open segments are not loaded
+        writer.write('{}', 'Agent007')
+        with open(os.path.join(self.directory, 'broken.spool'), 'wb') as segment:
+            segment.write(b'{"report": "{}", "user_agent": "Agent007", "created": "2016-04-27T14:00:00+00:00"}\n')
+            segment.write(b'{"report": "{}", "user_a')
+        buff = StringIO()
+
+        with self.settings(CSP_REPORTS_SPOOL_DIR=self.directory):
+            call_command("load_cspreports_spool", batch_size=1, verbosity=2, stdout=buff)
+
+        self.assertQuerySetEqual(
+            CSPReport.objects.order_by('created').values_list('document_uri', 'user_agent', 'is_valid', 'created'),
+            [('http://example.cz/', 'Agent007', False, datetime(2016, 4, 27, 12, tzinfo=dt_timezone.utc)),
+             (None, 'Agent007', False, datetime(2016, 4, 27, 13, tzinfo=dt_timezone.utc)),
+             (None, 'Agent007', False, datetime(2016, 4, 27, 14, tzinfo=dt_timezone.utc))],
+            transform=tuple,
+        )
+        self.assertIn("skipped 1 invalid lines", buff.getvalue())
+        self.assertEqual([name for name in os.listdir(self.directory) if not name.endswith('.open')], [])
+
+    def test_recover(self):
+        # Segments of a loader which was killed are loaded again once they are stale
+        line = b'{"report": "{}", "user_agent": "Agent007", "created": "2016-04-27T14:00:00+00:00"}\n'
+        for name in ('stale.loading', 'claimed.loading'):
+            with open(os.path.join(self.directory, name), 'wb') as segment:
+                segment.write(line)
+        os.utime(os.path.join(self.directory, 'stale.loading'), (0, 0))
+        buff = StringIO()
+
+        with self.settings(CSP_REPORTS_SPOOL_DIR=self.directory):
+            call_command("load_cspreports_spool", stdout=buff)
+
+        self.assertEqual(CSPReport.objects.count(), 1)
+        self.assertEqual(os.listdir(self.directory), ['claimed.loading'])
+        self.assertIn("Recovered 1 segments", buff.getvalue())
+
+    def test_recover_open(self):
+        # Open segments of writers which no longer run or which are idle are loaded
+        process = subprocess.Popen([sys.executable, '-c', ''])
+        process.wait()
+        line = b'{"report": "{}", "user_agent": "Agent007", "created": "2016-04-27T14:00:00+00:00"}\n'
+        names = ['20160427140000000000-{}-000000.open'.format(process.pid),
+                 '20160427140000000000-{}-000000.open'.format(os.getpid()),
+                 '20160427140000000000-{}-000001.open'.format(os.getpid())]
+        for name in names:
+            with open(os.path.join(self.directory, name), 'wb') as segment:
+                segment.write(line)
+        os.utime(os.path.join(self.directory, names[2]), (0, 0))
+        buff = StringIO()
+
+        with self.settings(CSP_REPORTS_SPOOL_DIR=self.directory):
+            call_command("load_cspreports_spool", stdout=buff)
+
+        self.assertEqual(CSPReport.objects.count(), 2)
+        self.assertEqual(os.listdir(self.directory), [names[1]])
+        self.assertIn("Recovered 2 segments", buff.getvalue())
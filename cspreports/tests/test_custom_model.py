@@ -43,3 +43,9 @@ class TestGetReportModelModel(TestCase):
         """Test get_report_model with an invalid model string"""
         with self.assertRaises(ImproperlyConfigured):
             get_report_model()
+
+    def test_custom_model_indexes(self):
+        """Test that a custom report model inherits the indexes"""
+        self.assertCountEqual([tuple(index.fields) for index in CustomCSPReport._meta.indexes],
+                              [("created",), ("is_valid", "created")])
+        self.assertTrue(all(index.name.startswith("tests_") for index in CustomCSPReport._meta.indexes))
@@ -0,0 +1,69 @@
+"""Test `decoding` module."""
+from django.db import models
+from django.test import SimpleTestCase
+
+from cspreports.decoding import ReportDecoder, get_clean_check, get_decoder
+from cspreports.models import OPTIONAL_FIELDS, REQUIRED_FIELDS, CSPReport
+from cspreports.tests.models import CustomCSPReport
+
+FIELDS = REQUIRED_FIELDS + OPTIONAL_FIELDS
+VALUES = (None, '', 'value', 'report', 'enforce', 'x' * 20, 0, 36, -1, 70000, 2 ** 40, True, 1.5, '36', [], {})
+
+
+class TestGetCleanCheck(SimpleTestCase):
+    """Test `get_clean_check` function."""
+
+    def test_text(self):
+        is_clean = get_clean_check(CSPReport._meta.get_field('document_uri'))
+        self.assertTrue(is_clean('http://example.cz/'))
+        self.assertTrue(is_clean(None))
+        self.assertFalse(is_clean(42))
+
+    def test_integer(self):
+        is_clean = get_clean_check(CSPReport._meta.get_field('status_code'))
+        self.assertTrue(is_clean(200))
+        self.assertTrue(is_clean(None))
+        self.assertFalse(is_clean(-1))
+        self.assertFalse(is_clean('200'))
+        self.assertFalse(is_clean(True))
+
+    def test_choices(self):
+        is_clean = get_clean_check(CSPReport._meta.get_field('disposition'))
+        self.assertTrue(is_clean('report'))
+        self.assertTrue(is_clean(''))
+        self.assertFalse(is_clean('other'))
+        self.assertFalse(is_clean({}))
+
+    def test_no_check(self):
+        self.assertIsNone(get_clean_check(models.DateTimeField()))
+
+
+class TestReportDecoder(SimpleTestCase):
+    """Test `ReportDecoder` class."""
+
+    def test_same_as_full_validation(self):
+        # The fast path gives the same results as the full validation
+        decoder = ReportDecoder(CSPReport, FIELDS)
+        full_decoder = ReportDecoder(CSPReport, FIELDS)
+        full_decoder.fields = [(json_name, name, lambda value: False, to_python, clean)
+                               for json_name, name, _, to_python, clean in full_decoder.fields]
+        for value in VALUES:
+            report_data = {json_field_name: value for json_field_name, _ in FIELDS}
+            report = CSPReport()
+            full_report = CSPReport()
+            with self.subTest(value=value):
+                self.assertEqual(decoder.decode(report, report_data), full_decoder.decode(full_report, report_data))
+                for _, name in FIELDS:
+                    self.assertEqual(getattr(report, name), getattr(full_report, name))
+
+    def test_get_decoder(self):
+        self.assertIs(get_decoder(CSPReport, FIELDS), get_decoder(CSPReport, FIELDS))
+        self.assertIsNot(get_decoder(CustomCSPReport, FIELDS), get_decoder(CSPReport, FIELDS))
+
+    def test_custom_model(self):
+        report = CustomCSPReport.from_message('{"csp-report": {"document-uri": "http://example.cz/", "referrer": "",'
+                                              ' "blocked-uri": "", "violated-directive": "", "original-policy": "",'
+                                              ' "line-number": "36"}}')
+
+        self.assertTrue(report.is_valid)
+        self.assertEqual(report.line_number, 36)
@@ -0,0 +1,104 @@
+"""Test `digest` module."""
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from cspreports.digest import EmailDigest, get_digest_key
+from cspreports.parsing import ParsedReport
+
+REPORT = '{"csp-report": {"document-uri": "http://example.cz/?%s", "blocked-uri": "http://example.evil/"}}'
+
+
+class TestGetDigestKey(SimpleTestCase):
+    """Test `get_digest_key` function."""
+
+    def test_key(self):
+        self.assertEqual(get_digest_key(ParsedReport(REPORT % 1)), get_digest_key(ParsedReport(REPORT % 2)))
+        self.assertNotEqual(get_digest_key(ParsedReport(REPORT % 1)),
+                            get_digest_key(ParsedReport('{"csp-report": {"document-uri": "http://other.cz/"}}')))
+
+    def test_invalid(self):
+        self.assertEqual(get_digest_key(ParsedReport('JUNK')), get_digest_key(ParsedReport('JUNK')))
+        self.assertNotEqual(get_digest_key(ParsedReport('JUNK')), get_digest_key(ParsedReport('OTHER')))
+
+    def test_invalid_field_types(self):
+        report = '{"csp-report": {"violated-directive": %s, "document-uri": 5}}'
+        self.assertEqual(get_digest_key(ParsedReport(report % 5)), get_digest_key(ParsedReport(report % 5)))
+        self.assertNotEqual(get_digest_key(ParsedReport(report % 5)), get_digest_key(ParsedReport(report % 6)))
+
+
+class TestEmailDigest(SimpleTestCase):
+    """Test `EmailDigest` class."""
+
+    def setUp(self):
+        patcher = patch('cspreports.buffers.atexit.register')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_digest(self, **kwargs):
+        digest = EmailDigest(**dict({'interval': 3600, 'max_reports': 100, 'suppress_window': 3600}, **kwargs))
+        patcher = patch.object(digest.buffer, '_ensure_thread')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return digest
+
+    def test_send(self):
+        digest = self.make_digest()
+        for i in range(3):
+            digest.add(ParsedReport(REPORT % i, user_agent='Agent007'))
+        digest.add(ParsedReport('JUNK', user_agent='Agent007'))
+
+        with patch('cspreports.digest.mail_admins') as mail_mock:
+            digest.flush()
+
+        mail_mock.assert_called_once()
+        subject, message = mail_mock.call_args[0]
+        self.assertEqual(subject, 'CSP Violation Reports digest (4 reports)')
+        self.assertIn('4 reports of 2 violations.', message)
+        self.assertIn('1. Reported 3 times', message)
+        self.assertIn('2. Reported 1 times', message)
+        self.assertIn('Agent007', message)
+        self.assertIn('"document-uri": "http://example.cz/?0"', message)
+        self.assertIn('Invalid JSON. Raw dump is below.\n\nJUNK', message)
+
+    def test_empty(self):
+        digest = self.make_digest()
+        with patch('cspreports.digest.mail_admins') as mail_mock:
+            digest.flush()
+        self.assertFalse(mail_mock.called)
+
+    def test_max_reports(self):
+        digest = self.make_digest(max_reports=2)
+        for i in range(3):
+            digest.add(ParsedReport('JUNK %s' % i))
+
+        with patch('cspreports.digest.mail_admins') as mail_mock:
+            digest.flush()
+
+        self.assertEqual(mail_mock.call_count, 2)
+
+    def test_suppress(self):
+        digest = self.make_digest()
+        with patch('cspreports.digest.mail_admins') as mail_mock:
+            digest.add(ParsedReport(REPORT % 1))
+            digest.flush()
+            digest.add(ParsedReport(REPORT % 2))
+            digest.flush()
+            digest.add(ParsedReport(REPORT % 3))
+            digest.add(ParsedReport('JUNK'))
+            digest.flush()
+
+        self.assertEqual(mail_mock.call_count, 2)
+        message = mail_mock.call_args[0][1]
+        self.assertIn('1 reports of 1 violations.', message)
+        self.assertIn('1 more reports of violations mailed in the last 3600 seconds are left out.', message)
+
+    def test_suppress_window(self):
+        digest = self.make_digest(suppress_window=0)
+        with patch('cspreports.digest.mail_admins') as mail_mock:
+            digest.add(ParsedReport(REPORT % 1))
+            digest.flush()
+            digest.add(ParsedReport(REPORT % 2))
+            digest.flush()
+
+        self.assertEqual(mail_mock.call_count, 2)
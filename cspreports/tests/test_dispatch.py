@@ -0,0 +1,107 @@
+"""Test `dispatch` module."""
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from cspreports import stats, utils
+from cspreports.dispatch import HandlerPool
+from cspreports.parsing import ParsedReport, parsed_report_handler
+
+COUNTER = 'handlers.cspreports.tests.test_dispatch.{}.{}'
+
+
+@parsed_report_handler
+def ok_handler(report):
+    report.request.handled = True
+
+
+@parsed_report_handler
+def failing_handler(report):
+    raise ValueError("Handler failed.")
+
+
+@parsed_report_handler
+def slow_handler(report):
+    time.sleep(0.01)
+
+
+async def async_slow_handler(request):
+    await asyncio.sleep(1)
+
+
+class TestHandlerPool(SimpleTestCase):
+    """Test `HandlerPool` class."""
+
+    def setUp(self):
+        stats.reset()
+        self.report = ParsedReport('{}', request=RequestFactory().post('/dummy/'))
+
+    def test_outcomes(self):
+        pool = HandlerPool(max_workers=2, max_queue=10, timeout=0.001)
+
+        with self.assertLogs('CSP Reports', 'WARNING'):
+            futures = [pool.submit(handler, self.report) for handler in (ok_handler, failing_handler, slow_handler)]
+            for future in futures:
+                future.result()
+
+        self.assertTrue(self.report.request.handled)
+        self.assertEqual(stats.get_counts(), {
+            COUNTER.format('ok_handler', 'success'): 1,
+            COUNTER.format('failing_handler', 'failure'): 1,
+            COUNTER.format('slow_handler', 'timeout'): 1,
+        })
+
+    def test_full_queue(self):
+        pool = HandlerPool(max_workers=1, max_queue=1, timeout=10)
+        event = threading.Event()
+
+        future = pool.submit(parsed_report_handler(lambda report: event.wait()), self.report)
+        self.assertIsNone(pool.submit(ok_handler, self.report))
+        event.set()
+        future.result()
+        # There's a free slot again
+        pool.submit(ok_handler, self.report).result()
+
+        self.assertEqual(stats.get_counts()[COUNTER.format('ok_handler', 'dropped')], 1)
+        self.assertEqual(stats.get_counts()[COUNTER.format('ok_handler', 'success')], 1)
+
+    def test_async_timeout(self):
+        pool = HandlerPool(max_workers=1, max_queue=1, timeout=0.01)
+
+        with self.assertLogs('CSP Reports', 'WARNING'):
+            asyncio.run(pool.run_async(async_slow_handler, self.report))
+
+        self.assertEqual(stats.get_counts(), {COUNTER.format('async_slow_handler', 'timeout'): 1})
+
+    def test_async_sync_handler(self):
+        pool = HandlerPool(max_workers=1, max_queue=1, timeout=10)
+
+        asyncio.run(pool.run_async(ok_handler, self.report))
+
+        self.assertEqual(stats.get_counts(), {COUNTER.format('ok_handler', 'success'): 1})
+
+
+@override_settings(CSP_REPORTS_ADDITIONAL_HANDLERS_MODE='pool', CSP_REPORTS_ADDITIONAL_HANDLERS=[
+    'cspreports.tests.test_dispatch.failing_handler', 'cspreports.tests.test_dispatch.ok_handler'])
+class TestRunAdditionalHandlers(SimpleTestCase):
+    """Test `run_additional_handlers` in the pool mode."""
+
+    def setUp(self):
+        stats.reset()
+
+    def test_pool(self):
+        pool = HandlerPool(max_workers=2, max_queue=10, timeout=10)
+        request = RequestFactory().post('/dummy/', '{}', content_type='application/json')
+        with patch('cspreports.utils._handler_pool', pool), self.assertLogs('CSP Reports', 'ERROR'):
+            # The failing handler doesn't affect the other handler nor the caller
+            utils.run_additional_handlers(request)
+            pool.executor.shutdown(wait=True)
+
+        self.assertTrue(request.handled)
+        self.assertEqual(stats.get_counts(), {
+            COUNTER.format('ok_handler', 'success'): 1,
+            COUNTER.format('failing_handler', 'failure'): 1,
+        })
@@ -0,0 +1,79 @@
+"""Test `interning` module."""
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from cspreports.interning import LRUCache, get_text_hash, get_text_ids, intern_report_texts
+from cspreports.models import CSPReport, CSPReportText
+from cspreports.utils import save_reports
+
+POLICY = "default-src 'self'; script-src 'self' https://cdn.example.com"
+
+
+class TestLRUCache(SimpleTestCase):
+    """Test `LRUCache` class."""
+
+    def test_cache(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+
+        # The least recently used item is dropped.
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+
+        cache.clear()
+        self.assertIsNone(cache.get('a'))
+
+
+class TestInterning(TestCase):
+    """Test `get_text_ids` and `intern_report_texts` functions."""
+
+    def setUp(self):
+        patcher = patch('cspreports.interning._text_cache', LRUCache(10))
+        self.cache = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_text_ids(self):
+        existing = CSPReportText.objects.create(hash=get_text_hash('Agent'), value='Agent')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            text_ids = get_text_ids(['Agent', POLICY, POLICY])
+
+        new = CSPReportText.objects.get(value=POLICY)
+        self.assertEqual(text_ids, {'Agent': existing.pk, POLICY: new.pk})
+        # The known texts don't need any query.
+        with self.assertNumQueries(0):
+            self.assertEqual(get_text_ids([POLICY, 'Agent']), text_ids)
+
+    def test_get_text_ids_not_committed(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            get_text_ids([POLICY])
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertIsNone(self.cache.get(get_text_hash(POLICY)))
+
+    def test_intern_report_texts(self):
+        reports = [CSPReport(original_policy=POLICY, user_agent='Agent'),
+                   CSPReport(original_policy=POLICY, user_agent=''),
+                   CSPReport(original_policy=None)]
+
+        intern_report_texts(reports)
+
+        self.assertEqual(CSPReportText.objects.count(), 2)
+        self.assertEqual([report.original_policy for report in reports], ['', '', None])
+        self.assertEqual(reports[0].original_policy_text_id, reports[1].original_policy_text_id)
+        self.assertIsNone(reports[1].user_agent_text_id)
+        self.assertIsNone(reports[2].original_policy_text_id)
+
+    @override_settings(CSP_REPORTS_INTERN_TEXTS=True)
+    def test_save_reports(self):
+        save_reports([CSPReport(original_policy=POLICY, user_agent='Agent'), CSPReport(original_policy=POLICY)])
+
+        reports = CSPReport.objects.order_by('pk')
+        self.assertEqual([report.get_original_policy() for report in reports], [POLICY, POLICY])
+        self.assertEqual([report.get_user_agent() for report in reports], ['Agent', ''])
+        self.assertEqual(CSPReportText.objects.count(), 2)
@@ -4,7 +4,8 @@ import json
 from django.db import connection
 from django.test import SimpleTestCase
 
-from cspreports.models import CSPReport
+from cspreports.fingerprints import get_fingerprint
+from cspreports.models import ROOT_URI_MAX_LENGTH, CSPReport
 
 
 class TestCSPReport(SimpleTestCase):
@@ -26,6 +27,10 @@ class TestCSPReport(SimpleTestCase):
         self.assertJSONEqual(CSPReport(json=json.dumps({'csp-report': {}})).nice_report, {})
         self.assertJSONEqual(CSPReport(json=json.dumps({'csp-report': {'key': 'value'}})).nice_report, {'key': 'value'})
 
+    def test_nice_report_reporting_api(self):
+        report = CSPReport(json=json.dumps({'type': 'csp-violation', 'body': {'documentURL': 'http://example.cz/'}}))
+        self.assertJSONEqual(report.nice_report, {'documentURL': 'http://example.cz/'})
+
     def test_text_representation(self):
         self.assertEqual(str(CSPReport(json='')), '[no CSP report data]')
         self.assertEqual(str(CSPReport(json='Not a JSON')), "Invalid CSP report: 'Not a JSON'")
@@ -43,6 +48,8 @@ class TestFromMessage(SimpleTestCase):
         self.assertFalse(report.is_valid)
         self.assertEqual(report.json, 'NOT_A_JSON')
         self.assertIsNone(report.document_uri)
+        # The fingerprint is the same as the one set by `save`
+        self.assertEqual(report.fingerprint, get_fingerprint(None, None, None))
 
     def test_invalid_report(self):
         # Test report which is only a valid JSON.
@@ -51,6 +58,7 @@ class TestFromMessage(SimpleTestCase):
         self.assertFalse(report.is_valid)
         self.assertEqual(report.json, '{}')
         self.assertIsNone(report.document_uri)
+        self.assertEqual(report.fingerprint, get_fingerprint(None, None, None))
 
     def test_empty_csp_report(self):
         # Test JSON with empty 'csp-report' object.
@@ -219,6 +227,62 @@ class TestFromMessage(SimpleTestCase):
         self.assertEqual(report.original_policy, 'Nothing is allowed.')
         self.assertEqual(report.disposition, 'INVALID')
 
+    def test_reporting_api(self):
+        # Test report in the format of the Reporting API
+        data = {'type': 'csp-violation', 'age': 10, 'url': 'http://protected.example.cz/',
+                'user_agent': 'Agent007',
+                'body': {'documentURL': 'http://protected.example.cz/',
+                         'referrer': 'http://referrer.example.cz/',
+                         'blockedURL': 'http://dangerous.example.cz/',
+                         'effectiveDirective': 'script-src-elem',
+                         'originalPolicy': 'Nothing is allowed.',
+                         'sourceFile': 'nasty-script.js',
+                         'sample': '',
+                         'disposition': 'enforce',
+                         'statusCode': 200,
+                         'lineNumber': 36,
+                         'columnNumber': 32}}
+        message = json.dumps(data)
+        report = CSPReport.from_message(message)
+
+        self.assertTrue(report.is_valid)
+        self.assertEqual(report.json, message)
+        self.assertEqual(report.document_uri, 'http://protected.example.cz/')
+        self.assertEqual(report.referrer, 'http://referrer.example.cz/')
+        self.assertEqual(report.blocked_uri, 'http://dangerous.example.cz/')
+        self.assertEqual(report.violated_directive, 'script-src-elem')
+        self.assertEqual(report.effective_directive, 'script-src-elem')
+        self.assertEqual(report.original_policy, 'Nothing is allowed.')
+        self.assertEqual(report.source_file, 'nasty-script.js')
+        self.assertEqual(report.disposition, 'enforce')
+        self.assertEqual(report.status_code, 200)
+        self.assertEqual(report.line_number, 36)
+        self.assertEqual(report.column_number, 32)
+
+    def test_reporting_api_other_type(self):
+        # Test Reporting API report of other type than CSP violation
+        report = CSPReport.from_message(json.dumps({'type': 'deprecation', 'body': {'id': 'feature'}}))
+
+        self.assertFalse(report.is_valid)
+        self.assertIsNone(report.document_uri)
+
+    def test_normalised_fields(self):
+        data = {'csp-report': {'document-uri': 'http://protected.example.cz/page/?query#fragment',
+                               'blocked-uri': 'http://dangerous.example.cz/script.js?v=1',
+                               'violated-directive': 'script-src'}}
+        report = CSPReport.from_message(json.dumps(data))
+
+        self.assertEqual(report.document_root, 'http://protected.example.cz/page/')
+        self.assertEqual(report.blocked_root, 'http://dangerous.example.cz/script.js')
+        self.assertEqual(report.fingerprint, get_fingerprint('http://protected.example.cz/page/',
+                                                             'http://dangerous.example.cz/script.js', 'script-src'))
+
+    def test_normalised_fields_long_uri(self):
+        data = {'csp-report': {'document-uri': 'http://protected.example.cz/' + 'a' * 300}}
+        report = CSPReport.from_message(json.dumps(data))
+
+        self.assertEqual(len(report.document_root), ROOT_URI_MAX_LENGTH)
+
     def test_json_str_value_to_int(self):
         data = {
             'csp-report': {
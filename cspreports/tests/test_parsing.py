@@ -0,0 +1,146 @@
+"""Test `parsing` module."""
+import json
+from unittest.mock import patch
+
+from django.test import RequestFactory, SimpleTestCase
+
+from cspreports import codec
+from cspreports.parsing import (ParsedReport, call_handler, get_csp_report, parse_reports, parsed_report_handler,
+                                to_parsed_report)
+
+REPORTING_API_BODY = (
+    '[{"type": "csp-violation", "user_agent": "Agent007", "body": {"documentURL": "http://example.cz/", '
+    '"effectiveDirective": "script-src"}}, '
+    '{"type": "deprecation", "body": {}}, '
+    '{"type": "csp-violation", "body": {"documentURL": "http://example.cz/other/"}}]'
+)
+
+
+class TestParsedReport(SimpleTestCase):
+    """Test `ParsedReport` class."""
+
+    def test_from_request(self):
+        request = RequestFactory(HTTP_USER_AGENT='Agent007').post(
+            '/dummy/', '{"csp-report": {"document-uri": "http://example.cz/"}}', content_type='application/json')
+        report = ParsedReport.from_request(request)
+
+        self.assertIs(report.request, request)
+        self.assertEqual(report.user_agent, 'Agent007')
+        self.assertEqual(report.raw, '{"csp-report": {"document-uri": "http://example.cz/"}}')
+        self.assertTrue(report.is_valid)
+        self.assertEqual(report.data, {'csp-report': {'document-uri': 'http://example.cz/'}})
+        self.assertEqual(report.csp_report, {'document-uri': 'http://example.cz/'})
+
+    def test_read_body(self):
+        request = RequestFactory().post('/dummy/', '{}', content_type='application/json')
+        report = ParsedReport.from_request(request)
+
+        report.read_body()
+        # The body isn't available anymore, e.g. the response has been sent.
+        request._body = None
+
+        self.assertEqual(report.raw, '{}')
+
+    def test_no_user_agent(self):
+        request = RequestFactory().post('/dummy/', '{}', content_type='application/json')
+        self.assertEqual(ParsedReport.from_request(request).user_agent, '')
+
+    def test_invalid_json(self):
+        report = ParsedReport('Not a JSON')
+
+        self.assertFalse(report.is_valid)
+        self.assertIsNone(report.data)
+        self.assertEqual(report.csp_report, {})
+        self.assertEqual(report.formatted, "Invalid JSON. Raw dump is below.\n\nNot a JSON")
+
+    def test_not_a_report(self):
+        report = ParsedReport('[1, 2]')
+
+        self.assertTrue(report.is_valid)
+        self.assertEqual(report.csp_report, {})
+
+    def test_formatted(self):
+        report = ParsedReport('{"b": 1, "a": {"c": 2}}')
+        self.assertEqual(report.formatted, '{\n    "a": {\n        "c": 2\n    },\n    "b": 1\n}')
+
+    def test_parsed_once(self):
+        report = ParsedReport('{"csp-report": {}}')
+        with patch('cspreports.codec.loads', return_value={'csp-report': {}}) as loads_mock:
+            report.data
+            report.is_valid
+            report.csp_report
+            report.formatted
+        self.assertEqual(loads_mock.call_count, 1)
+
+
+class TestGetCspReport(SimpleTestCase):
+    """Test `get_csp_report` function."""
+
+    def test_csp_report(self):
+        self.assertEqual(get_csp_report({'csp-report': {'document-uri': 'http://example.cz/'}}),
+                         {'document-uri': 'http://example.cz/'})
+
+    def test_reporting_api(self):
+        data = {'type': 'csp-violation', 'body': {'documentURL': 'http://example.cz/', 'effectiveDirective': 'img-src',
+                                                  'unknown': 'value'}}
+        self.assertEqual(get_csp_report(data), {'document-uri': 'http://example.cz/', 'violated-directive': 'img-src',
+                                                'effective-directive': 'img-src'})
+
+    def test_invalid(self):
+        self.assertIsNone(get_csp_report(None))
+        self.assertIsNone(get_csp_report([]))
+        self.assertIsNone(get_csp_report({}))
+        self.assertIsNone(get_csp_report({'csp-report': 'value'}))
+        self.assertIsNone(get_csp_report({'type': 'deprecation', 'body': {}}))
+        self.assertIsNone(get_csp_report({'type': 'csp-violation', 'body': None}))
+
+
+class TestParseReports(SimpleTestCase):
+    """Test `parse_reports` function."""
+
+    def test_single(self):
+        request = RequestFactory().post('/dummy/', '{"csp-report": {}}', content_type='application/csp-report')
+        reports = parse_reports(request)
+
+        self.assertEqual(len(reports), 1)
+        self.assertIs(reports[0].request, request)
+
+    def test_reporting_api(self):
+        request = RequestFactory(HTTP_USER_AGENT='Agent008').post('/dummy/', REPORTING_API_BODY,
+                                                                  content_type='application/reports+json')
+        with patch('cspreports.codec.loads', wraps=codec.loads) as loads_mock:
+            reports = parse_reports(request)
+            self.assertEqual([report.csp_report.get('document-uri') for report in reports],
+                             ['http://example.cz/', 'http://example.cz/other/'])
+        self.assertEqual(loads_mock.call_count, 1)
+        self.assertEqual([report.user_agent for report in reports], ['Agent007', 'Agent008'])
+        self.assertEqual(json.loads(reports[0].raw)['body']['effectiveDirective'], 'script-src')
+        self.assertTrue(reports[0].is_valid)
+
+    def test_reporting_api_not_a_list(self):
+        request = RequestFactory().post('/dummy/', '{}', content_type='application/reports+json')
+        self.assertEqual(len(parse_reports(request)), 1)
+
+
+class TestHandlers(SimpleTestCase):
+    """Test handler helpers."""
+
+    def test_to_parsed_report(self):
+        report = ParsedReport('{}')
+        self.assertIs(to_parsed_report(report), report)
+        request = RequestFactory().post('/dummy/', '{}', content_type='application/json')
+        self.assertIs(to_parsed_report(request).request, request)
+
+    def test_call_handler(self):
+        request = RequestFactory().post('/dummy/', '{}', content_type='application/json')
+        report = ParsedReport.from_request(request)
+
+        @parsed_report_handler
+        def new_handler(argument):
+            return argument
+
+        def old_handler(argument):
+            return argument
+
+        self.assertIs(call_handler(new_handler, report), report)
+        self.assertIs(call_handler(old_handler, report), request)
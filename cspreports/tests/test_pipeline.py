@@ -0,0 +1,169 @@
+"""Test `pipeline` module."""
+from unittest.mock import Mock, patch
+
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from cspreports import codec, interning, pipeline, utils
+from cspreports.filters import filter_browser_extensions
+from cspreports.models import CSPReport
+from cspreports.tests.test_utils import my_handler
+from cspreports.views import report_csp
+
+
+@override_settings(CSP_REPORTS_EMAIL_ADMINS=False, CSP_REPORTS_LOG=True, CSP_REPORTS_SAVE=True)
+class TestPipeline(SimpleTestCase):
+    """Test `Pipeline` class and `get_pipeline` function."""
+
+    def test_default(self):
+        report_pipeline = pipeline.get_pipeline()
+
+        self.assertIsNone(report_pipeline.filter_rules)
+        self.assertIsNone(report_pipeline.filter_function)
+        self.assertFalse(report_pipeline.sample)
+        self.assertEqual([stage.func for stage in report_pipeline.stages[1:]], [utils.save_report])
+        self.assertEqual(len(report_pipeline.async_stages), 2)
+        self.assertEqual(report_pipeline.additional_handlers, ())
+        self.assertIsNone(report_pipeline.handler_pool)
+
+    @override_settings(CSP_REPORTS_FILTER_FUNCTION='cspreports.filters.filter_browser_extensions',
+                       CSP_REPORTS_FILTER_RULES=[{'field': 'blocked-uri', 'prefix': 'data:'}],
+                       CSP_REPORTS_ADDITIONAL_HANDLERS=['cspreports.tests.test_utils.my_handler'],
+                       CSP_REPORTS_SAMPLE_RATE=0.5, CSP_REPORTS_LOG=False, CSP_REPORTS_SAVE=False)
+    def test_resolved(self):
+        report_pipeline = pipeline.get_pipeline()
+
+        self.assertIsNotNone(report_pipeline.filter_rules)
+        self.assertIs(report_pipeline.filter_function, filter_browser_extensions)
+        self.assertTrue(report_pipeline.sample)
+        self.assertEqual(report_pipeline.additional_handlers, (my_handler, ))
+        self.assertEqual(utils.get_additional_handlers(), [my_handler])
+        self.assertIs(utils.get_filter_function(), filter_browser_extensions)
+        self.assertEqual(len(report_pipeline.stages), 1)
+        self.assertEqual(len(report_pipeline.async_stages), 1)
+
+    def test_cached(self):
+        self.assertIs(pipeline.get_pipeline(), pipeline.get_pipeline())
+
+    def test_setting_changed(self):
+        report_pipeline = pipeline.get_pipeline()
+
+        with override_settings(CSP_REPORTS_SAVE=False):
+            self.assertEqual(pipeline.get_pipeline().stages[1:], ())
+        self.assertIsNot(pipeline.get_pipeline(), report_pipeline)
+        self.assertEqual([stage.func for stage in pipeline.get_pipeline().stages[1:]], [utils.save_report])
+
+    def test_other_setting_changed(self):
+        report_pipeline = pipeline.get_pipeline()
+
+        with override_settings(DEBUG=True):
+            self.assertIs(pipeline.get_pipeline(), report_pipeline)
+
+    def test_changed_while_built(self):
+        # The settings change while the pipeline is built.
+        def build():
+            with override_settings(CSP_REPORTS_LOG=False):
+                pass
+            return Pipeline()
+
+        Pipeline = pipeline.Pipeline
+        pipeline.reset_pipeline(setting='CSP_REPORTS_LOG')
+        with patch('cspreports.pipeline.Pipeline', side_effect=build):
+            report_pipeline = pipeline.get_pipeline()
+        # The pipeline is used, but it's not kept.
+        self.assertIsNone(pipeline._pipeline)
+        self.assertIsNot(pipeline.get_pipeline(), report_pipeline)
+
+
+class SettingsNotRead:
+    """Django settings which fail when they are read."""
+
+    def __getattr__(self, name):
+        raise AssertionError("Setting {} was read.".format(name))
+
+
+@override_settings(CSP_REPORTS_EMAIL_ADMINS=False, CSP_REPORTS_LOG=True, CSP_REPORTS_SAVE=True,
+                   CSP_REPORTS_RATE_LIMIT_GLOBAL=(10, 60))
+class TestSettingsResolved(TestCase):
+    """Test the settings are not read when a report is processed."""
+
+    def post(self, **extra):
+        pipeline.get_pipeline()
+        codec.get_backend()
+        request = RequestFactory().post('/dummy/', '{"csp-report": {"document-uri": "http://example.cz/"}}',
+                                        content_type='application/csp-report', **extra)
+
+        with patch('cspreports.conf.settings', SettingsNotRead()), self.assertLogs('CSP Reports'):
+            return report_csp(request)
+
+    def test_report(self):
+        response = self.post()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(CSPReport.objects.count(), 1)
+
+    @override_settings(CSP_REPORTS_SAMPLE_RATE=0.5, CSP_REPORTS_SAMPLE_RATES={'script-src': 0.1})
+    def test_sampling(self):
+        cache.clear()
+
+        response = self.post()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(CSPReport.objects.count(), 1)
+
+    @override_settings(CSP_REPORTS_RATE_LIMIT_CLIENT=(10, 60), CSP_REPORTS_RATE_LIMIT_ORIGIN=(10, 60))
+    def test_rate_limits(self):
+        cache.clear()
+
+        response = self.post(HTTP_REFERER='http://example.cz/page/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(CSPReport.objects.count(), 1)
+
+    def test_bulk_save_reports(self):
+        pipeline.get_pipeline()
+
+        with patch('cspreports.conf.settings', SettingsNotRead()):
+            utils.bulk_save_reports([CSPReport.from_message('{"csp-report": {}}')])
+
+        self.assertEqual(CSPReport.objects.count(), 1)
+
+
+class TestResetComponents(SimpleTestCase):
+    """Test `reset_components` function."""
+
+    def test_json_backend(self):
+        with patch('cspreports.codec._backend', 'JUNK'):
+            with override_settings(CSP_REPORTS_JSON_BACKEND='json'):
+                self.assertEqual(codec.get_backend(), 'json')
+
+    def test_text_cache(self):
+        with override_settings(CSP_REPORTS_TEXT_CACHE_SIZE=5):
+            self.assertEqual(interning.get_text_cache().max_size, 5)
+        self.assertEqual(interning.get_text_cache().max_size, 1000)
+
+    def test_handler_pool(self):
+        with override_settings(CSP_REPORTS_HANDLER_POOL_SIZE=2):
+            self.assertEqual(utils.get_handler_pool().max_workers, 2)
+        self.assertEqual(utils.get_handler_pool().max_workers, 4)
+
+    def test_spool_writer(self):
+        spool_writer = Mock()
+        with patch('cspreports.utils._spool_writer', spool_writer):
+            pipeline.reset_components('CSP_REPORTS_SPOOL_DIR')
+            self.assertIsNone(utils._spool_writer)
+        spool_writer.close.assert_called_once_with()
+
+    def test_save_buffer(self):
+        save_buffer = Mock()
+        with patch('cspreports.utils._save_buffer', save_buffer):
+            pipeline.reset_components('CSP_REPORTS_BUFFER_MAX_SIZE')
+            self.assertIsNone(utils._save_buffer)
+        save_buffer.flush.assert_called_once_with()
+
+    def test_email_digest(self):
+        email_digest = Mock()
+        with patch('cspreports.utils._email_digest', email_digest):
+            pipeline.reset_components('CSP_REPORTS_EMAIL_DIGEST_INTERVAL')
+            self.assertIsNone(utils._email_digest)
+        email_digest.flush.assert_called_once_with()
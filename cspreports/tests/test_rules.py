@@ -0,0 +1,120 @@
+"""Test `rules` module."""
+from django.core.exceptions import ImproperlyConfigured
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from cspreports import stats
+from cspreports.filters import BROWSER_EXTENSION_RULE
+from cspreports.parsing import ParsedReport
+from cspreports.rules import CompiledRules, get_filter_rules
+from cspreports.utils import should_process_report
+
+RULES = (
+    BROWSER_EXTENSION_RULE,
+    {"name": "ads", "field": "blocked-uri", "host": ["doubleclick.net", "ads.example.com"]},
+    {"name": "injector", "field": "blocked-uri", "regex": r"isp-inject\d+\.js"},
+    {"field": "document-uri", "prefix": "http://localhost"},
+    {"name": "fonts", "directive": "font-src"},
+    {"name": "reports", "disposition": "report"},
+)
+
+
+class TestCompiledRules(SimpleTestCase):
+    """Test `CompiledRules` class."""
+
+    def setUp(self):
+        self.rules = CompiledRules(RULES)
+
+    def match(self, **fields):
+        number = self.rules.match({key.replace('_', '-'): value for key, value in fields.items()})
+        return None if number is None else self.rules.names[number]
+
+    def test_prefix(self):
+        self.assertEqual(self.match(source_file='moz-extension://abc/script.js'), 'browser_extensions')
+        self.assertIsNone(self.match(source_file='https://example.cz/moz-extension://'))
+        self.assertEqual(self.match(document_uri='http://localhost:8000/'), 'rule3')
+
+    def test_host(self):
+        self.assertEqual(self.match(blocked_uri='https://doubleclick.net/ad.js'), 'ads')
+        self.assertEqual(self.match(blocked_uri='https://static.DoubleClick.net/ad.js'), 'ads')
+        self.assertEqual(self.match(blocked_uri='https://ads.example.com/'), 'ads')
+        self.assertIsNone(self.match(blocked_uri='https://example.com/'))
+        self.assertIsNone(self.match(blocked_uri='https://notdoubleclick.net/'))
+        self.assertIsNone(self.match(blocked_uri='inline'))
+        self.assertIsNone(self.match(blocked_uri='http://[::1'))
+
+    def test_regex(self):
+        self.assertEqual(self.match(blocked_uri='http://isp.cz/isp-inject42.js'), 'injector')
+        self.assertIsNone(self.match(blocked_uri='http://isp.cz/isp-inject.js'))
+
+    def test_regex_independent(self):
+        # The regexes keep their global flags, backreferences and group names
+        rules = CompiledRules([
+            {"name": "flags", "field": "blocked-uri", "regex": r"(?i)evil\.js"},
+            {"name": "backreference", "field": "blocked-uri", "regex": [r"^(a)\1$", r"^(?P<r0>b)(?P=r0)$"]},
+        ])
+
+        self.assertEqual(rules.names[rules.match({"blocked-uri": "http://x.cz/EVIL.js"})], 'flags')
+        self.assertEqual(rules.names[rules.match({"blocked-uri": "aa"})], 'backreference')
+        self.assertEqual(rules.names[rules.match({"blocked-uri": "bb"})], 'backreference')
+        self.assertIsNone(rules.match({"blocked-uri": "a"}))
+
+    def test_directive(self):
+        self.assertEqual(self.match(violated_directive="font-src 'self'"), 'fonts')
+        self.assertEqual(self.match(effective_directive='font-src'), 'fonts')
+        self.assertIsNone(self.match(violated_directive='script-src'))
+
+    def test_disposition(self):
+        self.assertEqual(self.match(disposition='report'), 'reports')
+        self.assertIsNone(self.match(disposition='enforce'))
+
+    def test_invalid_field_types(self):
+        self.assertIsNone(self.match(blocked_uri=42, source_file=None))
+        self.assertIsNone(self.match(violated_directive=5))
+        self.assertIsNone(self.match(effective_directive=['font-src']))
+        self.assertIsNone(self.match(disposition=['report']))
+
+    def test_invalid_rules(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, "must have exactly one of"):
+            CompiledRules([{"field": "blocked-uri", "prefix": "a", "regex": "b"}])
+        with self.assertRaisesMessage(ImproperlyConfigured, "must have a field"):
+            CompiledRules([{"prefix": "a"}])
+        with self.assertRaisesMessage(ImproperlyConfigured, "Invalid regular expression in filter rule rule0"):
+            CompiledRules([{"field": "blocked-uri", "regex": "("}])
+
+
+class TestFilterRules(SimpleTestCase):
+    """Test filtering of reports by the rules."""
+
+    def setUp(self):
+        stats.reset()
+
+    def test_no_rules(self):
+        self.assertIsNone(get_filter_rules())
+
+    @override_settings(CSP_REPORTS_FILTER_RULES=RULES)
+    def test_compiled_once(self):
+        self.assertIs(get_filter_rules(), get_filter_rules())
+
+    @override_settings(CSP_REPORTS_FILTER_RULES=RULES)
+    def test_should_process_report(self):
+        ads = ParsedReport.from_data({"csp-report": {"blocked-uri": "https://doubleclick.net/"}})
+        other = ParsedReport.from_data({"csp-report": {"blocked-uri": "https://example.cz/"}})
+
+        self.assertFalse(should_process_report(ads))
+        self.assertFalse(should_process_report(ads))
+        self.assertTrue(should_process_report(other))
+        self.assertTrue(should_process_report(ParsedReport('NOT_A_JSON')))
+        self.assertEqual(stats.get_counts(), {'filter_rules.ads': 2})
+
+    @override_settings(CSP_REPORTS_FILTER_RULES=RULES)
+    def test_invalid_field_types(self):
+        self.assertTrue(should_process_report(ParsedReport('{"csp-report": {"violated-directive": 5}}')))
+        self.assertTrue(should_process_report(ParsedReport('{"csp-report": {"disposition": ["x"]}}')))
+
+    @override_settings(CSP_REPORTS_FILTER_RULES=RULES,
+                       CSP_REPORTS_FILTER_FUNCTION='cspreports.filters.filter_browser_extensions')
+    def test_filter_function(self):
+        # The filter function is applied to the reports which pass the rules
+        request = RequestFactory().post('/dummy/', 'NOT_A_JSON', content_type='application/json')
+
+        self.assertFalse(should_process_report(ParsedReport.from_request(request)))
@@ -0,0 +1,141 @@
+"""Tests for `cspreports.sampling` module."""
+import json
+from datetime import datetime, timezone as dt_timezone
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from cspreports import stats, utils
+from cspreports.fingerprints import get_fingerprint
+from cspreports.models import CSPReport
+from cspreports.parsing import ParsedReport
+from cspreports.sampling import get_sample_rate, get_weight, is_enabled, sample_report, sample_reports
+from cspreports.summary import collect
+
+from .utils import create_csp_report
+
+REPORT = {"csp-report": {"document-uri": "http://example.cz/", "blocked-uri": "http://example.evil/",
+                         "violated-directive": "script-src 'self'"}}
+
+
+class TestSampleRate(SimpleTestCase):
+    """Test sample rates and weights."""
+
+    def test_is_enabled(self):
+        self.assertFalse(is_enabled())
+        with self.settings(CSP_REPORTS_SAMPLE_RATE=0.5):
+            self.assertTrue(is_enabled())
+        with self.settings(CSP_REPORTS_SAMPLE_RATES={'script-src': 0.5}):
+            self.assertTrue(is_enabled())
+
+    @override_settings(CSP_REPORTS_SAMPLE_RATE=0.5, CSP_REPORTS_SAMPLE_RATES={'FINGERPRINT': 0.1, 'img-src': 0.2})
+    def test_get_sample_rate(self):
+        self.assertEqual(get_sample_rate('FINGERPRINT', 'img-src'), 0.1)
+        self.assertEqual(get_sample_rate('OTHER', 'img-src'), 0.2)
+        self.assertEqual(get_sample_rate('OTHER', 'script-src'), 0.5)
+
+    def test_get_weight(self):
+        self.assertEqual(get_weight(1), 1)
+        self.assertEqual(get_weight(0.5), 2)
+        self.assertEqual(get_weight(0.3), 3)
+        self.assertEqual(get_weight(0.001), 1000)
+        self.assertIsNone(get_weight(0))
+
+
+@override_settings(CSP_REPORTS_SAMPLE_RATE=0.1)
+class TestSampleReport(SimpleTestCase):
+    """Test `sample_report` function."""
+
+    def setUp(self):
+        cache.clear()
+        stats.reset()
+
+    def test_first_seen(self):
+        report = ParsedReport.from_data(REPORT)
+
+        with patch('cspreports.sampling.random.random', return_value=0.99):
+            self.assertTrue(sample_report(report))
+            self.assertEqual(report.weight, 1)
+            self.assertFalse(sample_report(ParsedReport.from_data(REPORT)))
+            # Other violation is seen for the first time
+            other = {"csp-report": dict(REPORT["csp-report"], **{"blocked-uri": "http://other.evil/"})}
+            self.assertTrue(sample_report(ParsedReport.from_data(other)))
+
+        self.assertEqual(stats.get_counts(), {'sampling.dropped': 1})
+
+    def test_sampled(self):
+        sample_report(ParsedReport.from_data(REPORT))
+        report = ParsedReport.from_data(REPORT)
+
+        with patch('cspreports.sampling.random.random', return_value=0.05):
+            self.assertTrue(sample_report(report))
+
+        self.assertEqual(report.weight, 10)
+
+    def test_rate_per_fingerprint(self):
+        fingerprint = get_fingerprint("http://example.cz/", "http://example.evil/", "script-src 'self'")
+        reports = [ParsedReport.from_data(REPORT) for _ in range(3)]
+
+        with self.settings(CSP_REPORTS_SAMPLE_RATES={fingerprint: 1}):
+            self.assertEqual(sample_reports(reports), reports)
+
+    def test_rate_per_directive(self):
+        sample_report(ParsedReport.from_data(REPORT))
+
+        with self.settings(CSP_REPORTS_SAMPLE_RATES={'script-src': 0}):
+            self.assertFalse(sample_report(ParsedReport.from_data(REPORT)))
+
+    def test_invalid(self):
+        self.assertEqual(len(sample_reports([ParsedReport('NOT_A_JSON') for _ in range(3)])), 3)
+
+    def test_invalid_field_types(self):
+        # Reports with fields of wrong types are not sampled
+        sample_report(ParsedReport.from_data(REPORT))
+        reports = [ParsedReport.from_data({"csp-report": {"violated-directive": 5}}),
+                   ParsedReport.from_data({"csp-report": {"document-uri": 5}}),
+                   ParsedReport.from_data({"csp-report": dict(REPORT["csp-report"], **{"blocked-uri": ["x"]})})]
+
+        with self.settings(CSP_REPORTS_SAMPLE_RATES={'script-src': 0}):
+            self.assertEqual(sample_reports(reports), reports)
+
+    def test_get_fingerprint(self):
+        self.assertEqual(get_fingerprint(5, ["x"], 5), get_fingerprint(None, None, None))
+
+
+@override_settings(CSP_REPORTS_SAMPLE_RATE=0.5, CSP_REPORTS_EMAIL_ADMINS=False, CSP_REPORTS_LOG=False)
+class TestProcessReportSampling(TestCase):
+    """Test sampling in `process_report`."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_process_report(self):
+        request_factory = RequestFactory()
+        with patch('cspreports.sampling.random.random', side_effect=[0.1, 0.9]):
+            for _ in range(3):
+                request = request_factory.post('/report/', json.dumps(REPORT), content_type='application/json')
+                utils.process_report(request)
+
+        self.assertQuerySetEqual(CSPReport.objects.order_by('pk').values_list('weight', flat=True), [1, 2])
+
+    def test_invalid_field_types(self):
+        request = RequestFactory().post('/report/', '{"csp-report": {"violated-directive": 5, "document-uri": 5}}',
+                                        content_type='application/json')
+
+        utils.process_report(request)
+
+        self.assertEqual(CSPReport.objects.count(), 1)
+
+    def test_summary(self):
+        created = datetime(2016, 4, 27, 12, tzinfo=dt_timezone.utc)
+        create_csp_report(created, is_valid=True, document_uri='http://example.cz/', weight=1)
+        create_csp_report(created, is_valid=True, document_uri='http://example.cz/', weight=10)
+        create_csp_report(created, weight=3)
+
+        summary = collect(datetime(2016, 4, 27, tzinfo=dt_timezone.utc), datetime(2016, 4, 28, tzinfo=dt_timezone.utc))
+
+        self.assertEqual(summary.valid_count, 11)
+        self.assertEqual(summary.invalid_count, 3)
+        self.assertEqual(summary.total_count, 14)
+        self.assertEqual(summary.sources[0].count, 11)
@@ -0,0 +1,87 @@
+"""Tests for `cspreports.search` module."""
+from datetime import datetime, timezone as dt_timezone
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from cspreports.models import CSPReport, CSPReportToken
+from cspreports.search import get_report_tokens, get_uri_tokens, index_reports, parse_term, search_reports
+from cspreports.utils import save_reports
+
+from .utils import create_csp_report
+
+
+class TestGetTokens(SimpleTestCase):
+    """Test tokenization of reports."""
+
+    def test_uri_tokens(self):
+        self.assertEqual(get_uri_tokens('https://CDN.example.com/lib.js?query'),
+                         {'cdn.example.com', 'example.com', 'https://cdn.example.com/lib.js'})
+        self.assertEqual(get_uri_tokens('inline'), {'inline'})
+        self.assertEqual(get_uri_tokens('data:image/png;base64,AAAA'), {'data'})
+        self.assertEqual(get_uri_tokens('http://[::1'), {'http://[::1'})
+
+    def test_report_tokens(self):
+        report = CSPReport(document_uri='http://example.cz/', blocked_uri='eval',
+                           violated_directive="script-src 'self'", effective_directive='script-src')
+
+        self.assertEqual(get_report_tokens(report), {
+            ('document', 'example.cz'), ('document', 'http://example.cz/'), ('blocked', 'eval'),
+            ('directive', 'script-src'),
+        })
+
+    def test_parse_term(self):
+        self.assertEqual(parse_term('CDN.example.com'), (None, 'cdn.example.com'))
+        self.assertEqual(parse_term('Blocked:cdn.example.com'), ('blocked', 'cdn.example.com'))
+        self.assertEqual(parse_term('http://example.cz/?query'), (None, 'http://example.cz/'))
+        self.assertEqual(parse_term('unknown:value'), (None, 'unknown:value'))
+        self.assertEqual(parse_term('http://[::1'), (None, 'http://[::1'))
+
+
+class TestSearchReports(TestCase):
+    """Test `index_reports` and `search_reports` functions."""
+
+    def setUp(self):
+        created = datetime(2016, 4, 27, 12, tzinfo=dt_timezone.utc)
+        self.cdn = create_csp_report(created, document_uri='http://example.cz/',
+                                     blocked_uri='https://cdn.example.com/lib.js', violated_directive='script-src')
+        self.document = create_csp_report(created, document_uri='https://cdn.example.com/',
+                                          blocked_uri='inline', violated_directive='style-src')
+        self.other = create_csp_report(created, document_uri='http://example.cz/',
+                                       blocked_uri='http://other.cz/', violated_directive='img-src')
+        index_reports(CSPReport.objects.all())
+
+    def search(self, search_term):
+        return set(search_reports(CSPReport.objects.all(), search_term))
+
+    def test_search(self):
+        self.assertEqual(self.search('cdn.example.com'), {self.cdn, self.document})
+        self.assertEqual(self.search('blocked:cdn.example.com'), {self.cdn})
+        self.assertEqual(self.search('example.com'), {self.cdn, self.document})
+        self.assertEqual(self.search('example.cz img-src'), {self.other})
+        self.assertEqual(self.search('"https://cdn.example.com/lib.js?version=1"'), {self.cdn})
+        self.assertEqual(self.search('unknown.cz'), set())
+        self.assertEqual(self.search(''), {self.cdn, self.document, self.other})
+
+    def test_reindex(self):
+        self.other.blocked_uri = 'http://changed.cz/'
+        self.other.save()
+
+        index_reports([self.other])
+
+        self.assertEqual(self.search('other.cz'), set())
+        self.assertEqual(self.search('changed.cz'), {self.other})
+
+    @override_settings(CSP_REPORTS_SEARCH_INDEX=True)
+    def test_save_reports(self):
+        reports = [CSPReport(document_uri='http://saved.cz/', json='{}'),
+                   CSPReport(document_uri='http://saved.cz/', json='{}')]
+
+        save_reports(reports)
+
+        self.assertEqual(self.search('saved.cz'), set(CSPReport.objects.filter(document_uri='http://saved.cz/')))
+        self.assertEqual(len(self.search('saved.cz')), 2)
+
+    def test_save_reports_disabled(self):
+        save_reports([CSPReport(document_uri='http://saved.cz/', json='{}')])
+
+        self.assertFalse(CSPReportToken.objects.filter(token='saved.cz').exists())
@@ -0,0 +1,91 @@
+"""Test `spool` module."""
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from cspreports.spool import IDLE_CHECK_INTERVAL, SpoolWriter, decode_line, encode_line, get_closed_segments
+
+
+class SpoolTestMixin:
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        patcher = patch('cspreports.spool.atexit.register')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TestSpoolLine(SimpleTestCase):
+    """Test encoding and decoding of spool lines."""
+
+    def test_encode_decode(self):
+        line = encode_line('{"csp-report": {"document-uri": "http://example.cz/é"}}', 'Agent007',
+                           datetime(2016, 4, 27, 12))
+
+        self.assertTrue(line.endswith(b'\n'))
+        self.assertEqual(line.count(b'\n'), 1)
+        self.assertEqual(decode_line(line), ('{"csp-report": {"document-uri": "http://example.cz/é"}}',
+                                             'Agent007', '2016-04-27T12:00:00', 1))
+
+    def test_encode_decode_weight(self):
+        line = encode_line('{}', 'Agent007', datetime(2016, 4, 27, 12), weight=10)
+
+        self.assertEqual(decode_line(line), ('{}', 'Agent007', '2016-04-27T12:00:00', 10))
+
+    def test_decode_invalid(self):
+        with self.assertRaises(ValueError):
+            decode_line(b'{"report": "{}", "user_a')
+        with self.assertRaises(ValueError):
+            decode_line(b'{}')
+
+
+class TestSpoolWriter(SpoolTestMixin, SimpleTestCase):
+    """Test `SpoolWriter` class."""
+
+    def test_write(self):
+        writer = SpoolWriter(self.directory, max_bytes=1024, fsync_every=2)
+        writer.write('{}', 'Agent007')
+        writer.write('{}', 'Agent007')
+
+        self.assertEqual(get_closed_segments(self.directory), [])
+        self.assertEqual(len(get_closed_segments(self.directory, include_open=True)), 1)
+
+        writer.close()
+
+        segments = get_closed_segments(self.directory)
+        self.assertEqual(len(segments), 1)
+        with open(segments[0], 'rb') as segment:
+            self.assertEqual([decode_line(line)[:2] for line in segment], [('{}', 'Agent007')] * 2)
+
+    def test_rotate(self):
+        writer = SpoolWriter(self.directory, max_bytes=100, fsync_every=1)
+        for i in range(3):
+            writer.write('{}', 'Agent007')
+
+        self.assertEqual(len(get_closed_segments(self.directory)), 2)
+        writer.close()
+        self.assertEqual(len(get_closed_segments(self.directory)), 3)
+        self.assertEqual(os.listdir(self.directory), [name for name in os.listdir(self.directory)
+                                                      if name.endswith('.spool')])
+
+    def test_recovered(self):
+        # The writer starts a new segment when its idle segment was recovered by the loader
+        writer = SpoolWriter(self.directory, max_bytes=1024, fsync_every=1)
+        writer.write('{}', 'Agent007')
+        recovered_path, = get_closed_segments(self.directory, include_open=True)
+        os.rename(recovered_path, recovered_path.replace('.open', '.spool'))
+
+        with patch('cspreports.spool.time.monotonic', return_value=time.monotonic() + IDLE_CHECK_INTERVAL):
+            writer.write('{}', 'Agent007')
+        writer.close()
+
+        self.assertEqual(len(get_closed_segments(self.directory)), 2)
+
+    def test_missing_directory(self):
+        self.assertEqual(get_closed_segments(os.path.join(self.directory, 'missing')), [])
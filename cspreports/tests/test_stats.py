@@ -0,0 +1,23 @@
+"""Test `stats` module."""
+from django.test import SimpleTestCase
+
+from cspreports import stats
+
+
+class TestStats(SimpleTestCase):
+    """Test the counters."""
+
+    def setUp(self):
+        stats.reset()
+
+    def test_increment(self):
+        stats.increment('accepted')
+        stats.increment('accepted', 2)
+        stats.increment('rejected')
+
+        self.assertEqual(stats.get_counts(), {'accepted': 3, 'rejected': 1})
+
+    def test_reset(self):
+        stats.increment('accepted')
+        stats.reset()
+        self.assertEqual(stats.get_counts(), {})
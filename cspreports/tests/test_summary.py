@@ -1,11 +1,13 @@
 """Test `summary` module."""
-from datetime import datetime
+from datetime import datetime, timezone as dt_timezone
 from unittest.mock import sentinel
 
-from django.test import SimpleTestCase, TestCase
+from django.test import SimpleTestCase, TestCase, override_settings
 
 from cspreports.models import CSPReport
-from cspreports.summary import CspReportSummary, ViolationInfo, collect, get_root_uri
+from cspreports.rollups import rollup_reports
+from cspreports.summary import (CspReportSummary, ViolationInfo, collect, collect_violations, get_root_uri,
+                                stream_violations)
 
 from .utils import create_csp_report
 
@@ -14,12 +16,15 @@ class TestGetRootUri(SimpleTestCase):
     """Test `get_root_uri` function."""
 
     def test_root_uri(self):
+        self.assertEqual(get_root_uri(None), '')
         self.assertEqual(get_root_uri(''), '')
+        self.assertEqual(get_root_uri(5), '')
         self.assertEqual(get_root_uri('self'), 'self')
         self.assertEqual(get_root_uri('http://example.cz/'), 'http://example.cz/')
         self.assertEqual(get_root_uri('http://example.cz/path/'), 'http://example.cz/path/')
         self.assertEqual(get_root_uri('http://example.cz/path/?query=value'), 'http://example.cz/path/')
         self.assertEqual(get_root_uri('http://example.cz/path/#fragment'), 'http://example.cz/path/')
+        self.assertEqual(get_root_uri('http://[::1'), '')
 
 
 class TestViolationInfo(SimpleTestCase):
@@ -30,25 +35,26 @@ class TestViolationInfo(SimpleTestCase):
 
         self.assertEqual(info.root_uri, sentinel.root_uri)
         self.assertEqual(info.count, 0)
+        self.assertEqual(info.example_pks, [])
         self.assertEqual(info.examples, [])
 
     def test_append(self):
         info = ViolationInfo(sentinel.root_uri)
-        info.append(sentinel.report)
+        info.append(sentinel.pk)
 
         self.assertEqual(info.count, 1)
-        self.assertEqual(info.examples, [sentinel.report])
+        self.assertEqual(info.example_pks, [sentinel.pk])
 
     def test_append_top(self):
         # Test appending over the limit
         info = ViolationInfo(sentinel.root_uri, top=2)
-        info.append(sentinel.report_1)
-        info.append(sentinel.report_2)
+        info.append(sentinel.pk_1)
+        info.append(sentinel.pk_2)
 
-        info.append(sentinel.report_over)
+        info.append(sentinel.pk_over)
 
         self.assertEqual(info.count, 3)
-        self.assertEqual(info.examples, [sentinel.report_1, sentinel.report_2])
+        self.assertEqual(info.example_pks, [sentinel.pk_1, sentinel.pk_2])
 
 
 class TestCspReportSummary(SimpleTestCase):
@@ -67,7 +73,8 @@ class TestCspReportSummary(SimpleTestCase):
         summary.valid_count = 32
         summary.invalid_count = 10
         violation = ViolationInfo('http://example.cz/')
-        violation.append(CSPReport())
+        violation.count = 1
+        violation.examples = [CSPReport()]
         summary.sources = [violation]
         summary.blocks = [violation]
 
@@ -128,3 +135,102 @@ class TestCollect(TestCase):
         # Check invalid
         self.assertEqual(summary.invalid_count, 0)
         self.assertCountEqual(summary.invalid_reports, ())
+
+    @override_settings(USE_TZ=True, TIME_ZONE='UTC')
+    def test_rollups(self):
+        report = create_csp_report(datetime(1970, 1, 1, 12, tzinfo=dt_timezone.utc), is_valid=True,
+                                   document_uri='http://example.cz/', blocked_uri='http://example.evil/')
+        create_csp_report(datetime(1970, 1, 1, 13, tzinfo=dt_timezone.utc))
+        create_csp_report(datetime(1970, 1, 2, 12, tzinfo=dt_timezone.utc), is_valid=True,
+                          document_uri='http://example.cz/')
+        list(rollup_reports(100))
+        # Reports which are not counted in the rollups are not in the summary
+        create_csp_report(datetime(1970, 1, 1, 14, tzinfo=dt_timezone.utc), is_valid=True,
+                          document_uri='http://example.cz/')
+
+        summary = collect(datetime(1970, 1, 1, tzinfo=dt_timezone.utc), datetime(1970, 1, 2, tzinfo=dt_timezone.utc),
+                          use_rollups=True)
+
+        self.assertEqual(summary.total_count, 2)
+        self.assertEqual(summary.valid_count, 1)
+        self.assertEqual(summary.invalid_count, 1)
+        self.assertEqual(len(summary.sources), 1)
+        self.assertEqual(summary.sources[0].root_uri, 'http://example.cz/')
+        self.assertEqual(summary.sources[0].count, 1)
+        self.assertIn(report, summary.sources[0].examples)
+        self.assertEqual(summary.blocks[0].root_uri, 'http://example.evil/')
+
+
+class TestCollectViolations(TestCase):
+    """Test `collect_violations` function."""
+
+    def test_ranking(self):
+        for uri in ('http://example.cz/', 'http://example.cz/?a', 'http://example.cz/#b', 'http://other.cz/'):
+            create_csp_report(datetime(1970, 1, 1, 12), is_valid=True, document_uri=uri)
+        create_csp_report(datetime(1970, 1, 1, 12), is_valid=True, document_uri='http://example.cz/?a')
+
+        violations = collect_violations(CSPReport.objects.all(), 'document_root', top=1)
+
+        self.assertEqual(len(violations), 1)
+        self.assertEqual(violations[0].root_uri, 'http://example.cz/')
+        self.assertEqual(violations[0].count, 4)
+        self.assertEqual(len(violations[0].examples), 1)
+        self.assertEqual(violations[0].examples[0].document_root, 'http://example.cz/')
+
+    def test_queries(self):
+        for i in range(20):
+            create_csp_report(datetime(1970, 1, 1, 12), is_valid=True, document_uri='http://example.cz/?%d' % i)
+
+        # One query for the counts and one for examples of each violation
+        with self.assertNumQueries(2):
+            violations = collect_violations(CSPReport.objects.all(), 'document_root')
+
+        self.assertEqual(violations[0].count, 20)
+        self.assertEqual(len(violations[0].examples), 10)
+
+
+class TestStreamViolations(TestCase):
+    """Test `stream_violations` function."""
+
+    def test_ranking(self):
+        for uri in ('http://example.cz/', 'http://example.cz/?a', 'http://example.cz/#b', 'http://other.cz/'):
+            create_csp_report(datetime(1970, 1, 1, 12), is_valid=True, document_uri=uri,
+                              blocked_uri='http://example.evil/')
+        create_csp_report(datetime(1970, 1, 1, 12), is_valid=True, document_uri='http://example.cz/?a')
+
+        sources, blocks = stream_violations(CSPReport.objects.all(), ('document_root', 'blocked_root'), top=1,
+                                            chunk_size=2)
+
+        self.assertEqual(len(sources), 1)
+        self.assertEqual(sources[0].root_uri, 'http://example.cz/')
+        self.assertEqual(sources[0].count, 4)
+        self.assertEqual(len(sources[0].examples), 1)
+        self.assertEqual(sources[0].examples[0].document_root, 'http://example.cz/')
+        self.assertEqual(len(blocks), 1)
+        self.assertEqual(blocks[0].root_uri, 'http://example.evil/')
+        self.assertEqual(blocks[0].count, 4)
+
+    def test_queries(self):
+        for i in range(20):
+            create_csp_report(datetime(1970, 1, 1, 12), is_valid=True, document_uri='http://example.cz/?%d' % i)
+
+        # Three queries for the chunks and one for all the examples
+        with self.assertNumQueries(4):
+            sources, blocks = stream_violations(CSPReport.objects.all(), ('document_root', 'blocked_root'),
+                                                chunk_size=10)
+
+        self.assertEqual(sources[0].count, 20)
+        self.assertEqual(len(sources[0].examples), 10)
+        self.assertEqual(blocks[0].count, 20)
+
+    def test_collect(self):
+        report = create_csp_report(datetime(1970, 1, 1, 12), is_valid=True, document_uri='http://example.cz/',
+                                   blocked_uri='http://example.evil/')
+        create_csp_report(datetime(1970, 1, 1, 12))
+
+        summary = collect(datetime(1970, 1, 1), datetime(1970, 12, 31), streaming=True)
+
+        self.assertEqual(summary.total_count, 2)
+        self.assertEqual(summary.invalid_count, 1)
+        self.assertEqual(summary.sources[0].examples, [report])
+        self.assertEqual(summary.blocks[0].root_uri, 'http://example.evil/')
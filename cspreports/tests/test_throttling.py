@@ -0,0 +1,78 @@
+"""Test `throttling` module."""
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from cspreports import stats
+from cspreports.throttling import get_origin_key, take_token, throttle_request
+from cspreports.validation import reject_request
+
+
+class TestTakeToken(SimpleTestCase):
+    """Test `take_token` function."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_bucket(self):
+        with patch('cspreports.throttling.time.time', return_value=1000):
+            self.assertEqual(take_token(cache, 'key', 2, 10), 0)
+            self.assertEqual(take_token(cache, 'key', 2, 10), 0)
+            self.assertEqual(take_token(cache, 'key', 2, 10), 5)
+            # Other buckets are independent
+            self.assertEqual(take_token(cache, 'other', 2, 10), 0)
+        # The bucket is refilled over time
+        with patch('cspreports.throttling.time.time', return_value=1004):
+            self.assertAlmostEqual(take_token(cache, 'key', 2, 10), 1)
+        with patch('cspreports.throttling.time.time', return_value=1005):
+            self.assertEqual(take_token(cache, 'key', 2, 10), 0)
+            self.assertEqual(take_token(cache, 'key', 2, 10), 5)
+
+
+class TestThrottleRequest(SimpleTestCase):
+    """Test `throttle_request` function."""
+
+    def setUp(self):
+        cache.clear()
+        stats.reset()
+
+    def post(self, **extra):
+        return RequestFactory().post('/dummy/', '{"csp-report": {}}', content_type='application/csp-report', **extra)
+
+    def test_get_origin_key(self):
+        self.assertEqual(get_origin_key(self.post(HTTP_ORIGIN='https://example.cz')), 'https://example.cz')
+        self.assertEqual(get_origin_key(self.post(HTTP_REFERER='https://example.cz/page/?query')),
+                         'https://example.cz')
+        self.assertEqual(get_origin_key(self.post()), '')
+        self.assertEqual(get_origin_key(self.post(HTTP_REFERER='http://[::1')), '')
+
+    def test_no_limits(self):
+        self.assertIsNone(throttle_request(self.post()))
+
+    @override_settings(CSP_REPORTS_RATE_LIMIT_CLIENT=(1, 60))
+    def test_client(self):
+        self.assertIsNone(throttle_request(self.post(REMOTE_ADDR='10.0.0.1')))
+        self.assertEqual(throttle_request(self.post(REMOTE_ADDR='10.0.0.1'))[0], 'client')
+        self.assertIsNone(throttle_request(self.post(REMOTE_ADDR='10.0.0.2')))
+
+    @override_settings(CSP_REPORTS_RATE_LIMIT_ORIGIN=(1, 60))
+    def test_origin(self):
+        self.assertIsNone(throttle_request(self.post(HTTP_ORIGIN='https://example.cz')))
+        self.assertEqual(throttle_request(self.post(HTTP_ORIGIN='https://example.cz'))[0], 'origin')
+        self.assertIsNone(throttle_request(self.post(HTTP_ORIGIN='https://other.cz')))
+
+    @override_settings(CSP_REPORTS_RATE_LIMIT_CLIENT=(10, 60), CSP_REPORTS_RATE_LIMIT_GLOBAL=(2, 60))
+    def test_global(self):
+        self.assertIsNone(throttle_request(self.post(REMOTE_ADDR='10.0.0.1')))
+        self.assertIsNone(throttle_request(self.post(REMOTE_ADDR='10.0.0.2')))
+        self.assertEqual(throttle_request(self.post(REMOTE_ADDR='10.0.0.3'))[0], 'global')
+
+    @override_settings(CSP_REPORTS_RATE_LIMIT_CLIENT=(1, 60))
+    def test_reject_request(self):
+        self.assertIsNone(reject_request(self.post()))
+        response = reject_request(self.post())
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        self.assertEqual(stats.get_counts(), {'accepted': 1, 'throttled.client': 1})
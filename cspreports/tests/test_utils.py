@@ -1,14 +1,20 @@
+import asyncio
 import json
+import threading
 from datetime import datetime, timezone as dt_timezone
 from unittest.mock import patch
 
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.core.exceptions import ImproperlyConfigured
 from django.http import HttpRequest
 from django.test import RequestFactory, SimpleTestCase, TestCase
 from django.test.utils import override_settings
 from django.utils import timezone
 
-from cspreports import utils
+from cspreports import codec, utils
+from cspreports.buffers import BatchBuffer
 from cspreports.models import CSPReport
+from cspreports.parsing import ParsedReport, parsed_report_handler
 from cspreports.utils import get_midnight, parse_date_input
 
 JSON_CONTENT_TYPE = 'application/json'
@@ -60,6 +66,41 @@ class UtilsTest(TestCase):
             log_message = warning_mock.call_args[0][0] % warning_mock.call_args[0][1:]
             self.assertTrue(formatted_report in log_message)
 
+    @override_settings(CSP_REPORTS_LOG_LEVEL='info')
+    def test_log_report_lazy(self):
+        """ Test that the report isn't formatted if the log record isn't emitted. """
+        report = ParsedReport('{"csp-report": {}}')
+        with patch('cspreports.parsing.codec.dumps_formatted') as formatted_mock, \
+                self.assertLogs(utils.logger, 'WARNING'):
+            utils.log_report(report)
+            # assertLogs requires a record
+            utils.logger.warning("Other record.")
+        formatted_mock.assert_not_called()
+
+    @override_settings(CSP_REPORTS_LOG_FORMAT='structured')
+    def test_log_report_structured(self):
+        """ Test that the structured log record is a single line with the report fields as extra attributes. """
+        report = ParsedReport('{\n  "csp-report": {"document-uri": "http://example.com/", "line-number": 3}\n}',
+                              user_agent='Agent007')
+        with self.assertLogs(utils.logger, 'WARNING') as logs:
+            utils.log_report(report)
+        record = logs.records[0]
+        prefix, message = record.getMessage().split(': ', 1)
+        self.assertEqual(prefix, 'Content Security Policy violation')
+        self.assertNotIn('\n', message)
+        self.assertEqual(json.loads(message), {"csp-report": {"document-uri": "http://example.com/", "line-number": 3}})
+        self.assertEqual(record.csp_document_uri, 'http://example.com/')
+        self.assertEqual(record.csp_line_number, 3)
+        self.assertEqual(record.csp_user_agent, 'Agent007')
+        self.assertTrue(record.csp_is_valid)
+
+    @override_settings(CSP_REPORTS_LOG_FORMAT='structured')
+    def test_log_report_structured_invalid(self):
+        with self.assertLogs(utils.logger, 'WARNING') as logs:
+            utils.log_report(ParsedReport('NOT\nA JSON'))
+        self.assertEqual(logs.records[0].getMessage(), 'Content Security Policy violation: "NOT\\nA JSON"')
+        self.assertFalse(logs.records[0].csp_is_valid)
+
     def test_email_admins(self):
         """ Test that the `email_admins` handler correctly sends an email. """
         request = HttpRequest()
@@ -73,6 +114,18 @@ class UtilsTest(TestCase):
             message = mock_mail_admins.call_args[0][1]
             self.assertTrue(formatted_report in message)
 
+    @override_settings(CSP_REPORTS_EMAIL_ADMINS='digest')
+    def test_email_admins_digest(self):
+        """ Test that the `email_admins` handler adds the report to the digest in the digest mode. """
+        request = HttpRequest()
+        request._body = '{"document-uri": "http://example.com/"}'
+        with patch("cspreports.utils._email_digest") as digest_mock, \
+                patch("cspreports.utils.mail_admins") as mock_mail_admins:
+            utils.email_admins(request)
+        self.assertFalse(mock_mail_admins.called)
+        report = digest_mock.add.call_args[0][0]
+        self.assertEqual(report.raw, '{"document-uri": "http://example.com/"}')
+
     def test_format_report_handles_invalid_json(self):
         """ Test that `format_report` doesn't trip up on invalid JSON.
             Note: this is about not getting a ValueError, rather than any kind of security thing.
@@ -89,8 +142,6 @@ class UtilsTest(TestCase):
         """ Test that the run_additional_handlers function correctly calls each of the specified custom
             handler functions.
         """
-        # utils stores a cache of the handlers (for efficiency, so kill that)
-        utils._additional_handlers = None
         request = HttpRequest()
         with override_settings(
             CSP_REPORTS_ADDITIONAL_HANDLERS=["cspreports.tests.test_utils.my_handler"],
@@ -117,12 +168,39 @@ class UtilsTest(TestCase):
             utils.process_report(request)
             self.assertTrue(log_patch.called)
 
+    def test_run_additional_handlers_parsed_report(self):
+        """ Test that handlers marked with `parsed_report_handler` are passed the parsed report. """
+        request = RequestFactory().post('/dummy/', '{"csp-report": {}}', content_type=JSON_CONTENT_TYPE)
+        with override_settings(
+            CSP_REPORTS_ADDITIONAL_HANDLERS=["cspreports.tests.test_utils.my_parsed_report_handler"],
+            CSP_REPORTS_EMAIL_ADMINS=False,
+            CSP_REPORTS_LOG=False,
+            CSP_REPORTS_SAVE=False,
+        ):
+            utils.process_report(request)
+            self.assertEqual(request.my_handler_called, {'csp-report': {}})
+
+    @override_settings(CSP_REPORTS_FILTER_FUNCTION='cspreports.filters.filter_browser_extensions')
+    def test_report_parsed_once(self):
+        """ Test that the report is parsed only once by all the stages of `process_report`. """
+        request = RequestFactory().post('/dummy/', '{"csp-report": {}}', content_type=JSON_CONTENT_TYPE)
+        with patch('cspreports.codec.loads', wraps=codec.loads) as loads_mock, \
+                patch('cspreports.utils.mail_admins'), patch('cspreports.utils.logger'):
+            utils.process_report(request)
+        self.assertEqual(loads_mock.call_count, 1)
+        self.assertEqual(CSPReport.objects.count(), 1)
+
 
 def my_handler(request):
     # just set an attribute so that we can see that this function has been called
     request.my_handler_called = True
 
 
+@parsed_report_handler
+def my_parsed_report_handler(report):
+    report.request.my_handler_called = report.data
+
+
 def example_filter(request):
     """ Filters out reports with a 'document-uri' not from included.com. """
     report = json.loads(request.body)
@@ -195,6 +273,56 @@ class SaveReportTest(TestCase):
         report = CSPReport.objects.first()
         self.assertQuerySetEqual(report.user_agent, '')
 
+    @override_settings(CSP_REPORTS_SAVE='buffered')
+    def test_save_report_buffered(self):
+        """ Test that the `save_report` handler buffers the reports when CSP_REPORTS_SAVE is 'buffered'. """
+        request = RequestFactory(HTTP_USER_AGENT='Agent007').post('/dummy/', '{"csp-report": {}}',
+                                                                  content_type=JSON_CONTENT_TYPE)
+        with patch('cspreports.utils._save_buffer', BatchBuffer(utils.bulk_save_reports, 10, 3600, 100)) as buffer:
+            with patch.object(buffer, '_ensure_thread'):
+                utils.save_report(request)
+                utils.save_report(request)
+            self.assertEqual(CSPReport.objects.count(), 0)
+
+            buffer.flush()
+
+        self.assertQuerySetEqual(CSPReport.objects.values_list('user_agent', 'json'),
+                                 [('Agent007', '{"csp-report": {}}')] * 2, transform=tuple)
+
+    def test_save_report_spool(self):
+        """ Test that the `save_report` handler appends the reports to spool when CSP_REPORTS_SAVE is 'spool'. """
+        request = RequestFactory(HTTP_USER_AGENT='Agent007').post('/dummy/', '{"csp-report": {}}',
+                                                                  content_type=JSON_CONTENT_TYPE)
+        with patch('cspreports.utils._spool_writer') as writer_mock, \
+                override_settings(CSP_REPORTS_SAVE='spool'):
+            utils.save_report(request)
+
+        writer_mock.write.assert_called_once_with('{"csp-report": {}}', 'Agent007', weight=1)
+        self.assertEqual(CSPReport.objects.count(), 0)
+
+    @override_settings(CSP_REPORTS_SAVE='spool')
+    def test_save_report_spool_not_configured(self):
+        request = RequestFactory().post('/dummy/', '{"csp-report": {}}', content_type=JSON_CONTENT_TYPE)
+        with self.assertRaises(ImproperlyConfigured):
+            utils.save_report(request)
+
+    @override_settings(CSP_REPORTS_EMAIL_ADMINS=False, CSP_REPORTS_LOG=False)
+    def test_process_report_reporting_api(self):
+        """ Test that a batch of reports from the Reporting API is saved in a single query. """
+        body = [
+            {'type': 'csp-violation', 'body': {'documentURL': 'http://example.cz/%s' % i, 'referrer': '',
+                                               'blockedURL': 'inline', 'effectiveDirective': 'script-src',
+                                               'originalPolicy': "script-src 'self'"}}
+            for i in range(3)
+        ]
+        request = RequestFactory(HTTP_USER_AGENT='Agent007').post('/dummy/', json.dumps(body),
+                                                                  content_type='application/reports+json')
+        with self.assertNumQueries(1):
+            utils.process_report(request)
+
+        self.assertQuerySetEqual(CSPReport.objects.order_by('document_uri').values_list('document_uri', 'is_valid'),
+                                 [('http://example.cz/%s' % i, True) for i in range(3)], transform=tuple)
+
     def test_save_report_correct_format_missing_mandatory_fields(self):
         """ Test that the `save_report` saves CSPReport instance even if some required CSP Report
             fields are missing. However, the report should have its 'is_valid' field set to False.
@@ -254,3 +382,79 @@ class SaveReportTest(TestCase):
         self.assertEqual(report.line_number, 36)
         self.assertEqual(report.column_number, 32)
         self.assertTrue(report.is_valid)
+
+
+async def my_async_handler(request):
+    request.my_async_handler_called = True
+
+
+class ProcessReportAsyncTest(TestCase):
+    """Test `process_report_async` and `process_report_in_background` functions."""
+
+    async def test_config(self):
+        request = RequestFactory().post('/dummy/', '{"csp-report": {}}', content_type=JSON_CONTENT_TYPE)
+        with override_settings(CSP_REPORTS_EMAIL_ADMINS=True, CSP_REPORTS_LOG=False, CSP_REPORTS_SAVE=False):
+            with patch('cspreports.utils.email_admins') as email_mock, patch('cspreports.utils.log_report') as log_mock:
+                await utils.process_report_async(request)
+        self.assertTrue(email_mock.called)
+        self.assertFalse(log_mock.called)
+
+    async def test_save(self):
+        request = RequestFactory().post('/dummy/', '{"csp-report": {}}', content_type=JSON_CONTENT_TYPE)
+        with override_settings(CSP_REPORTS_EMAIL_ADMINS=False, CSP_REPORTS_LOG=False, CSP_REPORTS_SAVE=True):
+            await utils.process_report_async(request)
+        self.assertEqual(await sync_to_async(CSPReport.objects.count)(), 1)
+
+    async def test_additional_handlers(self):
+        request = RequestFactory().post('/dummy/', '{"csp-report": {}}', content_type=JSON_CONTENT_TYPE)
+        with override_settings(
+            CSP_REPORTS_ADDITIONAL_HANDLERS=[
+                "cspreports.tests.test_utils.my_handler", "cspreports.tests.test_utils.my_async_handler"],
+            CSP_REPORTS_EMAIL_ADMINS=False,
+            CSP_REPORTS_LOG=False,
+            CSP_REPORTS_SAVE=False,
+        ):
+            await utils.process_report_async(request)
+        self.assertTrue(request.my_handler_called)
+        self.assertTrue(request.my_async_handler_called)
+
+    @override_settings(CSP_REPORTS_FILTER_FUNCTION='cspreports.tests.test_utils.example_filter',
+                       CSP_REPORTS_EMAIL_ADMINS=False, CSP_REPORTS_SAVE=False)
+    async def test_filter_function(self):
+        request = RequestFactory().post('/dummy/', '{"document-uri": "http://not-included.com/"}',
+                                        content_type=JSON_CONTENT_TYPE)
+        with patch('cspreports.utils.log_report') as log_patch:
+            await utils.process_report_async(request)
+        self.assertFalse(log_patch.called)
+
+    async def test_in_background(self):
+        request = RequestFactory().post('/dummy/', '{"csp-report": {}}', content_type=JSON_CONTENT_TYPE)
+        with override_settings(CSP_REPORTS_EMAIL_ADMINS=True, CSP_REPORTS_LOG=False, CSP_REPORTS_SAVE=False):
+            with patch('cspreports.utils.email_admins') as email_mock:
+                task = utils.process_report_in_background(request)
+                # The body must be read before the response is sent.
+                request._stream = None
+                await task
+        self.assertTrue(email_mock.called)
+        self.assertNotIn(task, utils._background_tasks)
+
+
+@override_settings(CSP_REPORTS_EMAIL_ADMINS=False, CSP_REPORTS_LOG=False, CSP_REPORTS_SAVE=True)
+class ProcessReportInBackgroundThreadsTest(SimpleTestCase):
+    """Test threads of `process_report_in_background` outside of the tests' event loop."""
+
+    def test_shared_thread(self):
+        # Reports processed after their requests have finished are saved in a single thread.
+        threads = set()
+
+        async def process_reports():
+            tasks = []
+            for _ in range(5):
+                async with ThreadSensitiveContext():
+                    request = RequestFactory().post('/dummy/', '{"csp-report": {}}', content_type=JSON_CONTENT_TYPE)
+                    tasks.append(utils.process_report_in_background(request))
+            await asyncio.gather(*tasks)
+
+        with patch('cspreports.utils.save_reports', side_effect=lambda *args: threads.add(threading.get_ident())):
+            asyncio.run(process_reports())
+        self.assertEqual(len(threads), 1)
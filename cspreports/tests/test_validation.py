@@ -0,0 +1,86 @@
+"""Test `validation` module."""
+import time
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from cspreports import stats
+from cspreports.validation import exceeds_json_depth, reject_request
+
+
+class TestExceedsJsonDepth(SimpleTestCase):
+    """Test `exceeds_json_depth` function."""
+
+    def test_depth(self):
+        self.assertFalse(exceeds_json_depth(b'{"csp-report": {"document-uri": "http://example.cz/"}}', 2))
+        self.assertTrue(exceeds_json_depth(b'{"csp-report": {"document-uri": "http://example.cz/"}}', 1))
+        self.assertFalse(exceeds_json_depth(b'[{}, {}, {}, [], {"a": {}}]', 3))
+        self.assertTrue(exceeds_json_depth(b'[{}, {}, {}, [], {"a": {}}]', 2))
+
+    def test_strings(self):
+        # Brackets in strings are ignored
+        self.assertFalse(exceeds_json_depth(b'{"a": "[[[{{{", "b": "\\"[[["}', 1))
+
+    def test_invalid(self):
+        self.assertFalse(exceeds_json_depth(b'JUNK', 1))
+        self.assertTrue(exceeds_json_depth(b'[[[[', 3))
+        # Unterminated strings are skipped to the end of the body
+        self.assertFalse(exceeds_json_depth(b'["[[[[', 3))
+        self.assertFalse(exceeds_json_depth(b'["[[[[\\', 3))
+
+    def test_unterminated_string_linear(self):
+        # Unterminated strings with many escapes must not be scanned repeatedly
+        for body in (b'"' + b'\\"' * 200000 + b'[' * 11, b'"' + b'[' * 11 + b'\\"' * 200000 + b'\\'):
+            start = time.monotonic()
+            self.assertFalse(exceeds_json_depth(body, 10))
+            self.assertLess(time.monotonic() - start, 1)
+
+
+class TestRejectRequest(SimpleTestCase):
+    """Test `reject_request` function."""
+
+    def setUp(self):
+        stats.reset()
+
+    def test_accepted(self):
+        request = RequestFactory().post('/dummy/', '{"csp-report": {}}', content_type='application/csp-report')
+        self.assertIsNone(reject_request(request))
+        self.assertEqual(stats.get_counts(), {'accepted': 1})
+
+    def test_content_type(self):
+        request = RequestFactory().post('/dummy/', '{"csp-report": {}}', content_type='text/plain')
+
+        self.assertEqual(reject_request(request).status_code, 415)
+        self.assertEqual(stats.get_counts(), {'rejected.content_type': 1})
+
+    @override_settings(CSP_REPORTS_CONTENT_TYPES=None)
+    def test_content_type_disabled(self):
+        request = RequestFactory().post('/dummy/', '{"csp-report": {}}', content_type='text/plain')
+        self.assertIsNone(reject_request(request))
+
+    @override_settings(CSP_REPORTS_MAX_BODY_SIZE=10)
+    def test_body_size(self):
+        request = RequestFactory().post('/dummy/', '{"csp-report": {}}', content_type='application/csp-report')
+
+        self.assertEqual(reject_request(request).status_code, 413)
+        self.assertEqual(stats.get_counts(), {'rejected.body_size': 1})
+
+    @override_settings(CSP_REPORTS_MAX_BODY_SIZE=10)
+    def test_body_size_actual(self):
+        request = RequestFactory().post('/dummy/', '{"csp-report": {}}', content_type='application/csp-report')
+        request.META['CONTENT_LENGTH'] = '2'
+
+        self.assertEqual(reject_request(request).status_code, 413)
+
+    def test_invalid_content_length(self):
+        request = RequestFactory().post('/dummy/', '{"csp-report": {}}', content_type='application/csp-report')
+        request.META['CONTENT_LENGTH'] = 'JUNK'
+
+        self.assertEqual(reject_request(request).status_code, 400)
+        self.assertEqual(stats.get_counts(), {'rejected.content_length': 1})
+
+    @override_settings(CSP_REPORTS_MAX_JSON_DEPTH=1)
+    def test_json_depth(self):
+        request = RequestFactory().post('/dummy/', '{"csp-report": {}}', content_type='application/csp-report')
+
+        self.assertEqual(reject_request(request).status_code, 400)
+        self.assertEqual(stats.get_counts(), {'rejected.json_depth': 1})
@@ -0,0 +1,104 @@
+"""Test for `cspreports.views`."""
+from unittest.mock import patch
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from cspreports.models import CSPReport
+from cspreports.views import report_csp, report_csp_async
+
+
+class TestReportCsp(SimpleTestCase):
+    """Test `report_csp` view."""
+
+    def test_get(self):
+        response = report_csp(RequestFactory().get('/dummy/'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_post(self):
+        request = RequestFactory().post('/dummy/', '{}', content_type='application/csp-report')
+        with patch('cspreports.views.process_report') as process_mock:
+            response = report_csp(request)
+        self.assertEqual(response.status_code, 200)
+        process_mock.assert_called_once_with(request)
+
+    def test_rejected(self):
+        request = RequestFactory().post('/dummy/', '{}', content_type='text/html')
+        with patch('cspreports.views.process_report') as process_mock:
+            response = report_csp(request)
+        self.assertEqual(response.status_code, 415)
+        self.assertFalse(process_mock.called)
+
+
+class TestReportCspAsync(SimpleTestCase):
+    """Test `report_csp_async` view."""
+
+    async def test_get(self):
+        response = await report_csp_async(RequestFactory().get('/dummy/'))
+        self.assertEqual(response.status_code, 405)
+
+    async def test_post(self):
+        request = RequestFactory().post('/dummy/', '{}', content_type='application/csp-report')
+        with patch('cspreports.views.process_report_in_background') as process_mock:
+            response = await report_csp_async(request)
+        self.assertEqual(response.status_code, 200)
+        process_mock.assert_called_once_with(request)
+
+    async def test_rejected(self):
+        request = RequestFactory().post('/dummy/', '{}', content_type='text/html')
+        with patch('cspreports.views.process_report_in_background') as process_mock:
+            response = await report_csp_async(request)
+        self.assertEqual(response.status_code, 415)
+        self.assertFalse(process_mock.called)
+
+    def test_csrf_exempt(self):
+        self.assertTrue(report_csp_async.csrf_exempt)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                                       'LOCATION': 'cspreports_cache'}},
+                   CSP_REPORTS_RATE_LIMIT_GLOBAL=(1, 60))
+class TestReportCspAsyncThrottled(TestCase):
+    """Test `report_csp_async` view with a rate limit kept in a synchronous only cache."""
+
+    def setUp(self):
+        call_command('createcachetable', verbosity=0)
+        self.addCleanup(caches['default'].clear)
+
+    async def test_throttled(self):
+        with patch('cspreports.views.process_report_in_background') as process_mock:
+            response = await report_csp_async(
+                RequestFactory().post('/dummy/', '{}', content_type='application/csp-report'))
+            throttled = await report_csp_async(
+                RequestFactory().post('/dummy/', '{}', content_type='application/csp-report'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(throttled.status_code, 429)
+        process_mock.assert_called_once()
+
+
+@override_settings(CSP_REPORTS_EMAIL_ADMINS=False, CSP_REPORTS_LOG=False)
+class TestReportCspInvalidUri(TestCase):
+    """Test `report_csp` view with URIs which can't be parsed."""
+
+    body = '{"csp-report": {"document-uri": "http://[::1", "blocked-uri": "http://[::1", ' \
+           '"violated-directive": "script-src"}}'
+
+    def post(self):
+        request = RequestFactory().post('/dummy/', self.body, content_type='application/csp-report',
+                                        HTTP_REFERER='http://[::1')
+        return report_csp(request)
+
+    def test_saved(self):
+        self.assertEqual(self.post().status_code, 200)
+        report = CSPReport.objects.get()
+        self.assertEqual(report.document_root, '')
+        self.assertNotEqual(report.fingerprint, '')
+
+    @override_settings(CSP_REPORTS_SAMPLE_RATE=0.5, CSP_REPORTS_SEARCH_INDEX=True,
+                       CSP_REPORTS_RATE_LIMIT_ORIGIN=(10, 60),
+                       CSP_REPORTS_FILTER_RULES=({"field": "blocked-uri", "host": ["example.cz"]}, ))
+    def test_saved_features(self):
+        caches['default'].clear()
+        self.assertEqual(self.post().status_code, 200)
+        self.assertEqual(CSPReport.objects.count(), 1)
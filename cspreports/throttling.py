@@ -0,0 +1,107 @@
+"""Rate limiting of report requests by token buckets kept in the Django cache.
+
+Each limit is a bucket of `requests` tokens which is refilled at the rate of `requests` tokens per
+`seconds`, i.e. it allows bursts of up to `requests` requests. Each accepted request takes a token.
+The buckets are read and written without locking, so concurrent requests may slightly exceed the limit.
+"""
+import math
+import time
+from functools import partial
+from urllib.parse import urlsplit
+
+from django.core.cache import caches
+
+from cspreports.conf import app_settings
+
+BUCKET_KEY = "cspreports:throttle:{}:{}"
+
+
+def get_client_key(request, ip_meta=None):
+    """Return the key of the client, i.e. its IP address.
+
+    @param ip_meta: The value of CSP_REPORTS_RATE_LIMIT_CLIENT_IP_META, by default it's read from the settings.
+    """
+    return request.META.get(ip_meta or app_settings.RATE_LIMIT_CLIENT_IP_META) or ""
+
+
+def get_origin_key(request):
+    """Return the key of the document origin.
+
+    The origin is taken from the headers, because the body isn't parsed yet.
+    """
+    origin = request.META.get("HTTP_ORIGIN")
+    if not origin or origin == "null":
+        try:
+            chunks = urlsplit(request.META.get("HTTP_REFERER") or "")
+        except ValueError:
+            # Invalid referrers share the bucket of the requests without one
+            return ""
+        origin = "{}://{}".format(chunks.scheme, chunks.netloc) if chunks.netloc else ""
+    return origin
+
+
+def get_global_key(request):
+    return ""
+
+
+# Scopes of the limits in the order they are checked and the functions which return the bucket keys.
+SCOPES = (
+    ("client", get_client_key),
+    ("origin", get_origin_key),
+    ("global", get_global_key),
+)
+
+
+def get_rate_limit(scope):
+    """Return a tuple (requests, seconds) of the limit of the scope, `None` if there's no limit."""
+    return getattr(app_settings, "RATE_LIMIT_{}".format(scope.upper()))
+
+
+def get_rate_limits():
+    """Return a tuple of the set limits, each a tuple (scope, function returning the key, requests, seconds).
+
+    The key functions are bound with their options from the settings.
+    """
+    rate_limits = []
+    for scope, get_key in SCOPES:
+        rate_limit = get_rate_limit(scope)
+        if rate_limit is None:
+            continue
+        if get_key is get_client_key:
+            get_key = partial(get_client_key, ip_meta=app_settings.RATE_LIMIT_CLIENT_IP_META)
+        rate_limits.append((scope, get_key) + tuple(rate_limit))
+    return tuple(rate_limits)
+
+
+def take_token(cache, key, requests, seconds):
+    """Take a token from the bucket.
+
+    @return: Number of seconds until a token is available, 0 if the token was taken.
+    """
+    current = time.time()
+    rate = requests / seconds
+    tokens, updated = cache.get(key) or (requests, current)
+    tokens = min(requests, tokens + (current - updated) * rate)
+    if tokens < 1:
+        return (1 - tokens) / rate
+    cache.set(key, (tokens - 1, current), math.ceil(seconds))
+    return 0
+
+
+def throttle_request(request, rate_limits=None, cache_name=None):
+    """Check the rate limits of the report request.
+
+    @param rate_limits: The limits as returned by `get_rate_limits`, by default they are read from the settings.
+    @param cache_name: Name of the cache of the buckets, by default it's read from the settings.
+    @return: A tuple (scope, seconds to wait) of the first exceeded limit, `None` if the request is allowed.
+    """
+    if rate_limits is None:
+        rate_limits = get_rate_limits()
+    if not rate_limits:
+        return None
+    cache = caches[cache_name or app_settings.RATE_LIMIT_CACHE]
+    for scope, get_key, requests, seconds in rate_limits:
+        wait = take_token(cache, BUCKET_KEY.format(scope, get_key(request)), requests, seconds)
+        if wait:
+            return scope, wait
+    return None
@@ -1,7 +1,8 @@
 from django.urls import re_path
 
-from .views import report_csp
+from .views import report_csp, report_csp_async
 
 urlpatterns = [
     re_path(r'^report/$', report_csp, name='report_csp'),
+    re_path(r'^report/async/$', report_csp_async, name='report_csp_async'),
 ]
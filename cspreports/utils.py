@@ -1,33 +1,114 @@
-import json
+import asyncio
+import contextvars
+import inspect
 import logging
+import threading
+from collections import namedtuple
 from datetime import datetime
 from importlib import import_module
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from django.core.mail import mail_admins
+from django.db import close_old_connections
 from django.utils.dateparse import parse_date
 from django.utils.timezone import localtime, make_aware, now
 
-from cspreports.conf import app_settings
+from cspreports import codec, pipeline, sampling
+from cspreports.aggregation import aggregate_reports
+from cspreports.buffers import BatchBuffer
+from cspreports.conf import EMAIL_DIGEST, LOG_FORMAT_STRUCTURED, SAVE_BUFFERED, SAVE_SPOOL, app_settings
+from cspreports.digest import EmailDigest
+from cspreports.dispatch import HandlerPool
+from cspreports.interning import intern_report_texts
 from cspreports.models import get_report_model
+from cspreports.parsing import ParsedReport, call_handler, parse_reports, to_parsed_report
+from cspreports.search import index_reports
+from cspreports.spool import SpoolWriter
 
 CSPReport = get_report_model()
 
 logger = logging.getLogger(app_settings.LOGGER_NAME)
 
+# The 'csp-report' fields added to the structured log records
+LOG_EXTRA_FIELDS = ("document-uri", "referrer", "blocked-uri", "violated-directive", "effective-directive",
+                    "disposition", "source-file", "status-code", "line-number", "column-number")
+# Log levels of the logger methods which are not named after a level
+LOG_METHOD_LEVELS = {"exception": logging.ERROR}
+
 
 def process_report(request):
-    """Given the HTTP request of a CSP violation report, log it in the required ways."""
-    if not should_process_report(request):
+    """Given the HTTP request of a CSP violation report, log it in the required ways.
+
+    A batch of reports delivered by the Reporting API is saved together.
+    """
+    reports = [report for report in parse_reports(request) if should_process_report(report)]
+    report_pipeline = pipeline.get_pipeline()
+    if reports and report_pipeline.sample:
+        reports = sampling.sample_reports(reports, report_pipeline.sample_options)
+    if not reports:
+        return
+    for stage in report_pipeline.stages:
+        stage(reports)
+
+
+async def process_report_async(request):
+    """Given the HTTP request of a CSP violation report, log it in the required ways.
+
+    Asynchronous variant of `process_report`. Sync-only stages are run in threads and all the
+    stages run concurrently.
+    """
+    await _process_reports_async(parse_reports(request))
+
+
+async def _process_reports_async(reports):
+    reports = [report for report in reports if await should_process_report_async(report)]
+    report_pipeline = pipeline.get_pipeline()
+    if reports and report_pipeline.sample:
+        reports = await sync_to_async(sampling.sample_reports)(reports, report_pipeline.sample_options)
+    if not reports:
         return
-    if app_settings.EMAIL_ADMINS:
-        email_admins(request)
-    if app_settings.LOG:
-        log_report(request)
-    if app_settings.SAVE:
-        save_report(request)
-    if app_settings.ADDITIONAL_HANDLERS:
-        run_additional_handlers(request)
+    await asyncio.gather(*(awaitable for stage in report_pipeline.async_stages for awaitable in stage(reports)))
+
+
+_background_tasks = set()
+
+
+def process_report_in_background(request):
+    """Schedule `process_report_async` for the request without waiting for it to finish.
+
+    Must be called from a running event loop. The body of the request is read immediately, as it's
+    not available once the response has been sent.
+
+    The task doesn't run in the context of the request. Once the request has finished, asgiref would
+    start a new thread for the sync stages of each report. Outside of it, they all run in the single
+    thread which asgiref shares in the process.
+    """
+    reports = parse_reports(request)
+    for report in reports:
+        report.read_body()
+    task = contextvars.Context().run(asyncio.ensure_future, _process_reports_in_background(reports))
+    # Keep a reference to the task, otherwise it may be garbage collected before it's done.
+    _background_tasks.add(task)
+    task.add_done_callback(_background_task_done)
+    return task
+
+
+async def _process_reports_in_background(reports):
+    # The request signals don't manage the connections of the shared thread.
+    close_connections = sync_to_async(close_old_connections)
+    await close_connections()
+    try:
+        await _process_reports_async(reports)
+    finally:
+        await close_connections()
+
+
+def _background_task_done(task):
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Processing of CSP report failed.", exc_info=task.exception())
 
 
 def format_report(jsn):
@@ -38,53 +119,299 @@ def format_report(jsn):
     """
     if isinstance(jsn, bytes):
         jsn = jsn.decode("utf-8")
-    try:
-        return json.dumps(json.loads(jsn), indent=4, sort_keys=True, separators=(",", ": "))
-    except ValueError:
-        return "Invalid JSON. Raw dump is below.\n\n" + jsn
+    return ParsedReport(jsn).formatted
+
 
+def email_admins(report, mode=None):
+    """Email the report to the site admins.
 
-def email_admins(request):
-    user_agent = request.META.get("HTTP_USER_AGENT", "")
-    report = format_report(request.body)
-    message = "User agent:\n%s\n\nReport:\n%s" % (user_agent, report)
+    @param report: The `ParsedReport` (or the `HttpRequest`) of the CSP report.
+    @param mode: The value of CSP_REPORTS_EMAIL_ADMINS, by default it's read from the settings.
+    """
+    report = to_parsed_report(report)
+    if mode is None:
+        mode = app_settings.EMAIL_ADMINS
+    if mode == EMAIL_DIGEST:
+        get_email_digest().add(report)
+        return
+    message = "User agent:\n%s\n\nReport:\n%s" % (report.user_agent, report.formatted)
     mail_admins("CSP Violation Report", message)
 
 
-def log_report(request):
-    func = getattr(logger, app_settings.LOG_LEVEL)
-    func("Content Security Policy violation: %s", format_report(request.body))
+_email_digest = None
+_email_digest_lock = threading.Lock()
+
+
+def get_email_digest():
+    """Returns the digest of reports used when CSP_REPORTS_EMAIL_ADMINS is 'digest'."""
+    global _email_digest
+    with _email_digest_lock:
+        if _email_digest is None:
+            _email_digest = EmailDigest(
+                interval=app_settings.EMAIL_DIGEST_INTERVAL,
+                max_reports=app_settings.EMAIL_DIGEST_MAX_REPORTS,
+                suppress_window=app_settings.EMAIL_DIGEST_SUPPRESS_WINDOW,
+            )
+    return _email_digest
+
+
+def reset_email_digest():
+    """Send the collected reports and drop the digest, so it's created again from the current settings."""
+    global _email_digest
+    with _email_digest_lock:
+        email_digest, _email_digest = _email_digest, None
+    if email_digest is not None:
+        email_digest.flush()
+
+
+class LazyText:
+    """Text which is produced only when it's converted to a string.
+
+    Log records format their arguments only when they are emitted, so the text isn't produced for
+    records which are filtered out.
+    """
 
+    __slots__ = ("function", "args")
 
-def save_report(request):
-    message = request.body
-    if isinstance(message, bytes):
-        message = message.decode(request.encoding or settings.DEFAULT_CHARSET)
+    def __init__(self, function, *args):
+        self.function = function
+        self.args = args
 
-    report = CSPReport.from_message(message)
-    report.user_agent = request.META.get("HTTP_USER_AGENT", "")
-    report.save()
+    def __str__(self):
+        return self.function(*self.args)
 
 
-def run_additional_handlers(request):
-    for handler in get_additional_handlers():
-        handler(request)
+def get_compact_report(report):
+    """Return the `ParsedReport` as a single line JSON."""
+    return codec.dumps(report.data if report.is_valid else report.raw)
 
 
-_additional_handlers = None
-_filter_function = None
+def get_log_extra(report):
+    """Return the `extra` attributes of the structured log record of the `ParsedReport`."""
+    extra = {"csp_" + name.replace("-", "_"): value for name, value in report.csp_report.items()
+             if name in LOG_EXTRA_FIELDS}
+    extra["csp_user_agent"] = report.user_agent
+    extra["csp_is_valid"] = report.is_valid
+    return extra
+
+
+def log_report(report, level_name=None, log_format=None):
+    """Log the report.
+
+    The report is formatted only if the record is emitted.
+
+    @param report: The `ParsedReport` (or the `HttpRequest`) of the CSP report.
+    @param level_name: The value of CSP_REPORTS_LOG_LEVEL, by default it's read from the settings.
+    @param log_format: The value of CSP_REPORTS_LOG_FORMAT, by default it's read from the settings.
+    """
+    if level_name is None:
+        level_name = app_settings.LOG_LEVEL
+    if log_format is None:
+        log_format = app_settings.LOG_FORMAT
+    level = LOG_METHOD_LEVELS.get(level_name) or logging.getLevelName(level_name.upper())
+    if isinstance(level, int) and not logger.isEnabledFor(level):
+        return
+    report = to_parsed_report(report)
+    func = getattr(logger, level_name)
+    if log_format == LOG_FORMAT_STRUCTURED:
+        func("Content Security Policy violation: %s", LazyText(get_compact_report, report),
+             extra=get_log_extra(report))
+    else:
+        func("Content Security Policy violation: %s", LazyText(lambda: report.formatted))
+
+
+def save_report(report, mode=None, options=None):
+    """Save the report to the database.
+
+    @param report: The `ParsedReport` (or the `HttpRequest`) of the CSP report, or a list of
+        `ParsedReport`s which are saved together.
+    @param mode: The value of CSP_REPORTS_SAVE, by default it's read from the settings.
+    @param options: The `SaveOptions` of reports saved directly, by default they are read from the settings.
+    """
+    reports = report if isinstance(report, list) else [to_parsed_report(report)]
+    if mode is None:
+        mode = app_settings.SAVE
+    if mode == SAVE_SPOOL:
+        spool_writer = get_spool_writer()
+        for report in reports:
+            spool_writer.write(report.raw, report.user_agent, weight=report.weight)
+        return
+    instances = [build_report(report) for report in reports]
+    if mode == SAVE_BUFFERED:
+        save_buffer = get_save_buffer()
+        for instance in instances:
+            save_buffer.put(instance)
+    else:
+        save_reports(instances, options)
+
+
+def build_report(report):
+    """Return an unsaved report model instance for a `ParsedReport`."""
+    instance = CSPReport.from_decoded(report.raw, report.data)
+    instance.user_agent = report.user_agent
+    instance.weight = report.weight
+    return instance
+
+
+# Options of saving of the reports, see `get_save_options`.
+# `aggregate_examples` is `None` if the reports are not aggregated.
+SaveOptions = namedtuple("SaveOptions", ("aggregate_examples", "intern_texts", "search_index"))
+
+
+def get_save_options():
+    """Return the `SaveOptions` of the current settings."""
+    return SaveOptions(
+        aggregate_examples=app_settings.AGGREGATE_EXAMPLES if app_settings.AGGREGATE else None,
+        intern_texts=app_settings.INTERN_TEXTS,
+        search_index=app_settings.SEARCH_INDEX,
+    )
+
+
+def save_reports(instances, options=None):
+    """Save the report model instances to the database, in a single query if there are more of them.
+
+    @param options: The `SaveOptions`, by default they are read from the settings.
+    """
+    if options is None:
+        options = get_save_options()
+    if options.aggregate_examples is not None:
+        instances = aggregate_reports(instances, options.aggregate_examples)
+    if options.intern_texts:
+        intern_report_texts(instances)
+    if len(instances) == 1:
+        instances[0].save()
+    elif instances:
+        CSPReport.objects.bulk_create(instances)
+    if options.search_index:
+        index_reports(instances)
+
+
+def bulk_save_reports(instances):
+    """Save the report model instances to the database from the background thread of the save buffer."""
+    close_old_connections()
+    save_reports(instances, pipeline.get_pipeline().save_options)
+
+
+_save_buffer = None
+_save_buffer_lock = threading.Lock()
+
+
+def get_save_buffer():
+    """Returns the buffer of reports to be saved used when CSP_REPORTS_SAVE is 'buffered'."""
+    global _save_buffer
+    with _save_buffer_lock:
+        if _save_buffer is None:
+            _save_buffer = BatchBuffer(
+                bulk_save_reports,
+                batch_size=app_settings.BUFFER_BATCH_SIZE,
+                flush_interval=app_settings.BUFFER_FLUSH_INTERVAL,
+                max_size=app_settings.BUFFER_MAX_SIZE,
+                full_policy=app_settings.BUFFER_FULL_POLICY,
+            )
+    return _save_buffer
+
+
+def reset_save_buffer():
+    """Save the buffered reports and drop the buffer, so it's created again from the current settings."""
+    global _save_buffer
+    with _save_buffer_lock:
+        save_buffer, _save_buffer = _save_buffer, None
+    if save_buffer is not None:
+        save_buffer.flush()
+
+
+_spool_writer = None
+_spool_writer_lock = threading.Lock()
+
+
+def get_spool_writer():
+    """Returns the spool writer used when CSP_REPORTS_SAVE is 'spool'."""
+    global _spool_writer
+    with _spool_writer_lock:
+        if _spool_writer is None:
+            if not app_settings.SPOOL_DIR:
+                raise ImproperlyConfigured("CSP_REPORTS_SPOOL_DIR must be set when CSP_REPORTS_SAVE is 'spool'.")
+            _spool_writer = SpoolWriter(
+                app_settings.SPOOL_DIR,
+                max_bytes=app_settings.SPOOL_MAX_BYTES,
+                fsync_every=app_settings.SPOOL_FSYNC_EVERY,
+            )
+    return _spool_writer
+
+
+def reset_spool_writer():
+    """Close and drop the spool writer, so it's created again from the current settings."""
+    global _spool_writer
+    with _spool_writer_lock:
+        spool_writer, _spool_writer = _spool_writer, None
+    if spool_writer is not None:
+        spool_writer.close()
+
+
+def run_additional_handlers(report):
+    report = to_parsed_report(report)
+    report_pipeline = pipeline.get_pipeline()
+    if report_pipeline.handler_pool is not None:
+        # The handlers may run after the response has been sent.
+        report.read_body()
+        for handler in report_pipeline.additional_handlers:
+            report_pipeline.handler_pool.submit(handler, report)
+        return
+    for handler in report_pipeline.additional_handlers:
+        call_handler(handler, report)
+
+
+async def run_additional_handlers_async(report):
+    report = to_parsed_report(report)
+    report_pipeline = pipeline.get_pipeline()
+    handler_pool = report_pipeline.handler_pool
+    if handler_pool is not None:
+        await asyncio.gather(*(handler_pool.run_async(handler, report)
+                               for handler in report_pipeline.additional_handlers))
+        return
+    await asyncio.gather(*(call_handler_async(handler, report) for handler in report_pipeline.additional_handlers))
+
+
+_handler_pool = None
+_handler_pool_lock = threading.Lock()
+
+
+def get_handler_pool():
+    """Returns the pool of threads used when CSP_REPORTS_ADDITIONAL_HANDLERS_MODE is 'pool'."""
+    global _handler_pool
+    with _handler_pool_lock:
+        if _handler_pool is None:
+            _handler_pool = HandlerPool(
+                max_workers=app_settings.HANDLER_POOL_SIZE,
+                max_queue=app_settings.HANDLER_QUEUE_SIZE,
+                timeout=app_settings.HANDLER_TIMEOUT,
+                full_policy=app_settings.HANDLER_FULL_POLICY,
+            )
+    return _handler_pool
+
+
+def reset_handler_pool():
+    """Drop the pool of threads, so it's created again from the current settings.
+
+    The handler calls which are already scheduled are finished by the old pool.
+    """
+    global _handler_pool
+    with _handler_pool_lock:
+        handler_pool, _handler_pool = _handler_pool, None
+    if handler_pool is not None:
+        handler_pool.shutdown(wait=False)
+
+
+async def call_handler_async(handler, report):
+    """Call the filter function or handler, coroutine functions are awaited and others run in a thread."""
+    if inspect.iscoroutinefunction(handler):
+        return await call_handler(handler, report)
+    return await sync_to_async(call_handler)(handler, report)
 
 
 def get_additional_handlers():
     """Returns the actual functions from the dotted paths specified in ADDITIONAL_HANDLERS."""
-    global _additional_handlers
-    if not isinstance(_additional_handlers, list):
-        handlers = []
-        for name in app_settings.ADDITIONAL_HANDLERS:
-            function = import_from_dotted_path(name)
-            handlers.append(function)
-        _additional_handlers = handlers
-    return _additional_handlers
+    return list(pipeline.get_pipeline().additional_handlers)
 
 
 def parse_date_input(value):
@@ -123,10 +450,26 @@ def import_from_dotted_path(name):
     return getattr(import_module(module_name), function_name)
 
 
-def should_process_report(request):
-    if not app_settings.FILTER_FUNCTION:
+def get_filter_function():
+    """Returns the actual function from the dotted path specified in FILTER_FUNCTION, `None` if it's not set."""
+    return pipeline.get_pipeline().filter_function
+
+
+def should_process_report(report):
+    report_pipeline = pipeline.get_pipeline()
+    filter_rules = report_pipeline.filter_rules
+    if filter_rules is not None and not filter_rules.should_process(to_parsed_report(report)):
+        return False
+    if report_pipeline.filter_function is None:
+        return True
+    return call_handler(report_pipeline.filter_function, to_parsed_report(report))
+
+
+async def should_process_report_async(report):
+    report_pipeline = pipeline.get_pipeline()
+    filter_rules = report_pipeline.filter_rules
+    if filter_rules is not None and not filter_rules.should_process(to_parsed_report(report)):
+        return False
+    if report_pipeline.filter_function is None:
         return True
-    global _filter_function
-    if _filter_function is None:
-        _filter_function = import_from_dotted_path(app_settings.FILTER_FUNCTION)
-    return _filter_function(request)
+    return await call_handler_async(report_pipeline.filter_function, to_parsed_report(report))
@@ -0,0 +1,76 @@
+"""Cheap validation of report requests before their body is parsed."""
+import math
+import re
+
+from django.http import HttpResponse
+
+from cspreports import pipeline, stats
+from cspreports.throttling import throttle_request
+
+# Matches JSON strings, so they can be skipped, and brackets. An unterminated string, including one
+# ending with an escape, runs to the end of the body, so the scan doesn't backtrack and stays linear.
+_JSON_STRUCTURE_RE = re.compile(rb'"(?:[^"\\]|\\.)*(?:"|\\?\Z)|[\[\]{}]', re.S)
+
+
+def exceeds_json_depth(body, max_depth):
+    """Return whether the JSON body is nested deeper than `max_depth`.
+
+    Works on the raw body, so it doesn't need to be decoded nor parsed. Invalid JSON is scanned as
+    well as possible, it's rejected later by the parser anyway.
+    """
+    if body.count(b"{") + body.count(b"[") <= max_depth:
+        return False
+    depth = 0
+    for match in _JSON_STRUCTURE_RE.finditer(body):
+        token = match.group()
+        if token in (b"{", b"["):
+            depth += 1
+            if depth > max_depth:
+                return True
+        elif token in (b"}", b"]"):
+            depth -= 1
+    return False
+
+
+def reject_request(request):
+    """Check the report request before its body is parsed.
+
+    Throttled requests are rejected first, before the body is read.
+
+    @return: A response for a rejected request, `None` if the request is accepted.
+    """
+    report_pipeline = pipeline.get_pipeline()
+    throttled = throttle_request(request, report_pipeline.rate_limits, report_pipeline.rate_limit_cache)
+    if throttled is not None:
+        scope, wait = throttled
+        stats.increment("throttled.{}".format(scope))
+        response = HttpResponse(status=429)
+        response["Retry-After"] = str(math.ceil(wait))
+        return response
+
+    content_types = report_pipeline.content_types
+    if content_types is not None and request.content_type not in content_types:
+        return _reject("content_type", 415)
+
+    max_body_size = report_pipeline.max_body_size
+    if max_body_size is not None:
+        try:
+            content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            return _reject("content_length", 400)
+        if content_length > max_body_size:
+            return _reject("body_size", 413)
+        # Body may be longer than the declared length under ASGI, check its actual length too.
+        if len(request.body) > max_body_size:
+            return _reject("body_size", 413)
+
+    max_json_depth = report_pipeline.max_json_depth
+    if max_json_depth is not None and exceeds_json_depth(request.body, max_json_depth):
+        return _reject("json_depth", 400)
+    stats.increment("accepted")
+    return None
+
+
+def _reject(reason, status):
+    stats.increment("rejected.{}".format(reason))
+    return HttpResponse(status=status)
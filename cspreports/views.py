@@ -1,8 +1,11 @@
-from django.http import HttpResponse
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, HttpResponseNotAllowed
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 
-from cspreports.utils import process_report
+from cspreports import pipeline
+from cspreports.utils import process_report, process_report_in_background
+from cspreports.validation import reject_request
 
 
 @require_POST
@@ -11,5 +14,29 @@ def report_csp(request):
     """ The handler for browsers to send Content Security Policy violation reports to.
         The 'report-uri' in HTTP Content-Security-Policy headers should point to this view.
     """
+    rejection = reject_request(request)
+    if rejection is not None:
+        return rejection
     process_report(request)
     return HttpResponse('')
+
+
+async def report_csp_async(request):
+    """ Asynchronous variant of `report_csp` for ASGI deployments.
+        The report is processed in the background, so the response is sent without waiting for it.
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    if pipeline.get_pipeline().rate_limits:
+        # The cache API is synchronous, it mustn't block the event loop.
+        rejection = await sync_to_async(reject_request)(request)
+    else:
+        rejection = reject_request(request)
+    if rejection is not None:
+        return rejection
+    process_report_in_background(request)
+    return HttpResponse('')
+
+
+# Django's view decorators only support coroutine functions since Django 5.0.
+report_csp_async.csrf_exempt = True
@@ -9,6 +9,7 @@ TEST_REQUIREMENTS = ["coverage"]
 EXTRAS_REQUIRE = {
     "quality": ["isort", "flake8"],
     "test": TEST_REQUIREMENTS,
+    "orjson": ["orjson"],
 }
 CLASSIFIERS = [
     "License :: OSI Approved :: MIT License",